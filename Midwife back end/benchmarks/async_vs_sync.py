@@ -0,0 +1,97 @@
+# Side-by-side throughput: sync Session (default) vs DB_ASYNC=1.
+#
+# Starts the app twice with uvicorn (1 worker each, same DATABASE_URL),
+# seeds it through /seed-dashboard-v2, logs in as test_midwife and fires
+# CONCURRENCY parallel requests at a few read endpoints.
+#
+# Run from "Midwife back end":
+#     python benchmarks/async_vs_sync.py
+#     CONCURRENCY=500 REQUESTS=5000 python benchmarks/async_vs_sync.py
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PORT = int(os.getenv("BENCH_PORT", "8765"))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+CONCURRENCY = int(os.getenv("CONCURRENCY", "200"))
+REQUESTS = int(os.getenv("REQUESTS", "2000"))
+ENDPOINTS = ["/midwives/dashboard-stats", "/mothers/", "/appointments/", "/mothers/risks/stats"]
+
+
+def start_server(db_async):
+    env = dict(os.environ, DB_ASYNC="1" if db_async else "0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "sql_app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(BASE_URL + "/docs", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def run_endpoint(client, path):
+    sem = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": REQUESTS / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def bench():
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        await client.get("/seed-dashboard-v2")
+        r = await client.post("/token", data={"username": "test_midwife", "password": "123"})
+        client.headers["Authorization"] = "Bearer " + r.json()["access_token"]
+        return {path: await run_endpoint(client, path) for path in ENDPOINTS}
+
+
+def main():
+    subprocess.run([sys.executable, "-m", "sql_app.migrations", "upgrade"], check=True)
+    results = {}
+    for mode, db_async in (("sync", False), ("async", True)):
+        proc = start_server(db_async)
+        try:
+            results[mode] = asyncio.run(bench())
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"concurrency={CONCURRENCY} requests={REQUESTS}")
+    print(f"{'endpoint':32} {'mode':6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path in ENDPOINTS:
+        for mode in ("sync", "async"):
+            r = results[mode][path]
+            print(f"{path:32} {mode:6} {r['rps']:9.1f} {r['p50_ms']:9.1f} {r['p99_ms']:9.1f} {r['errors']:7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# List response bodies, FastAPI's default path vs. sql_app.fast_json
+#
+# Loads ROWS mothers (with their relationship lists), pregnancy records and
+# ANC visits, then turns each list into a response body three ways:
+#   default    what FastAPI does for response_model=List[schema]: validate,
+#              serialize, jsonable_encoder, json.dumps (JSONResponse)
+#   validated  fast_json with FAST_JSON_TRUSTED=0 (one TypeAdapter pass)
+#   trusted    fast_json's compiled row encoder + orjson (the default)
+# and reports median time and peak memory (tracemalloc) per body. The bodies
+# are checked to decode to the same JSON first.
+#
+# Run from "Midwife back end":
+#     python benchmarks/json_responses.py
+#     ROWS=5000 python benchmarks/json_responses.py
+
+import asyncio
+import json
+import os
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List
+
+from common import measure, new_session, reset_database, seed_caseload
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.orm import selectinload
+
+from sql_app import fast_json, models, schemas
+
+ROWS = int(os.getenv("ROWS", "1000"))
+
+
+def seed(db):
+    midwife = seed_caseload(db, ROWS, records_per_mother=1)
+    mother_ids = [m.id for m in db.query(models.Mother.id).filter(models.Mother.midwife_id == midwife.id)]
+    for i, mother_id in enumerate(mother_ids):
+        appointment = models.Appointment(midwife_id=midwife.id, mother_id=mother_id, visit_type="ANC",
+                                         status="Completed", date_time=date.today() - timedelta(days=i % 90))
+        db.add(appointment)
+        db.flush()
+        db.add(models.ANCVisit(
+            mother_id=mother_id, appointment_id=appointment.id, visit_date=date.today() - timedelta(days=i % 90),
+            poa_weeks=f"{12 + i % 28}", weight_kg=Decimal("58.40") + i % 20, bp_systolic=110 + i % 30,
+            bp_diastolic=70 + i % 20, pallor="No", oedema="No", fundal_height_cm=Decimal("24.5"),
+            fetal_heart_sound="Present", urine_sugar="Nil", urine_albumin="Nil",
+            nutrient_supplements=True, counsel_nutrition=i % 2 == 0,
+        ))
+    db.commit()
+    return midwife
+
+
+def load_lists(db, midwife_id):
+    # Everything loaded up front: this measures encoding, not queries
+    mother_rels = [getattr(models.Mother, name) for name in
+                   ("health_records", "pregnancy_records", "delivery_records", "antenatal_plans")]
+    mothers = db.query(models.Mother).filter(models.Mother.midwife_id == midwife_id)\
+        .options(*[selectinload(rel) for rel in mother_rels]).order_by(models.Mother.id).all()
+    ids = [m.id for m in mothers]
+    records = db.query(models.PregnancyRecord).filter(models.PregnancyRecord.mother_id.in_(ids)).all()
+    visits = db.query(models.ANCVisit).filter(models.ANCVisit.mother_id.in_(ids)).all()
+    return [(schemas.Mother, mothers), (schemas.PregnancyRecord, records), (schemas.ANCVisit, visits)]
+
+
+def default_body(schema, rows):
+    field = create_model_field(name="Response", type_=List[schema], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def peak_kb(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    reset_database()
+    db = new_session()
+    midwife = seed(db)
+    lists = load_lists(db, midwife.id)
+    ways = {
+        "default": default_body,
+        "validated": lambda schema, rows: fast_json.encode_list(schema, rows, trusted=False),
+        "trusted": lambda schema, rows: fast_json.encode_list(schema, rows, trusted=True),
+    }
+    print(f"rows={ROWS}")
+    print(f"{'schema':<16} {'way':<10} {'ms':>8} {'peak KB':>9} {'body KB':>8}")
+    for schema, rows in lists:
+        expected = json.loads(default_body(schema, rows))
+        for name, way in ways.items():
+            body = way(schema, rows)
+            assert json.loads(body) == expected, f"{schema.__name__}: {name} body differs"
+            ms, _ = measure(lambda: way(schema, rows))
+            print(f"{schema.__name__:<16} {name:<10} {ms:>8.1f} {peak_kb(lambda: way(schema, rows)):>9.0f} "
+                  f"{len(body) / 1024:>8.0f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Login (bcrypt verify) throughput at different cost factors.
+#
+# For each BCRYPT cost it reports:
+#   - single verify time
+#   - logins/s when LOGINS concurrent verifications go through the
+#     password pool (sql_app.passwords), i.e. what /token now does
+#   - the worst event-loop stall seen while those logins run, pooled vs.
+#     inline (the old behaviour: verify_password called on the loop)
+#
+# Run from "Midwife back end":
+#     python benchmarks/login_throughput.py
+#     COSTS=10,12,14 LOGINS=100 python benchmarks/login_throughput.py
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sql_app import passwords  # noqa: E402
+
+COSTS = [int(c) for c in os.getenv("COSTS", "10,11,12,13").split(",")]
+LOGINS = int(os.getenv("LOGINS", "64"))
+PASSWORD = "correct horse battery staple"
+
+
+async def max_loop_stall(stop):
+    # Ticks every 5 ms and records the largest gap between ticks
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.005)
+        now = time.perf_counter()
+        worst = max(worst, now - last - 0.005)
+        last = now
+    return worst * 1000
+
+
+async def run_logins(hashed, pooled):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(max_loop_stall(stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    if pooled:
+        await asyncio.gather(*(passwords.verify_password(PASSWORD, hashed) for _ in range(LOGINS)))
+    else:
+        for _ in range(LOGINS):
+            passwords.verify_sync(PASSWORD, hashed)
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return LOGINS / elapsed, await ticker
+
+
+async def main():
+    print(f"logins={LOGINS} pool_workers={passwords.PASSWORD_HASH_WORKERS}")
+    print(f"{'cost':>4} {'verify ms':>10} {'pooled/s':>9} {'inline/s':>9} {'stall pooled ms':>16} {'stall inline ms':>16}")
+    for cost in COSTS:
+        passwords.pwd_context = passwords.make_context(cost)
+        hashed = passwords.hash_sync(PASSWORD)
+
+        t0 = time.perf_counter()
+        passwords.verify_sync(PASSWORD, hashed)
+        single_ms = (time.perf_counter() - t0) * 1000
+
+        pooled_rate, pooled_stall = await run_logins(hashed, pooled=True)
+        inline_rate, inline_stall = await run_logins(hashed, pooled=False)
+        print(f"{cost:>4} {single_ms:>10.1f} {pooled_rate:>9.1f} {inline_rate:>9.1f} {pooled_stall:>16.1f} {inline_stall:>16.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+# Bulk midwife import: ROWS midwives from one CSV upload (POST /midwives/import)
+#
+# Builds a CSV with ROWS valid rows (half with an email address, so half the
+# credentials go to the outbox and half come back in the report), uploads it
+# in-process as the seeded MOH officer and reports wall time and rows/s.
+#
+# Run from "Midwife back end":
+#     python benchmarks/midwife_import.py
+#     ROWS=20000 IMPORT_CHUNK_SIZE=1000 python benchmarks/midwife_import.py
+
+import csv
+import io
+import os
+import time
+
+os.environ.setdefault("OUTBOX_WORKER", "0")  # Measure the import, not SMTP
+
+from common import QueryCounter, new_session
+
+from fastapi.testclient import TestClient
+
+from sql_app import migrations, models
+from sql_app.main import app
+
+ROWS = int(os.getenv("ROWS", "5000"))
+HEADER = ["full_name", "nic", "date_of_birth", "phone_number", "email",
+          "residential_address", "slmc_reg_no", "service_grade", "assigned_moh_area"]
+
+
+def build_csv():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for i in range(ROWS):
+        writer.writerow([f"Midwife {i:06d} Silva", f"{i:09d}V", "1990-01-01", f"07{i:08d}",
+                         f"midwife{i}@example.com" if i % 2 else "", "Colombo", f"SLMC{i}",
+                         "Grade II", "Colombo"])
+    return buffer.getvalue().encode()
+
+
+def main():
+    migrations.reset()  # The app refuses to start on an unversioned schema
+    payload = build_csv()
+    with TestClient(app) as client:
+        client.get("/seed-dashboard-v2")
+        token = client.post("/moh/token", data={"username": "moh_admin", "password": "123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            response = client.post("/midwives/import", headers=headers, files={"file": ("midwives.csv", payload)})
+            elapsed = time.perf_counter() - start
+        report = response.json()
+        assert response.status_code == 200, response.text
+
+    db = new_session()
+    queued = db.query(models.EmailOutbox).count()
+    db.close()
+    print(f"rows={ROWS} file={len(payload) / 1024:.0f} KiB")
+    print(f"created={report['created']} failed={report['failed']} emails queued={queued}")
+    print(f"{elapsed:.2f} s  {ROWS / elapsed:,.0f} rows/s  {counter.count} queries")
+
+
+if __name__ == "__main__":
+    main()
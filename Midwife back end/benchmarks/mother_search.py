@@ -0,0 +1,76 @@
+# Typeahead latency: old LIKE '%term%' filter vs. crud.search_mothers
+#
+# Seeds MOTHERS mothers under one midwife (worst case: one big caseload),
+# builds their name tokens, then times a few typeahead terms with both.
+#
+# Run from "Midwife back end":
+#     python benchmarks/mother_search.py
+#     MOTHERS=20000 python benchmarks/mother_search.py
+
+import os
+import random
+
+from common import DUMMY_HASH, measure, new_session, reset_database
+
+from sqlalchemy import or_
+
+from sql_app import crud, models
+
+MOTHERS = int(os.getenv("MOTHERS", "100000"))
+# Common prefixes (legacy LIKE stops after 20 rows), then rare / missing
+# names and NIC prefixes (legacy LIKE scans the whole caseload)
+TERMS = ["n", "nim", "nimali", "per", "nimali per", "zoy", "de zoysa", "xyz", "9512", "95123"]
+
+FIRST_NAMES = ["Nimali", "Kumari", "Dilani", "Sanduni", "Chamari", "Ishara", "Tharushi", "Nadeesha",
+               "Hasini", "Madhavi", "Rashmi", "Sewwandi", "Fathima", "Kavitha", "Priya", "Anjali"]
+LAST_NAMES = ["Perera", "Fernando", "Silva", "Jayasinghe", "Bandara", "Wickramasinghe", "Rajapaksha",
+              "Gunawardena", "Herath", "Dissanayake", "Ratnayake", "Mohamed", "Sivakumar", "Kumara"]
+
+
+def legacy_search(db, midwife_id, term):
+    search_format = f"%{term}%"
+    return db.query(models.Mother).filter(
+        models.Mother.midwife_id == midwife_id,
+        or_(models.Mother.full_name.like(search_format), models.Mother.nic.like(search_format))
+    ).offset(0).limit(20).all()
+
+
+def seed(db):
+    rng = random.Random(42)
+    midwife = models.Midwife(username="bench_midwife", hashed_password=DUMMY_HASH, full_name="Bench Midwife")
+    db.add(midwife)
+    db.commit()
+    mothers = models.Mother.__table__
+    tokens = models.MotherSearchToken.__table__
+    for start in range(0, MOTHERS, 5000):
+        rows = []
+        for i in range(start, min(start + 5000, MOTHERS)):
+            last_name = "De Zoysa" if i % 1000 == 0 else rng.choice(LAST_NAMES)
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {last_name}"
+            rows.append({"id": i + 1, "full_name": name, "nic": f"{rng.randint(70, 99)}{i:07d}V",
+                         "hashed_password": DUMMY_HASH, "midwife_id": midwife.id, "status": "Eligible"})
+        db.execute(mothers.insert(), rows)
+        db.execute(tokens.insert(), [
+            {"mother_id": r["id"], "midwife_id": midwife.id, "token": t}
+            for r in rows for t in crud.tokenize_search_text(r["full_name"])
+        ])
+        db.commit()
+    return midwife
+
+
+def main():
+    reset_database()
+    db = new_session()
+    midwife = seed(db)
+    print(f"mothers={MOTHERS}")
+    print(f"{'term':14} {'legacy ms':>10} {'indexed ms':>11} {'hits':>5}")
+    for term in TERMS:
+        legacy_ms, _ = measure(lambda: legacy_search(db, midwife.id, term))
+        indexed_ms, _ = measure(lambda: crud.search_mothers(db, midwife.id, term))
+        hits = len(crud.search_mothers(db, midwife.id, term))
+        print(f"{term:14} {legacy_ms:>10.2f} {indexed_ms:>11.2f} {hits:>5}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
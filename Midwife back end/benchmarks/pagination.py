@@ -0,0 +1,75 @@
+# Page 1 vs. page N latency: OFFSET/LIMIT vs. keyset cursor (sql_app.pagination)
+#
+# Seeds one midwife with ROWS appointments and reads the midwife's
+# appointment list one PAGE_SIZE page at a time, both ways.
+#
+# Run from "Midwife back end":
+#     python benchmarks/pagination.py
+#     ROWS=200000 PAGE_SIZE=100 python benchmarks/pagination.py
+
+import os
+from datetime import datetime, timedelta
+
+from common import DUMMY_HASH, measure, new_session, reset_database
+
+from sql_app import crud, models, pagination
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+PAGES = [1, 10, 100, 1000]
+ROWS = int(os.getenv("ROWS", str(PAGE_SIZE * max(PAGES))))
+
+
+def offset_page(db, midwife_id, page):
+    return db.query(models.Appointment).filter(models.Appointment.midwife_id == midwife_id)\
+        .order_by(*crud.APPOINTMENT_ORDER).offset((page - 1) * PAGE_SIZE).limit(PAGE_SIZE).all()
+
+
+def cursor_for_page(db, midwife_id, page):
+    # The cursor a client would hold after reading page - 1 pages
+    if page == 1:
+        return None
+    last = db.query(models.Appointment).filter(models.Appointment.midwife_id == midwife_id)\
+        .order_by(*crud.APPOINTMENT_ORDER).offset((page - 1) * PAGE_SIZE - 1).first()
+    return pagination.encode_cursor([last.date_time, last.id])
+
+
+def seed(db):
+    midwife = models.Midwife(username="bench_midwife", hashed_password=DUMMY_HASH, full_name="Bench Midwife")
+    db.add(midwife)
+    db.flush()
+    mother = models.Mother(full_name="Bench Mother", nic="000000000V", hashed_password=DUMMY_HASH, midwife_id=midwife.id)
+    db.add(mother)
+    db.commit()
+    start = datetime(2024, 1, 1, 8, 0)
+    appointments = models.Appointment.__table__
+    for chunk in range(0, ROWS, 10000):
+        db.execute(appointments.insert(), [
+            # Several visits per slot, so the id tie-breaker matters
+            {"midwife_id": midwife.id, "mother_id": mother.id, "visit_type": "Home Visit",
+             "date_time": start + timedelta(minutes=30 * (i // 3)), "status": "Scheduled"}
+            for i in range(chunk, min(chunk + 10000, ROWS))
+        ])
+    db.commit()
+    return midwife
+
+
+def main():
+    reset_database()
+    db = new_session()
+    midwife = seed(db)
+    print(f"rows={ROWS} page_size={PAGE_SIZE}")
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+    for page in PAGES:
+        if (page - 1) * PAGE_SIZE >= ROWS:
+            break
+        cursor = cursor_for_page(db, midwife.id, page)
+        assert [a.id for a in offset_page(db, midwife.id, page)] == \
+            [a.id for a in crud.get_appointments_by_midwife(db, midwife.id, cursor=cursor, limit=PAGE_SIZE)]
+        offset_ms, _ = measure(lambda: offset_page(db, midwife.id, page))
+        cursor_ms, _ = measure(lambda: crud.get_appointments_by_midwife(db, midwife.id, cursor=cursor, limit=PAGE_SIZE))
+        print(f"{page:>6} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# /mothers/risks/stats: old 1 + N loop vs. the single aggregate in crud.get_risk_stats
+#
+# Run from "Midwife back end":
+#     python benchmarks/risk_stats.py
+#     SIZES=50,500,5000 BENCH_DATABASE_URL=mysql+mysqlconnector://... python benchmarks/risk_stats.py
+
+import os
+
+from common import measure, new_session, reset_database, seed_caseload
+
+from sql_app import crud, models
+
+SIZES = [int(n) for n in os.getenv("SIZES", "50,500,5000").split(",")]
+
+
+def legacy_risk_stats(db, midwife_id):
+    # The previous implementation, kept here for comparison
+    mothers = db.query(models.Mother).filter(
+        models.Mother.midwife_id == midwife_id,
+        models.Mother.status.in_(["Pregnant", "Postnatal"])
+    ).all()
+    stats = {"total_high_risk": 0, "diabetes": 0, "cardiac": 0, "age_risk": 0, "history_pph": 0, "fifth_pregnancy": 0}
+    for mother in mothers:
+        if mother.risk_level == "High":
+            stats["total_high_risk"] += 1
+        preg_record = crud.get_pregnancy_record_by_mother(db, mother.id)
+        if preg_record:
+            stats["diabetes"] += bool(preg_record.risk_diabetes)
+            stats["cardiac"] += bool(preg_record.risk_cardiac)
+            stats["age_risk"] += bool(preg_record.risk_age_lt_20_gt_35)
+            stats["history_pph"] += bool(preg_record.risk_history_pph)
+            stats["fifth_pregnancy"] += bool(preg_record.risk_5th_pregnancy)
+    return stats
+
+
+def main():
+    print(f"{'mothers':>8} {'impl':10} {'queries':>8} {'median ms':>10}")
+    for size in SIZES:
+        reset_database()
+        db = new_session()
+        midwife = seed_caseload(db, size)
+        assert legacy_risk_stats(db, midwife.id) == crud.get_risk_stats(db, midwife.id)
+        for name, fn in (("legacy", legacy_risk_stats), ("aggregate", crud.get_risk_stats)):
+            db.expire_all()
+            ms, queries = measure(lambda: fn(db, midwife.id))
+            print(f"{size:>8} {name:10} {queries:>8} {ms:>10.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
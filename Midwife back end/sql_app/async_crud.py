@@ -0,0 +1,65 @@
+import functools
+import inspect
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, models, schemas
+
+# ---------------------------------------------------------
+# --------------- ASYNC VERSIONS OF crud.py ---------------
+# ---------------------------------------------------------
+# Every function in crud.py that takes `db` as its first argument gets an
+# awaitable twin here with the same name and arguments:
+#
+#     mother = await async_crud.get_mother(db, mother_id)
+#
+# - AsyncSession (DB_ASYNC=1): the crud function runs through
+#   AsyncSession.run_sync, so all SQL goes over the async driver and the
+#   event loop is never blocked.
+# - Session (default): the crud function runs in the threadpool, which is
+#   exactly what FastAPI did for the old `def` endpoints.
+#
+# The query logic therefore lives in crud.py only.
+
+def _wrap(fn):
+    @functools.wraps(fn)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return wrapper
+
+for _name, _fn in inspect.getmembers(crud, inspect.isfunction):
+    if _fn.__module__ != crud.__name__:
+        continue
+    _params = list(inspect.signature(_fn).parameters)
+    if _params and _params[0] == "db":
+        globals()[_name] = _wrap(_fn)
+
+
+# --- Response Loading ---
+# Response models like schemas.Mother / schemas.Midwife include relationship
+# lists. In async mode those can't be lazy-loaded while FastAPI serializes the
+# response, so load them (and only them) before returning from the endpoint.
+
+def _load_response_relationships(sync_db, obj, seen=None):
+    if seen is None:
+        seen = set()
+    items = obj if isinstance(obj, (list, tuple)) else [obj]
+    for item in items:
+        if not isinstance(item, models.Base) or id(item) in seen:
+            continue
+        seen.add(id(item))
+        schema = getattr(schemas, type(item).__name__, None)
+        if schema is None:
+            continue
+        for rel in sa_inspect(type(item)).relationships:
+            if rel.key in schema.model_fields:
+                _load_response_relationships(sync_db, getattr(item, rel.key), seen)
+    return obj
+
+async def load_for_response(db, obj):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(_load_response_relationships, obj)
+    return await run_in_threadpool(_load_response_relationships, db, obj)
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from . import metrics, models
+
+# ---------------------------------------------------------
+# ---------------- CARE PLAN TEMPLATES --------------------
+# ---------------------------------------------------------
+# The ANC weeks (per risk level) and PNC days used to be constants in crud.py.
+# They now live in care_plan_templates, one row per version:
+#
+#     {"anc_weeks_high": [12, 16, ...], "anc_weeks_low": [12, 26, 36],
+#      "pnc_days": [3, 7, 14, 42]}
+#
+# A version is never edited; a new schedule is a new version. That makes the
+# compiled plans safe to cache per worker for ever, keyed by template id.
+# Exactly one version is active: new pregnancies are tied to it
+# (mothers.care_plan_id), and a mother keeps her version until she is re-planned:
+#
+#     POST /care-plans/{id}/replan                       # MOH, own area
+#     python -m sql_app.care_plans replan <id> [area]    # all areas, from cron
+#
+# Which version is active is cached for CARE_PLAN_ACTIVE_TTL seconds. The
+# worker that activates a version sees it at once, the others within the TTL.
+
+CARE_PLAN_ACTIVE_TTL = float(os.getenv("CARE_PLAN_ACTIVE_TTL", "60"))
+
+ANC_VISIT_TYPE = "Clinic"
+PNC_VISIT_TYPE = "PNC"
+
+# --- Metrics ---
+compiles = metrics.Counter()
+hits = metrics.Counter()
+active_lookups = metrics.Counter()
+
+CompiledPlan = namedtuple("CompiledPlan", "id version anc_weeks pnc_days")
+
+_compiled = {} # template id -> CompiledPlan
+_active = (None, 0.0) # (template id, expires at)
+_lock = threading.Lock()
+
+def compile_definition(template_id: int, version: int, definition: str):
+    spec = json.loads(definition)
+    return CompiledPlan(
+        id=template_id,
+        version=version,
+        anc_weeks={"High": tuple(spec["anc_weeks_high"]), "Low": tuple(spec["anc_weeks_low"])},
+        pnc_days=tuple(spec["pnc_days"]),
+    )
+
+def get_plans(db, template_ids):
+    # {id: CompiledPlan}; one query for the ids not compiled yet
+    plans, missing = {}, set()
+    for template_id in set(template_ids):
+        plan = _compiled.get(template_id)
+        if plan is None:
+            missing.add(template_id)
+        else:
+            plans[template_id] = plan
+    hits.inc(len(plans))
+    if missing:
+        Template = models.CarePlanTemplate
+        rows = db.query(Template.id, Template.version, Template.definition).filter(Template.id.in_(missing)).all()
+        for row in rows:
+            plan = compile_definition(row.id, row.version, row.definition)
+            with _lock:
+                plans[row.id] = _compiled.setdefault(row.id, plan)
+            compiles.inc()
+    return plans
+
+def get_plan(db, template_id: int):
+    return get_plans(db, [template_id]).get(template_id)
+
+def active_plan(db):
+    global _active
+    template_id, expires_at = _active
+    if template_id is None or expires_at <= time.monotonic():
+        Template = models.CarePlanTemplate
+        active_lookups.inc()
+        template_id = db.query(Template.id).filter(Template.is_active.is_(True))\
+                        .order_by(Template.version.desc()).limit(1).scalar()
+        if template_id is None:
+            raise LookupError("No active care plan template (run: python -m sql_app.migrations upgrade)")
+        _active = (template_id, time.monotonic() + CARE_PLAN_ACTIVE_TTL)
+    return get_plan(db, template_id)
+
+def invalidate_active():
+    global _active
+    _active = (None, 0.0)
+
+def get_stats():
+    return {
+        "compiled": sorted(plan.version for plan in _compiled.values()),
+        "active_template_id": _active[0],
+        "active_ttl_seconds": CARE_PLAN_ACTIVE_TTL,
+        "compiles": compiles.snapshot(),
+        "hits": hits.snapshot(),
+        "active_lookups": active_lookups.snapshot(),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "replan":
+        sys.exit("usage: python -m sql_app.care_plans replan <template_id> [moh_area]")
+    from . import crud
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(crud.replan_schedules(db, template_id=int(sys.argv[2]),
+                                    moh_area=sys.argv[3] if len(sys.argv) == 4 else None))
+    finally:
+        db.close()
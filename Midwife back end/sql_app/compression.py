@@ -0,0 +1,277 @@
+import gzip
+import mimetypes
+import os
+import stat
+import sys
+import zlib
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError: # Optional: without it only gzip is offered
+    brotli = None
+
+# ---------------------------------------------------------
+# ---------------- RESPONSE COMPRESSION -------------------
+# ---------------------------------------------------------
+# Risk lists, calendars and the directory are verbose JSON going to phones
+# on metered data. CompressionMiddleware compresses any compressible response
+# of COMPRESS_MIN_BYTES or more with the best encoding the client accepts
+# (Accept-Encoding, q-values honoured): br when the brotli package is
+# installed, else gzip. Smaller bodies go out as they are; the headers would
+# eat the saving. Large bodies are compressed off the event loop.
+#
+# The MOH portal pages in static/ are compressed once at deploy time
+#     python -m sql_app.compression static      # writes x.html.br / x.html.gz
+# and PrecompressedStaticFiles serves those variants directly. A variant older
+# than its source file is ignored, so an edited page is never served stale.
+#
+# Every response also records its payload size (before / after compression)
+# per endpoint, and counts the ones over PAYLOAD_BUDGET_BYTES, at
+# GET /internal/payload-stats.
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4")) # Per request: fast, still beats gzip -6
+COMPRESS_THREAD_BYTES = 64 * 1024 # Bigger bodies are compressed in the threadpool
+PAYLOAD_BUDGET_BYTES = int(os.getenv("PAYLOAD_BUDGET_BYTES", str(256 * 1024))) # Uncompressed
+
+STATIC_VARIANTS = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+# --- Metrics ---
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+compressed = {"br": metrics.Counter(), "gzip": metrics.Counter()}
+skipped_small = metrics.Counter()
+static_precompressed = metrics.Counter()
+
+class PayloadStats:
+    def __init__(self):
+        self.bytes = metrics.Histogram(SIZE_BUCKETS)
+        self.sent_bytes = metrics.Histogram(SIZE_BUCKETS)
+        self.over_budget = metrics.Counter()
+
+    def observe(self, size: int, sent: int):
+        self.bytes.observe(size)
+        self.sent_bytes.observe(sent)
+        if size > PAYLOAD_BUDGET_BYTES:
+            self.over_budget.inc()
+
+    def snapshot(self):
+        return {
+            "bytes": self.bytes.snapshot(),
+            "sent_bytes": self.sent_bytes.snapshot(),
+            "over_budget": self.over_budget.snapshot(),
+        }
+
+payloads = {} # "GET /mothers/" -> PayloadStats
+
+def _payload_stats(scope):
+    route = scope.get("route")
+    if route is not None:
+        name = f"{scope['method']} {route.path}"
+    elif scope.get("path", "").startswith("/static/"):
+        name = f"{scope['method']} /static"
+    else:
+        name = f"{scope['method']} (unmatched)"
+    stats = payloads.get(name)
+    if stats is None:
+        stats = payloads.setdefault(name, PayloadStats())
+    return stats
+
+def accepted_encodings(header: str):
+    # Encodings from Accept-Encoding that we can produce, best first
+    quality = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token:
+            quality[token] = q
+    wildcard = quality.get("*", 0.0)
+    ranked = [(quality.get(encoding, wildcard), encoding) for encoding in ("br", "gzip")]
+    return [encoding for q, encoding in sorted(ranked, key=lambda r: -r[0]) if q > 0]
+
+def choose_encoding(header: str):
+    for encoding in accepted_encodings(header):
+        if encoding == "br" and brotli is None:
+            continue
+        return encoding
+    return None
+
+def is_compressible(content_type: str):
+    return (content_type or "").startswith(COMPRESSIBLE_TYPES)
+
+def compress(body: bytes, encoding: str):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+            self.compress, self._finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def finish(self):
+        return self._finish()
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        start = None
+        stream = None # _StreamCompressor once a streamed body is being compressed
+        size = sent = 0
+
+        async def send_wrapper(message):
+            nonlocal start, stream, size, sent
+            if message["type"] == "http.response.start":
+                start = message # Held until the first body chunk decides the headers
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            size += len(body)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                eligible = (start["status"] not in (204, 304)
+                            and "content-encoding" not in headers
+                            and is_compressible(headers.get("content-type")))
+                if eligible:
+                    _add_vary(headers)
+                if more_body:
+                    # Streamed: trust Content-Length if the app sent one
+                    declared = headers.get("content-length")
+                    big_enough = declared is None or int(declared) >= COMPRESS_MIN_BYTES
+                else:
+                    big_enough = len(body) >= COMPRESS_MIN_BYTES
+                use = eligible and encoding is not None and big_enough
+                if eligible and encoding is not None and not big_enough:
+                    skipped_small.inc()
+                if use:
+                    headers["Content-Encoding"] = encoding
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag # Not byte-identical to the uncompressed tag any more
+                    compressed[encoding].inc()
+                    if more_body:
+                        del headers["content-length"]
+                        stream = _StreamCompressor(encoding)
+                    else:
+                        if len(body) > COMPRESS_THREAD_BYTES:
+                            body = await anyio.to_thread.run_sync(compress, body, encoding)
+                        else:
+                            body = compress(body, encoding)
+                        headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+                if use and not more_body:
+                    sent += len(body)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    _payload_stats(scope).observe(size, sent)
+                    return
+
+            if stream is not None:
+                body = stream.compress(body)
+                if not more_body:
+                    body += stream.finish()
+            sent += len(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+            if not more_body:
+                _payload_stats(scope).observe(size, sent)
+
+        await self.app(scope, receive, send_wrapper)
+
+class PrecompressedStaticFiles(StaticFiles):
+    # Serves x.br / x.gz (written by `python -m sql_app.compression static`)
+    # in place of x when the client accepts it and the variant is up to date
+    async def get_response(self, path: str, scope):
+        request_headers = Headers(scope=scope)
+        for encoding in accepted_encodings(request_headers.get("accept-encoding")):
+            full_path, variant = await anyio.to_thread.run_sync(self.lookup_path, path + STATIC_VARIANTS[encoding])
+            if variant is None or not stat.S_ISREG(variant.st_mode):
+                continue
+            _, original = await anyio.to_thread.run_sync(self.lookup_path, path)
+            if original is None or variant.st_mtime < original.st_mtime:
+                continue
+            media_type = mimetypes.guess_type(path)[0] or "text/plain"
+            response = FileResponse(full_path, stat_result=variant, media_type=media_type,
+                                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            static_precompressed.inc()
+            return response
+        return await super().get_response(path, scope)
+
+def precompress_directory(directory: str, log=print):
+    # Writes .gz (and .br if brotli is installed) next to each compressible file
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(tuple(STATIC_VARIANTS.values())):
+                continue
+            path = os.path.join(root, name)
+            if not is_compressible(mimetypes.guess_type(name)[0]) or os.path.getsize(path) < COMPRESS_MIN_BYTES:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(data, quality=11)
+            for encoding, payload in variants.items():
+                target = path + STATIC_VARIANTS[encoding]
+                if len(payload) >= len(data):
+                    continue
+                with open(target + ".tmp", "wb") as f:
+                    f.write(payload)
+                os.replace(target + ".tmp", target)
+                written += 1
+                log(f"{target}: {len(data)} -> {len(payload)} bytes")
+    return written
+
+def get_stats():
+    return {
+        "brotli_available": brotli is not None,
+        "min_bytes": COMPRESS_MIN_BYTES,
+        "budget_bytes": PAYLOAD_BUDGET_BYTES,
+        "compressed": {encoding: counter.snapshot() for encoding, counter in compressed.items()},
+        "skipped_small": skipped_small.snapshot(),
+        "static_precompressed": static_precompressed.snapshot(),
+        "endpoints": {name: stats.snapshot() for name, stats in sorted(payloads.items())},
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "static":
+        sys.exit("usage: python -m sql_app.compression static [directory]")
+    directory = sys.argv[2] if len(sys.argv) > 2 else "static"
+    print(f"{precompress_directory(directory)} precompressed files written")
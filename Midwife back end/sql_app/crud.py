@@ -1,51 +1,37 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import json
 import secrets
 import string
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased, selectinload
 from sqlalchemy import or_
-from . import models, schemas
-from sqlalchemy import or_, and_
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-
-# --- CONFIGURATION (Replace with your details) ---
-# For development, using Gmail App Password is easiest.
-# 1. Turn on 2-Step Verification in Google Account.
-# 2. Search for "App Passwords" and create one.
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-SENDER_EMAIL = "akithaperera6@gmail.com" # <--- REPLACE THIS
-SENDER_PASSWORD = "yorzrasoojnanqpd"   # <--- REPLACE THIS (16 chars)
-
-# Setup password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
+from . import care_plans, dashboard_events, mailer, models, pagination, passwords, principal_cache, route_plans, schemas
+from sqlalchemy import Date, or_, and_, case, func, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+
+# Password hashing (see passwords.py).
+# These run bcrypt inline; async endpoints hash with `await passwords.hash_password`
+# and pass the result in as `hashed_password`.
 def get_password_hash(password):
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    return pwd_context.hash(password_bytes)
+    return passwords.hash_sync(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_sync(plain_password, hashed_password)
+
+def set_password_hash(db: Session, model, record_id: int, hashed_password: str):
+    # Used for transparent rehash on login when BCRYPT_ROUNDS changes
+    db.query(model).filter(model.id == record_id).update({model.hashed_password: hashed_password})
+    db.commit()
 
 # --- Helper: Generate Random Password ---
 def generate_secure_password(length=10):
     alphabet = string.ascii_letters + string.digits + "!@#$%"
     return ''.join(secrets.choice(alphabet) for i in range(length))
 
-# --- Helper: Send Email ---
-def send_credentials_email(to_email, username, password, name):
-    try:
-        message = MIMEMultipart()
-        message["From"] = SENDER_EMAIL
-        message["To"] = to_email
-        message["Subject"] = "Welcome to Rakawaranaya - Your Credentials"
-
-        body = f"""
+# --- Credentials email (queued in the outbox, sent by mailer.py) ---
+def credentials_email(name, username, password):
+    subject = "Welcome to Rakawaranaya - Your Credentials"
+    body = f"""
         Dear {name},
 
         Welcome to the Rakawaranaya National Midwife System.
@@ -62,21 +48,7 @@ def send_credentials_email(to_email, username, password, name):
         Best regards,
         Ministry of Health (MOH)
         """
-        
-        message.attach(MIMEText(body, "plain"))
-
-        # Connect to Server
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls() # Secure the connection
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, to_email, message.as_string())
-        server.quit()
-        
-        print(f"Email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+    return subject, body
 
 # ---------------------------------------------------------
 # ------------------- MOH OFFICER CRUD --------------------
@@ -85,8 +57,9 @@ def send_credentials_email(to_email, username, password, name):
 def get_moh_officer_by_username(db: Session, username: str):
     return db.query(models.MOHOfficer).filter(models.MOHOfficer.username == username).first()
 
-def create_moh_officer(db: Session, moh: schemas.MOHOfficerCreate):
-    hashed_password = get_password_hash(moh.password)
+def create_moh_officer(db: Session, moh: schemas.MOHOfficerCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(moh.password)
     db_moh = models.MOHOfficer(
         username=moh.username, 
         hashed_password=hashed_password, 
@@ -109,24 +82,85 @@ def get_midwife(db: Session, midwife_id: int):
 def get_midwife_by_username(db: Session, username: str):
     return db.query(models.Midwife).filter(models.Midwife.username == username).first()
 
-def update_midwife_password(db: Session, midwife_id: int, password_data: schemas.PasswordChange):
+def get_all_midwives(db: Session, moh_area: str, cursor: str = None, limit: int = None):
+    # Full rows, one MOH area (the directory below is the light version)
+    query = db.query(models.Midwife).filter(models.Midwife.assigned_moh_area == moh_area)
+    return pagination.paginate(query, [models.Midwife.id], cursor, limit)
+
+# --- MOH midwife directory (one area, light rows, keyset paged) ---
+MIDWIFE_DIRECTORY_COLUMNS = [
+    models.Midwife.id, models.Midwife.username, models.Midwife.full_name, models.Midwife.nic,
+    models.Midwife.phone_number, models.Midwife.email, models.Midwife.service_grade,
+    models.Midwife.assigned_moh_area, models.Midwife.is_active,
+]
+# NULL names sort as '' so they can't fall between two cursors
+_directory_name = func.coalesce(models.Midwife.full_name, "").label("sort_name")
+MIDWIFE_DIRECTORY_SORTS = {
+    "name": [_directory_name, models.Midwife.id],
+    "username": [models.Midwife.username, models.Midwife.id],
+    "id": [models.Midwife.id],
+}
+
+def _midwife_active_filter(is_active: bool):
+    # is_active is NULL for rows created before the column had a default: those are active
+    if is_active:
+        return or_(models.Midwife.is_active == True, models.Midwife.is_active.is_(None))
+    return models.Midwife.is_active == False
+
+def _midwife_area_query(db: Session, moh_area: str, columns):
+    return db.query(*columns).filter(models.Midwife.assigned_moh_area == moh_area)
+
+def get_midwife_directory(db: Session, moh_area: str, search: str = None, is_active: bool = None,
+                          ids: List[int] = None, sort: str = "name", cursor: str = None, limit: int = 50):
+    # sort: name | username | id, "-" prefix for descending
+    descending = sort.startswith("-")
+    sort_columns = MIDWIFE_DIRECTORY_SORTS[sort.lstrip("-")]
+    query = _midwife_area_query(db, moh_area, MIDWIFE_DIRECTORY_COLUMNS + [_directory_name])
+    if search:
+        query = query.filter(or_(
+            models.Midwife.full_name.contains(search, autoescape=True),
+            models.Midwife.username.startswith(search, autoescape=True),
+            models.Midwife.nic.startswith(search, autoescape=True),
+        ))
+    if is_active is not None:
+        query = query.filter(_midwife_active_filter(is_active))
+    if ids:
+        query = query.filter(models.Midwife.id.in_(ids))
+    return pagination.paginate(query, sort_columns, cursor, limit, descending=descending)
+
+def get_midwife_directory_summary(db: Session, moh_area: str):
+    active = case((_midwife_active_filter(True), 1), else_=0)
+    row = _midwife_area_query(db, moh_area, [func.count(models.Midwife.id).label("total"), func.sum(active).label("active")]).one()
+    return {"total": row.total, "active": row.active or 0}
+
+# NOTE: The old password is verified by the endpoint (off the event loop) before this
+def update_midwife_password(db: Session, midwife_id: int, new_hash: str):
     db_midwife = get_midwife(db, midwife_id)
     if not db_midwife:
         return False
         
-    if not verify_password(password_data.old_password, db_midwife.hashed_password):
-        return False 
-        
-    new_hash = get_password_hash(password_data.new_password)
     db_midwife.hashed_password = new_hash
     db.add(db_midwife)
     db.commit()
     db.refresh(db_midwife)
+    principal_cache.invalidate("midwife", db_midwife.username)
     return True
 
+def set_midwife_active(db: Session, midwife_id: int, is_active: bool, moh_area: str):
+    # Suspend (False) or re-activate (True) a midwife account; None outside this MOH area
+    db_midwife = get_midwife(db, midwife_id)
+    if not db_midwife or db_midwife.assigned_moh_area != moh_area:
+        return None
+    db_midwife.is_active = is_active
+    db.commit()
+    db.refresh(db_midwife)
+    principal_cache.invalidate("midwife", db_midwife.username)
+    return db_midwife
+
 # Legacy function (Mobile App Registration - if needed)
-def create_midwife(db: Session, midwife: schemas.MidwifeCreate):
-    hashed_password = get_password_hash(midwife.password)
+def create_midwife(db: Session, midwife: schemas.MidwifeCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(midwife.password)
     db_midwife = models.Midwife(
         username=midwife.username, 
         hashed_password=hashed_password, 
@@ -138,7 +172,7 @@ def create_midwife(db: Session, midwife: schemas.MidwifeCreate):
     return db_midwife
 
 # --- WEB PORTAL: Full Midwife Registration with Auto-Credentials ---
-def register_full_midwife(db: Session, midwife_data: schemas.MidwifeRegistration):
+def register_full_midwife(db: Session, midwife_data: schemas.MidwifeRegistration, generated_password: str = None, hashed_password: str = None):
     # 1. Auto-set Username
     final_username = midwife_data.nic
     
@@ -156,14 +190,31 @@ def register_full_midwife(db: Session, midwife_data: schemas.MidwifeRegistration
         # Ideally, you'd return WHICH field failed, but returning None triggers the 400 error
         return None 
     
-    # 3. Generate Password
-    generated_password = generate_secure_password()
-    hashed_password = get_password_hash(generated_password)
+    # 3. Generate Password (the endpoint normally pre-generates + pre-hashes it)
+    if generated_password is None:
+        generated_password = generate_secure_password()
+        hashed_password = get_password_hash(generated_password)
     
     # 4. Create DB Object
     db_midwife = models.Midwife(
         username=final_username,
         hashed_password=hashed_password,
+        **_registration_columns(midwife_data)
+    )
+    
+    db.add(db_midwife)
+
+    # 5. Queue the credentials email in the same transaction (sent in the background)
+    if midwife_data.email:
+        subject, body = credentials_email(midwife_data.full_name, final_username, generated_password)
+        mailer.enqueue(db, midwife_data.email, subject, body)
+
+    db.commit()
+    db.refresh(db_midwife)
+    return db_midwife
+
+def _registration_columns(midwife_data: schemas.MidwifeRegistration):
+    return dict(
         full_name=midwife_data.full_name,
         nic=midwife_data.nic,
         date_of_birth=midwife_data.date_of_birth,
@@ -175,17 +226,47 @@ def register_full_midwife(db: Session, midwife_data: schemas.MidwifeRegistration
         assigned_moh_area=midwife_data.assigned_moh_area,
         is_active=midwife_data.is_active
     )
-    
-    db.add(db_midwife)
-    db.commit()
-    db.refresh(db_midwife)
-    
-    # 5. Send Email
-    print(f"\n[CREDENTIALS GENERATED] ...") 
-    if midwife_data.email:
-        send_credentials_email(midwife_data.email, final_username, generated_password, midwife_data.full_name)
-    
-    return db_midwife
+
+# --- Bulk registration (see midwife_import.py) ---
+def find_midwife_conflicts(db: Session, nics: List[str], emails: List[str], phones: List[str]):
+    # Which of these NICs / emails / phones are already taken? One query per import chunk.
+    # NICs are checked against username too (web-registered midwives use the NIC as username).
+    taken = {"nic": set(), "email": set(), "phone_number": set()}
+    conditions = []
+    if nics:
+        conditions += [models.Midwife.username.in_(nics), models.Midwife.nic.in_(nics)]
+    if emails:
+        conditions.append(models.Midwife.email.in_(emails))
+    if phones:
+        conditions.append(models.Midwife.phone_number.in_(phones))
+    if not conditions:
+        return taken
+    columns = (models.Midwife.username, models.Midwife.nic, models.Midwife.email, models.Midwife.phone_number)
+    for row in db.query(*columns).filter(or_(*conditions)):
+        taken["nic"].update(value for value in (row.username, row.nic) if value)
+        if row.email:
+            taken["email"].add(row.email.lower())
+        if row.phone_number:
+            taken["phone_number"].add(row.phone_number)
+    return taken
+
+def bulk_create_midwives(db: Session, registrations, mails):
+    # registrations: [(MidwifeRegistration, hashed_password)], mails: [(to, subject, body)].
+    # One multi-row INSERT for the midwives and one for their emails, in one transaction.
+    # Returns False (nothing written) if a concurrent registration took one of the keys.
+    rows = [
+        dict(username=midwife_data.nic, hashed_password=hashed_password, **_registration_columns(midwife_data))
+        for midwife_data, hashed_password in registrations
+    ]
+    try:
+        db.execute(models.Midwife.__table__.insert(), rows)
+        mailer.enqueue_many(db, mails)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
 # ---------------------------------------------------------
 # ---------------------- MOTHER CRUD ----------------------
 # ---------------------------------------------------------
@@ -196,32 +277,43 @@ def get_mother_by_nic(db: Session, nic: str):
 def get_mother(db: Session, mother_id: int):
     return db.query(models.Mother).filter(models.Mother.id == mother_id).first()
 
-def get_mothers_by_midwife(db: Session, midwife_id: int, skip: int = 0, limit: int = 100, search: str = None):
-    query = db.query(models.Mother).filter(models.Mother.midwife_id == midwife_id)
-    
+MOTHER_LIST_RELATIONSHIPS = (
+    # Lists included in schemas.Mother; selectin-loaded so a page costs a fixed number of queries
+    selectinload(models.Mother.health_records),
+    selectinload(models.Mother.pregnancy_records),
+    selectinload(models.Mother.delivery_records),
+    selectinload(models.Mother.antenatal_plans),
+)
+
+def get_mothers_by_midwife(db: Session, midwife_id: int, skip: int = 0, limit: int = 100, search: str = None, cursor: str = None):
     if search:
-        search_format = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Mother.full_name.like(search_format),
-                models.Mother.nic.like(search_format)
-            )
-        )
-        
-    return query.offset(skip).limit(limit).all()
+        # Indexed search (NIC prefix + name tokens), ordered by relevance (offset paging only)
+        return search_mothers(db, midwife_id, search, skip=skip, limit=limit, full=True)
 
-def create_mother(db: Session, mother: schemas.MotherCreate, midwife_id: int):
-    hashed_password = get_password_hash(mother.password)
+    query = db.query(models.Mother).filter(models.Mother.midwife_id == midwife_id)\
+        .options(*MOTHER_LIST_RELATIONSHIPS)
+    return pagination.paginate(query, [models.Mother.id], cursor, limit, skip=skip)
+
+def create_mother(db: Session, mother: schemas.MotherCreate, midwife_id: int, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(mother.password)
     db_mother = models.Mother(
         full_name=mother.full_name,
         nic=mother.nic,
         address=mother.address,
+        latitude=mother.latitude,
+        longitude=mother.longitude,
         contact_number=mother.contact_number,
         hashed_password=hashed_password,
         midwife_id=midwife_id
     )
     db.add(db_mother)
+    db.flush()
+    index_mother_name(db, db_mother)
+    adjust_midwife_stats(db, midwife_id, **mother_stats(db_mother.status, db_mother.risk_level))
+    touch_dashboard(db, midwife_id)
     db.commit()
+    dashboard_events.publish(midwife_id)
     db.refresh(db_mother)
     return db_mother
 
@@ -229,31 +321,208 @@ def update_mother(db: Session, mother_id: int, mother_update: schemas.MotherUpda
     db_mother = get_mother(db, mother_id)
     if not db_mother:
         return None
+    before = mother_stats(db_mother.status, db_mother.risk_level)
     
     update_data = mother_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_mother, key, value)
 
     db.add(db_mother)
+    if "full_name" in update_data:
+        index_mother_name(db, db_mother)
+    delta = stats_delta(before, mother_stats(db_mother.status, db_mother.risk_level))
+    if any(delta.values()):
+        adjust_midwife_stats(db, db_mother.midwife_id, **delta)
+        touch_dashboard(db, db_mother.midwife_id)
     db.commit()
+    if any(delta.values()):
+        dashboard_events.publish(db_mother.midwife_id)
     db.refresh(db_mother)
+    principal_cache.invalidate("mother", db_mother.nic)
     return db_mother
 
-def update_mother_password(db: Session, mother_id: int, password_data: schemas.PasswordChange):
+# --- Bulk registration / transfer ---
+def find_existing_mother_nics(db: Session, nics: List[str]):
+    # One IN query on the unique nic index instead of a lookup per mother
+    if not nics:
+        return set()
+    return {row.nic for row in db.query(models.Mother.nic).filter(models.Mother.nic.in_(nics))}
+
+def bulk_create_mothers(db: Session, registrations, midwife_id: int):
+    # registrations: [(MotherCreate, hashed_password)]. One multi-row INSERT for the
+    # mothers and one for their name tokens, in one transaction. Returns the new rows
+    # (in input order), or None (nothing written) if a concurrent request took a NIC.
+    rows = [
+        # Same columns as create_mother(); status / risk_level take the model defaults
+        dict(full_name=mother.full_name, nic=mother.nic, address=mother.address,
+             latitude=mother.latitude, longitude=mother.longitude, contact_number=mother.contact_number,
+             hashed_password=hashed_password, midwife_id=midwife_id)
+        for mother, hashed_password in registrations
+    ]
+    try:
+        db.execute(models.Mother.__table__.insert(), rows)
+        # MySQL can't return ids from a multi-row INSERT; nic is unique, so read them back
+        nics = [row["nic"] for row in rows]
+        created = {m.nic: m for m in db.query(models.Mother).filter(models.Mother.nic.in_(nics))}
+        tokens = [
+            {"mother_id": created[nic].id, "midwife_id": midwife_id, "token": token}
+            for nic, row in zip(nics, rows) for token in tokenize_search_text(row["full_name"])
+        ]
+        if tokens:
+            db.execute(models.MotherSearchToken.__table__.insert(), tokens)
+        # One counter UPDATE for the whole batch, not one per mother
+        added = {key: 0 for key in ("assigned_mothers", "high_risk_mothers")}
+        for db_mother in created.values():
+            for key, value in mother_stats(db_mother.status, db_mother.risk_level).items():
+                added[key] += value
+        adjust_midwife_stats(db, midwife_id, **added)
+        touch_dashboard(db, midwife_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    dashboard_events.publish(midwife_id)
+    return [created[nic] for nic in nics]
+
+def transfer_mothers(db: Session, transfer: schemas.MotherTransfer, moh_area: str = None):
+    # Moves the mothers, their search tokens and their future Scheduled visits to
+    # another midwife in one transaction: every id moves or none do.
+    # Returns (moved_count, appointments_moved, missing_ids).
+    ids = set(transfer.mother_ids)
+    query = db.query(models.Mother.id, models.Mother.nic, models.Mother.status, models.Mother.risk_level).filter(
+        models.Mother.id.in_(ids), models.Mother.midwife_id == transfer.from_midwife_id
+    )
+    if moh_area is not None:
+        area_midwives = select(models.Midwife.id).where(models.Midwife.assigned_moh_area == moh_area)
+        query = query.filter(models.Mother.midwife_id.in_(area_midwives))
+    locked = query.with_for_update().all()
+    found = {row.id: row.nic for row in locked}
+    missing = sorted(ids - set(found))
+    if missing:
+        db.rollback()
+        return 0, 0, missing
+
+    moved = db.query(models.Mother).filter(models.Mother.id.in_(ids)).update(
+        {models.Mother.midwife_id: transfer.to_midwife_id}, synchronize_session=False
+    )
+    db.query(models.MotherSearchToken).filter(models.MotherSearchToken.mother_id.in_(ids)).update(
+        {models.MotherSearchToken.midwife_id: transfer.to_midwife_id}, synchronize_session=False
+    )
+    # Past and completed visits stay with the midwife who made them
+    appointments_moved = db.query(models.Appointment).filter(
+        models.Appointment.mother_id.in_(ids),
+        models.Appointment.midwife_id == transfer.from_midwife_id,
+        models.Appointment.status == "Scheduled",
+        models.Appointment.date_time >= datetime.now(),
+    ).update({models.Appointment.midwife_id: transfer.to_midwife_id}, synchronize_session=False)
+    moved_stats = {key: 0 for key in ("assigned_mothers", "high_risk_mothers")}
+    for row in locked:
+        for key, value in mother_stats(row.status, row.risk_level).items():
+            moved_stats[key] += value
+    adjust_midwife_stats(db, transfer.from_midwife_id, **{key: -value for key, value in moved_stats.items()})
+    adjust_midwife_stats(db, transfer.to_midwife_id, **moved_stats)
+    touch_dashboard(db, transfer.from_midwife_id, transfer.to_midwife_id)
+    if appointments_moved:
+        touch_portal(db, list(ids), "appointments") # Their midwife_id changed
+    db.commit()
+    dashboard_events.publish(transfer.from_midwife_id, transfer.to_midwife_id)
+    for nic in found.values():
+        principal_cache.invalidate("mother", nic)
+    return moved, appointments_moved, []
+
+# NOTE: The old password is verified by the endpoint (off the event loop) before this
+def update_mother_password(db: Session, mother_id: int, new_hash: str):
     db_mother = get_mother(db, mother_id)
     if not db_mother:
         return False
         
-    if not verify_password(password_data.old_password, db_mother.hashed_password):
-        return False 
-        
-    new_hash = get_password_hash(password_data.new_password)
     db_mother.hashed_password = new_hash
     db.add(db_mother)
     db.commit()
     db.refresh(db_mother)
+    principal_cache.invalidate("mother", db_mother.nic)
     return True
 
+# ---------------------------------------------------------
+# --------------------- MOTHER SEARCH ---------------------
+# ---------------------------------------------------------
+# Typeahead for the mother list / select-mother screens.
+# - NIC: prefix match on the (midwife_id, nic) index
+# - Name: every word of full_name is stored lower-cased in mother_search_tokens
+#   (maintained on write by index_mother_name); each search word must
+#   prefix-match one of the mother's name words.
+# Relevance: NIC prefix hit > more exact (whole-word) name matches, then name.
+
+SEARCH_TOKEN_LENGTH = 64
+SEARCH_CANDIDATE_LIMIT = 100
+
+def tokenize_search_text(value: str):
+    words = "".join(ch if ch.isalnum() else " " for ch in (value or "").lower()).split()
+    return list(dict.fromkeys(word[:SEARCH_TOKEN_LENGTH] for word in words))
+
+def index_mother_name(db: Session, db_mother: models.Mother):
+    # Rebuild this mother's name tokens (call inside the same transaction as the write)
+    db.query(models.MotherSearchToken).filter(models.MotherSearchToken.mother_id == db_mother.id)\
+        .delete(synchronize_session=False)
+    db.add_all([
+        models.MotherSearchToken(mother_id=db_mother.id, midwife_id=db_mother.midwife_id, token=token)
+        for token in tokenize_search_text(db_mother.full_name)
+    ])
+
+def _prefix_range(column, prefix: str):
+    # Same as LIKE 'prefix%' but always an index range scan (SQLite skips the
+    # index for LIKE on case-sensitive columns) and no wildcard escaping needed
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+def search_mothers(db: Session, midwife_id: int, term: str, skip: int = 0, limit: int = 20, full: bool = False):
+    # full=True also loads the lists in schemas.Mother (for /mothers/?search=)
+    term = (term or "").strip()
+    words = tokenize_search_text(term)
+    if not term:
+        return []
+
+    # Each side is an index range scan that stops after SEARCH_CANDIDATE_LIMIT
+    # rows, so a one-letter prefix costs the same as a full name. Exact tokens
+    # sort first inside a prefix range, so they are never cut off.
+    cap = max(SEARCH_CANDIDATE_LIMIT, skip + limit)
+    nic_hits = select(models.Mother.id.label("mother_id"), literal(1).label("nic_hit"))\
+        .where(models.Mother.midwife_id == midwife_id,
+               _prefix_range(models.Mother.nic, term.upper()))\
+        .order_by(models.Mother.nic).limit(cap)
+    candidates = [nic_hits.subquery().select()]
+    if words:
+        # Scan on the longest (most selective) word; the other words must match
+        # another token of the same mother
+        Token = models.MotherSearchToken
+        driving = max(words, key=len)
+        name_hits = select(Token.mother_id, literal(0).label("nic_hit"))\
+            .where(Token.midwife_id == midwife_id, _prefix_range(Token.token, driving))
+        for word in words:
+            if word == driving:
+                continue
+            other = aliased(Token)
+            name_hits = name_hits.where(
+                select(other.id).where(other.mother_id == Token.mother_id,
+                                       _prefix_range(other.token, word)).exists()
+            )
+        name_hits = name_hits.order_by(Token.token, Token.id).limit(cap)
+        candidates.append(name_hits.subquery().select())
+
+    hits = union_all(*candidates).subquery()
+    scored = select(hits.c.mother_id, (func.max(hits.c.nic_hit) * 100).label("nic_score"))\
+        .group_by(hits.c.mother_id).subquery()
+    Token = models.MotherSearchToken
+    exact = select(func.count(Token.id)).where(Token.mother_id == scored.c.mother_id, Token.token.in_(words))\
+        .correlate(scored).scalar_subquery() if words else literal(0)
+
+    query = db.query(models.Mother).join(scored, scored.c.mother_id == models.Mother.id)\
+        .filter(models.Mother.midwife_id == midwife_id)\
+        .order_by((scored.c.nic_score + exact).desc(), models.Mother.full_name, models.Mother.id)
+    if full:
+        query = query.options(*MOTHER_LIST_RELATIONSHIPS)
+    return query.offset(skip).limit(limit).all()
+
 # ---------------------------------------------------------
 # ------------------ HEALTH RECORDS CRUD ------------------
 # ---------------------------------------------------------
@@ -265,8 +534,9 @@ def create_health_record(db: Session, record: schemas.HealthRecordCreate, mother
     db.refresh(db_record)
     return db_record
 
-def get_health_records_for_mother(db: Session, mother_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.HealthRecord).filter(models.HealthRecord.mother_id == mother_id).offset(skip).limit(limit).all()
+def get_health_records_for_mother(db: Session, mother_id: int, skip: int = 0, limit: int = 100, cursor: str = None):
+    query = db.query(models.HealthRecord).filter(models.HealthRecord.mother_id == mother_id)
+    return pagination.paginate(query, [models.HealthRecord.id], cursor, limit, skip=skip)
 
 # ---------------------------------------------------------
 # ----------------- PREGNANCY RECORDS CRUD ----------------
@@ -275,6 +545,7 @@ def get_health_records_for_mother(db: Session, mother_id: int, skip: int = 0, li
 def create_pregnancy_record(db: Session, record: schemas.PregnancyRecordCreate, mother_id: int):
     db_record = models.PregnancyRecord(**record.dict(), mother_id=mother_id)
     db.add(db_record)
+    touch_portal(db, [mother_id], "pregnancy_records")
     db.commit()
     db.refresh(db_record)
     return db_record
@@ -289,6 +560,7 @@ def get_pregnancy_records_for_mother(db: Session, mother_id: int):
 def create_delivery_record(db: Session, record: schemas.DeliveryRecordCreate, mother_id: int):
     db_record = models.DeliveryRecord(**record.dict(), mother_id=mother_id)
     db.add(db_record)
+    touch_portal(db, [mother_id], "delivery_records")
     db.commit()
     db.refresh(db_record)
     return db_record
@@ -303,6 +575,7 @@ def get_delivery_records_for_mother(db: Session, mother_id: int):
 def create_antenatal_plan(db: Session, plan: schemas.AntenatalPlanCreate, mother_id: int):
     db_plan = models.AntenatalPlan(**plan.dict(), mother_id=mother_id)
     db.add(db_plan)
+    touch_portal(db, [mother_id], "antenatal_plans")
     db.commit()
     db.refresh(db_plan)
     return db_plan
@@ -322,20 +595,266 @@ def create_appointment(db: Session, appointment: schemas.AppointmentCreate, midw
         status="Scheduled"
     )
     db.add(db_appointment)
+    touch_dashboard(db, midwife_id)
+    touch_portal(db, [mother_id], "appointments")
     db.commit()
+    dashboard_events.publish(midwife_id)
+    route_plans.invalidate(midwife_id, db_appointment.date_time.date())
     db.refresh(db_appointment)
     return db_appointment
 
-def get_appointments_by_mother(db: Session, mother_id: int):
-    return db.query(models.Appointment).filter(models.Appointment.mother_id == mother_id).order_by(models.Appointment.date_time.asc()).all()
+APPOINTMENT_ORDER = [models.Appointment.date_time, models.Appointment.id]
 
-def get_appointments_by_midwife(db: Session, midwife_id: int, start_date=None, end_date=None):
+def get_appointments_by_mother(db: Session, mother_id: int, cursor: str = None, limit: int = None):
+    query = db.query(models.Appointment).filter(models.Appointment.mother_id == mother_id)
+    return pagination.paginate(query, APPOINTMENT_ORDER, cursor, limit)
+
+def get_appointments_by_midwife(db: Session, midwife_id: int, start_date=None, end_date=None, cursor: str = None, limit: int = None):
     query = db.query(models.Appointment).filter(models.Appointment.midwife_id == midwife_id)
     if start_date:
         query = query.filter(models.Appointment.date_time >= start_date)
     if end_date:
         query = query.filter(models.Appointment.date_time <= end_date)
-    return query.order_by(models.Appointment.date_time.asc()).all()
+    return pagination.paginate(query, APPOINTMENT_ORDER, cursor, limit)
+
+# --- Calendar: month overview as counts, detail one day at a time ---
+def get_calendar_month(db: Session, midwife_id: int, year: int, month: int):
+    # One grouped query over ix_appointments_midwife_date for the whole month
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    day = func.date(models.Appointment.date_time, type_=Date)
+    rows = db.query(day, models.Appointment.visit_type, func.count(models.Appointment.id)).filter(
+        models.Appointment.midwife_id == midwife_id,
+        models.Appointment.date_time >= start,
+        models.Appointment.date_time < end,
+    ).group_by(day, models.Appointment.visit_type).all()
+    days = {}
+    for visit_day, visit_type, count in rows:
+        entry = days.setdefault(visit_day, {"day": visit_day, "total": 0, "by_type": {}})
+        entry["total"] += count
+        entry["by_type"][visit_type or "Other"] = entry["by_type"].get(visit_type or "Other", 0) + count
+    return {"year": year, "month": month, "total": sum(entry["total"] for entry in days.values()),
+            "days": [days[visit_day] for visit_day in sorted(days)]}
+
+def get_calendar_day(db: Session, midwife_id: int, day: date):
+    # The day's visits with the mother's name / address / phone (no second call for mothers)
+    start = datetime.combine(day, datetime.min.time())
+    rows = db.query(models.Appointment, models.Mother.full_name, models.Mother.address,
+                    models.Mother.contact_number)\
+        .join(models.Mother, models.Mother.id == models.Appointment.mother_id)\
+        .filter(models.Appointment.midwife_id == midwife_id,
+                models.Appointment.date_time >= start,
+                models.Appointment.date_time < start + timedelta(days=1))\
+        .order_by(models.Appointment.date_time, models.Appointment.id).all()
+    visits = []
+    for appointment, full_name, address, contact_number in rows:
+        appointment.mother_name = full_name
+        appointment.mother_address = address
+        appointment.mother_contact_number = contact_number
+        visits.append(appointment)
+    return visits
+
+HOME_VISIT_TYPE = "Home Visit"
+
+def get_home_visit_plan(db: Session, midwife_id: int, day: date, start=None):
+    # The day's Scheduled home visits in route order, see route_plans.py.
+    # Returns (plan, fingerprint); the plan is only rebuilt when the visits changed.
+    begin = datetime.combine(day, datetime.min.time())
+    rows = db.query(models.Appointment.id, models.Appointment.mother_id, models.Appointment.date_time,
+                    models.Appointment.notes, models.Mother.full_name, models.Mother.address,
+                    models.Mother.contact_number, models.Mother.latitude, models.Mother.longitude)\
+        .join(models.Mother, models.Mother.id == models.Appointment.mother_id)\
+        .filter(models.Appointment.midwife_id == midwife_id,
+                models.Appointment.visit_type == HOME_VISIT_TYPE,
+                models.Appointment.status == "Scheduled",
+                models.Appointment.date_time >= begin,
+                models.Appointment.date_time < begin + timedelta(days=1))\
+        .order_by(models.Appointment.date_time, models.Appointment.id).all()
+    visits = [
+        {"appointment_id": row.id, "mother_id": row.mother_id, "mother_name": row.full_name,
+         "address": row.address, "contact_number": row.contact_number, "date_time": row.date_time,
+         "notes": row.notes, "latitude": row.latitude, "longitude": row.longitude}
+        for row in rows
+    ]
+    return route_plans.get_plan(midwife_id, day, visits, start)
+
+# --- Home dashboard (see dashboard_events.py) ---
+def touch_dashboard(db: Session, *midwife_ids: int):
+    # Call before commit in any write that changes what the dashboard shows;
+    # call dashboard_events.publish() with the same ids after the commit.
+    db.query(models.Midwife).filter(models.Midwife.id.in_(midwife_ids)).update(
+        {models.Midwife.dashboard_version: func.coalesce(models.Midwife.dashboard_version, 0) + 1},
+        synchronize_session=False,
+    )
+
+def get_dashboard_versions(db: Session, midwife_ids):
+    rows = db.query(models.Midwife.id, models.Midwife.dashboard_version).filter(models.Midwife.id.in_(midwife_ids))
+    return {row.id: row.dashboard_version or 0 for row in rows}
+
+# --- Mother portal lists (ETag / Last-Modified, see main.portal_not_modified) ---
+PORTAL_RESOURCES = ("pregnancy_records", "delivery_records", "antenatal_plans", "appointments")
+
+def touch_portal(db: Session, mother_ids: List[int], *resources: str):
+    # Call before commit in any write that changes one of these /my-* lists
+    values = {}
+    for resource in resources:
+        version = getattr(models.Mother, f"{resource}_version")
+        values[version] = func.coalesce(version, 0) + 1
+        values[getattr(models.Mother, f"{resource}_modified_at")] = datetime.now()
+    db.query(models.Mother).filter(models.Mother.id.in_(mother_ids)).update(values, synchronize_session=False)
+
+def get_portal_version(db: Session, mother_id: int, resource: str):
+    # (version, modified_at): two columns of one primary-key row, nothing else
+    return db.query(getattr(models.Mother, f"{resource}_version"),
+                    getattr(models.Mother, f"{resource}_modified_at"))\
+             .filter(models.Mother.id == mother_id).first()
+
+def get_dashboard_stats(db: Session, midwife_id: int):
+    # One primary-key read of midwives + midwife_stats (the counters are kept
+    # up to date on write, see MIDWIFE STATS below)
+    row = db.query(models.Midwife.dashboard_version, models.MidwifeStats)\
+        .outerjoin(models.MidwifeStats, models.MidwifeStats.midwife_id == models.Midwife.id)\
+        .filter(models.Midwife.id == midwife_id).first()
+    if row is not None and row.MidwifeStats is None:
+        reconcile_midwife_stats(db, [midwife_id]) # First read for a new midwife
+        return get_dashboard_stats(db, midwife_id)
+    version, stats = row if row is not None else (0, models.MidwifeStats())
+    return {
+        "assigned_mothers": stats.assigned_mothers or 0,
+        "todays_visits": (stats.completed_today or 0) if stats.completed_today_date == date.today() else 0,
+        "high_risk_mothers": stats.high_risk_mothers or 0,
+        "pending_leave": stats.pending_leave or 0,
+        "missed_visits": stats.missed_visits or 0,
+        "version": version or 0,
+    }
+
+# ---------------------------------------------------------
+# ---------------------- MIDWIFE STATS --------------------
+# ---------------------------------------------------------
+# midwife_stats holds the dashboard counters so reading them is a primary-key
+# lookup instead of four COUNTs. Every write that can change one adjusts it
+# in the same transaction with adjust_midwife_stats(); a missing row is left
+# alone there and built from the real tables on the next read.
+# reconcile_midwife_stats() recounts from scratch and repairs any drift (run
+# periodically by midwife_stats.py, and by migration 9 as the backfill).
+
+STATS_COUNTERS = ("assigned_mothers", "high_risk_mothers", "pending_leave", "completed_today", "missed_visits")
+RECONCILE_CHUNK_SIZE = 200
+MISSED_WINDOW_DAYS = 7 # missed_visits counts the visits missed in this many days before today
+
+def mother_stats(status: str, risk_level: str):
+    # What one mother adds to her midwife's counters
+    return {"assigned_mothers": 1,
+            "high_risk_mothers": int(status in ACTIVE_CARE_STATUSES and risk_level == "High")}
+
+def missed_window_start():
+    return datetime.combine(date.today() - timedelta(days=MISSED_WINDOW_DAYS), datetime.min.time())
+
+def appointment_stats(status: str, date_time: datetime):
+    return {"completed_today": int(status == "Completed" and date_time is not None
+                                   and date_time.date() == date.today()),
+            "missed_visits": int(status == "Missed" and date_time is not None
+                                 and missed_window_start() <= date_time < datetime.combine(date.today(), datetime.min.time()))}
+
+def stats_delta(before: dict, after: dict):
+    return {key: after.get(key, 0) - before.get(key, 0) for key in set(before) | set(after)}
+
+def adjust_midwife_stats(db: Session, midwife_id: int, **deltas):
+    # Atomic "counter = counter + delta" (no read, no lost updates); does NOT commit
+    Stats = models.MidwifeStats
+    values = {}
+    for name in ("assigned_mothers", "high_risk_mothers", "pending_leave", "missed_visits"):
+        if deltas.get(name):
+            values[getattr(Stats, name)] = getattr(Stats, name) + deltas[name]
+    if deltas.get("completed_today"):
+        # The counter only covers completed_today_date; a stale day starts again from 0
+        today = date.today()
+        values[Stats.completed_today] = case(
+            (Stats.completed_today_date == today, Stats.completed_today + deltas["completed_today"]),
+            else_=max(deltas["completed_today"], 0),
+        )
+        values[Stats.completed_today_date] = today
+    if values:
+        db.query(Stats).filter(Stats.midwife_id == midwife_id).update(values, synchronize_session=False)
+
+def count_midwife_stats(db: Session, midwife_ids):
+    # The true counters, from the source tables (4 grouped queries)
+    counts = {midwife_id: dict.fromkeys(STATS_COUNTERS, 0) for midwife_id in midwife_ids}
+    high_risk = func.sum(case((and_(models.Mother.status.in_(ACTIVE_CARE_STATUSES),
+                                    models.Mother.risk_level == "High"), 1), else_=0))
+    for midwife_id, total, high in db.query(models.Mother.midwife_id, func.count(models.Mother.id), high_risk)\
+            .filter(models.Mother.midwife_id.in_(midwife_ids)).group_by(models.Mother.midwife_id):
+        counts[midwife_id].update(assigned_mothers=total, high_risk_mothers=int(high or 0))
+    for midwife_id, pending in db.query(models.LeaveRequest.midwife_id, func.count(models.LeaveRequest.id))\
+            .filter(models.LeaveRequest.midwife_id.in_(midwife_ids), models.LeaveRequest.status == "Pending")\
+            .group_by(models.LeaveRequest.midwife_id):
+        counts[midwife_id]["pending_leave"] = pending
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    for midwife_id, completed in db.query(models.Appointment.midwife_id, func.count(models.Appointment.id))\
+            .filter(models.Appointment.midwife_id.in_(midwife_ids),
+                    models.Appointment.date_time >= today_start,
+                    models.Appointment.date_time < today_start + timedelta(days=1),
+                    models.Appointment.status == "Completed")\
+            .group_by(models.Appointment.midwife_id):
+        counts[midwife_id]["completed_today"] = completed
+    for midwife_id, missed in db.query(models.Appointment.midwife_id, func.count(models.Appointment.id))\
+            .filter(models.Appointment.midwife_id.in_(midwife_ids),
+                    models.Appointment.date_time >= missed_window_start(),
+                    models.Appointment.date_time < today_start,
+                    models.Appointment.status == "Missed")\
+            .group_by(models.Appointment.midwife_id):
+        counts[midwife_id]["missed_visits"] = missed
+    return counts
+
+def reconcile_midwife_stats(db: Session, midwife_ids: List[int] = None, on_chunk=None):
+    # Recount and repair, RECONCILE_CHUNK_SIZE midwives per transaction. Each
+    # chunk starts a new transaction (commits whatever the session had open)
+    # and locks the stats rows first, before any plain read: on MySQL
+    # REPEATABLE READ the first plain SELECT fixes the snapshot, so the counts
+    # then see every write committed before the lock. A concurrent write
+    # either committed before that (and is counted) or waits for us on the
+    # stats row (and adds its delta after). Repaired dashboards are pushed to
+    # connected devices. on_chunk() runs after each commit (lease renewal).
+    if midwife_ids is None:
+        midwife_ids = [row.id for row in db.query(models.Midwife.id).order_by(models.Midwife.id)]
+    result = {"checked": 0, "created": 0, "repaired": 0}
+    today = date.today()
+    for start in range(0, len(midwife_ids), RECONCILE_CHUNK_SIZE):
+        chunk = midwife_ids[start:start + RECONCILE_CHUNK_SIZE]
+        db.commit() # Drop the snapshot of any earlier read (the id list, the caller's)
+        rows = {row.midwife_id: row for row in db.query(models.MidwifeStats)
+                .filter(models.MidwifeStats.midwife_id.in_(chunk)).with_for_update()}
+        now = datetime.now()
+        repaired = []
+        for midwife_id, counts in count_midwife_stats(db, chunk).items():
+            row = rows.get(midwife_id)
+            if row is None:
+                db.add(models.MidwifeStats(midwife_id=midwife_id, completed_today_date=today,
+                                           reconciled_at=now, **counts))
+                result["created"] += 1
+            else:
+                current = {key: getattr(row, key) for key in STATS_COUNTERS}
+                if row.completed_today_date != today:
+                    current["completed_today"] = 0
+                if current != counts:
+                    result["repaired"] += 1
+                    repaired.append(midwife_id)
+                for key, value in counts.items():
+                    setattr(row, key, value)
+                row.completed_today_date = today
+                row.reconciled_at = now
+            result["checked"] += 1
+        if repaired:
+            touch_dashboard(db, *repaired)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback() # A dashboard read created the row meanwhile; next run checks it
+            repaired = []
+        dashboard_events.publish(*repaired)
+        if on_chunk is not None:
+            on_chunk()
+    return result
 
 def get_mother_count_by_midwife(db: Session, midwife_id: int):
     return db.query(models.Mother).filter(models.Mother.midwife_id == midwife_id).count()
@@ -350,13 +869,24 @@ def get_todays_appointments_count(db: Session, midwife_id: int):
         models.Appointment.status == "Completed"
     ).count()
 
+def get_appointment(db: Session, appointment_id: int):
+    return db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+
 def update_appointment(db: Session, appointment_id: int, update_data: schemas.AppointmentUpdate):
     db_appt = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
     if db_appt:
+        before = appointment_stats(db_appt.status, db_appt.date_time)
+        old_day = db_appt.date_time.date()
         data_dict = update_data.dict(exclude_unset=True)
         for key, value in data_dict.items():
             setattr(db_appt, key, value)
+        adjust_midwife_stats(db, db_appt.midwife_id,
+                             **stats_delta(before, appointment_stats(db_appt.status, db_appt.date_time)))
+        touch_dashboard(db, db_appt.midwife_id)
+        touch_portal(db, [db_appt.mother_id], "appointments")
         db.commit()
+        dashboard_events.publish(db_appt.midwife_id)
+        route_plans.invalidate(db_appt.midwife_id, old_day, db_appt.date_time.date())
         db.refresh(db_appt)
     return db_appt
 
@@ -364,7 +894,13 @@ def delete_appointment(db: Session, appointment_id: int):
     db_appt = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
     if db_appt:
         db.delete(db_appt)
+        adjust_midwife_stats(db, db_appt.midwife_id,
+                             **stats_delta(appointment_stats(db_appt.status, db_appt.date_time), {}))
+        touch_dashboard(db, db_appt.midwife_id)
+        touch_portal(db, [db_appt.mother_id], "appointments")
         db.commit()
+        dashboard_events.publish(db_appt.midwife_id)
+        route_plans.invalidate(db_appt.midwife_id, db_appt.date_time.date())
         return True
     return False
 
@@ -379,8 +915,9 @@ def create_anc_visit(db: Session, visit: schemas.ANCVisitCreate):
 def get_anc_visit_by_appointment(db: Session, appointment_id: int):
     return db.query(models.ANCVisit).filter(models.ANCVisit.appointment_id == appointment_id).first()
 
-def get_mother_anc_visits(db: Session, mother_id: int):
-    return db.query(models.ANCVisit).filter(models.ANCVisit.mother_id == mother_id).order_by(models.ANCVisit.visit_date).all()
+def get_mother_anc_visits(db: Session, mother_id: int, cursor: str = None, limit: int = None):
+    query = db.query(models.ANCVisit).filter(models.ANCVisit.mother_id == mother_id)
+    return pagination.paginate(query, [models.ANCVisit.visit_date, models.ANCVisit.id], cursor, limit)
 
 # --- PNC Visits ---
 def create_pnc_visit(db: Session, visit: schemas.PNCVisitCreate):
@@ -393,115 +930,158 @@ def create_pnc_visit(db: Session, visit: schemas.PNCVisitCreate):
 def get_pnc_visit_by_appointment(db: Session, appointment_id: int):
     return db.query(models.PNCVisit).filter(models.PNCVisit.appointment_id == appointment_id).first()
 
-def get_mother_pnc_visits(db: Session, mother_id: int):
-    return db.query(models.PNCVisit).filter(models.PNCVisit.mother_id == mother_id).order_by(models.PNCVisit.visit_date).all()
+def get_mother_pnc_visits(db: Session, mother_id: int, cursor: str = None, limit: int = None):
+    query = db.query(models.PNCVisit).filter(models.PNCVisit.mother_id == mother_id)
+    return pagination.paginate(query, [models.PNCVisit.visit_date, models.PNCVisit.id], cursor, limit)
 
 
 
+# ---------------------------------------------------------
+# ------------------- MOTHER HEALTH FILE ------------------
+# ---------------------------------------------------------
+# One mother with the selected sections, each section one selectin query
+# (so a full file is 1 + 8 queries however many visits she has).
+
+HEALTH_FILE_SECTIONS = {
+    # section: (relationships to load, sort key)
+    "pregnancy": (("pregnancy_records", "past_pregnancies"), None),
+    "pregnancy_records": (("pregnancy_records",), lambda r: r.id),
+    "delivery_records": (("delivery_records",), lambda r: r.id),
+    "antenatal_plans": (("antenatal_plans",), lambda r: r.id),
+    "health_records": (("health_records",), lambda r: r.id),
+    "anc_visits": (("anc_visits",), lambda v: (v.visit_date, v.id)),
+    "pnc_visits": (("pnc_visits",), lambda v: (v.visit_date, v.id)),
+    "appointments": (("appointments",), lambda a: (a.date_time, a.id)), # APPOINTMENT_ORDER
+}
+
+def get_mother_health_file(db: Session, mother_id: int, sections):
+    relationships = {rel for section in sections for rel in HEALTH_FILE_SECTIONS[section][0]}
+    db_mother = db.query(models.Mother).filter(models.Mother.id == mother_id)\
+        .options(*[selectinload(getattr(models.Mother, rel)) for rel in sorted(relationships)])\
+        .first()
+    if not db_mother:
+        return None
+
+    health_file = {"mother": db_mother}
+    for section in sections:
+        _, sort_key = HEALTH_FILE_SECTIONS[section]
+        if sort_key is not None:
+            health_file[section] = sorted(getattr(db_mother, section), key=sort_key)
+    if "pregnancy" in sections and db_mother.pregnancy_records:
+        # Latest record, as get_pregnancy_record_by_mother (None-safe, tie-broken by id)
+        latest = max(db_mother.pregnancy_records, key=lambda r: (r.created_at or datetime.min, r.id))
+        health_file["pregnancy"] = {
+            "record_data": latest,
+            "past_history": sorted(db_mother.past_pregnancies, key=lambda p: p.id),
+            "risk_level": db_mother.risk_level or "Low",
+        }
+    return health_file
+
 # ---------------------------------------------------------
 # ------------------- RISK MANAGEMENT CRUD ----------------
 # ---------------------------------------------------------
 
+ACTIVE_CARE_STATUSES = ["Pregnant", "Postnatal"]
+
+def _latest_pregnancy_records(midwife_id: int):
+    # One row per active mother of this midwife: her most recent pregnancy record
+    # (same "latest" rule as get_pregnancy_record_by_mother, tie-broken by id)
+    row_number = func.row_number().over(
+        partition_by=models.PregnancyRecord.mother_id,
+        order_by=(models.PregnancyRecord.created_at.desc(), models.PregnancyRecord.id.desc())
+    ).label("rn")
+    ranked = select(models.PregnancyRecord, row_number)\
+        .join(models.Mother, models.Mother.id == models.PregnancyRecord.mother_id)\
+        .where(
+            models.Mother.midwife_id == midwife_id,
+            models.Mother.status.in_(ACTIVE_CARE_STATUSES)
+        ).subquery()
+    return select(ranked).where(ranked.c.rn == 1).subquery()
+
 def get_risk_stats(db: Session, midwife_id: int):
-    # Get all active mothers for this midwife
-    mothers = db.query(models.Mother).filter(
-        models.Mother.midwife_id == midwife_id,
-        models.Mother.status.in_(["Pregnant", "Postnatal"]) # Only active cases
-    ).all()
-    
-    stats = {
-        "total_high_risk": 0,
-        "diabetes": 0,
-        "cardiac": 0,
-        "age_risk": 0,
-        "history_pph": 0,
-        "fifth_pregnancy": 0
-    }
-    
-    for mother in mothers:
-        if mother.risk_level == "High":
-            stats["total_high_risk"] += 1
-            
-        # Check latest pregnancy record for specific risks
-        preg_record = get_pregnancy_record_by_mother(db, mother.id)
-        if preg_record:
-            if preg_record.risk_diabetes:
-                stats["diabetes"] += 1
-            if preg_record.risk_cardiac:
-                stats["cardiac"] += 1
-            if preg_record.risk_age_lt_20_gt_35:
-                stats["age_risk"] += 1
-            if preg_record.risk_history_pph:
-                stats["history_pph"] += 1
-            if preg_record.risk_5th_pregnancy:
-                stats["fifth_pregnancy"] += 1
-                
-    return stats
+    # Single aggregate over active mothers LEFT JOIN their latest pregnancy record
+    latest = _latest_pregnancy_records(midwife_id)
+
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    row = db.execute(
+        select(
+            count_where(models.Mother.risk_level == "High").label("total_high_risk"),
+            count_where(latest.c.risk_diabetes == True).label("diabetes"),
+            count_where(latest.c.risk_cardiac == True).label("cardiac"),
+            count_where(latest.c.risk_age_lt_20_gt_35 == True).label("age_risk"),
+            count_where(latest.c.risk_history_pph == True).label("history_pph"),
+            count_where(latest.c.risk_5th_pregnancy == True).label("fifth_pregnancy"),
+        )
+        .select_from(models.Mother)
+        .outerjoin(latest, latest.c.mother_id == models.Mother.id)
+        .where(
+            models.Mother.midwife_id == midwife_id,
+            models.Mother.status.in_(ACTIVE_CARE_STATUSES) # Only active cases
+        )
+    ).one()
+
+    return {key: int(value) for key, value in row._mapping.items()}
+
+# risk_type -> PregnancyRecord flag column
+RISK_TYPE_FLAGS = {
+    "diabetes": "risk_diabetes",
+    "cardiac": "risk_cardiac",
+    "age": "risk_age_lt_20_gt_35",
+    "pph": "risk_history_pph",
+    "gravidity": "risk_5th_pregnancy",
+    "malaria": "risk_malaria",
+    "renal": "risk_renal",
+}
+
+# Flag column -> label shown in the app's "Active Risks" list (display order)
+ACTIVE_RISK_LABELS = [
+    ("risk_age_lt_20_gt_35", "Age Risk"),
+    ("risk_5th_pregnancy", "Grand Multipara"),
+    ("risk_birth_interval_lt_1yr", "Short Birth Interval"),
+    ("risk_history_pph", "History of PPH"),
+    ("risk_diabetes", "Diabetes"),
+    ("risk_malaria", "History of Malaria"),
+    ("risk_cardiac", "Heart Disease"),
+    ("risk_renal", "Renal Disease"),
+]
 
 def get_mothers_by_risk(db: Session, midwife_id: int, risk_type: str):
-    # risk_type can be: "high_risk", "diabetes", "cardiac", "age", "pph", "gravidity"
-    
-    base_query = db.query(models.Mother).filter(
+    # risk_type can be: "high_risk", "diabetes", "cardiac", "age", "pph", "gravidity", "malaria", "renal"
+    # Each active mother appears once, matched against her LATEST pregnancy record only.
+    # Query count is fixed: 1 for mothers + risk flags, plus 1 per eager-loaded list.
+    latest = _latest_pregnancy_records(midwife_id)
+
+    query = db.query(
+        models.Mother,
+        latest.c.mother_age,
+        *[latest.c[flag] for flag, _ in ACTIVE_RISK_LABELS]
+    ).outerjoin(latest, latest.c.mother_id == models.Mother.id).filter(
         models.Mother.midwife_id == midwife_id,
-        models.Mother.status.in_(["Pregnant", "Postnatal"])
-    )
-    
-    if risk_type == "high_risk":
-        return base_query.filter(models.Mother.risk_level == "High").all()
-        
-    # For specific flags, we need to join with PregnancyRecord
-    # Note: This simple join works if there is only 1 pregnancy record per mother or we want any matching
-    # But get_pregnancy_record_by_mother logic is "latest". 
-    # For MVP SQL query:
-    query = base_query.join(models.PregnancyRecord).filter(models.PregnancyRecord.mother_id == models.Mother.id)
-    
+        models.Mother.status.in_(ACTIVE_CARE_STATUSES)
+    ).options(*MOTHER_LIST_RELATIONSHIPS)
 
+    if risk_type == "high_risk":
+        query = query.filter(models.Mother.risk_level == "High")
+    elif risk_type in RISK_TYPE_FLAGS:
+        query = query.filter(latest.c[RISK_TYPE_FLAGS[risk_type]] == True)
+    else:
+        # Unknown type: any mother that has a pregnancy record
+        query = query.filter(latest.c.id.isnot(None))
 
-    if risk_type == "diabetes":
-        query = query.filter(models.PregnancyRecord.risk_diabetes == True)
-    elif risk_type == "cardiac":
-        query = query.filter(models.PregnancyRecord.risk_cardiac == True)
-    elif risk_type == "age":
-        query = query.filter(models.PregnancyRecord.risk_age_lt_20_gt_35 == True)
-    elif risk_type == "pph":
-        query = query.filter(models.PregnancyRecord.risk_history_pph == True)
-    elif risk_type == "gravidity":
-        query = query.filter(models.PregnancyRecord.risk_5th_pregnancy == True)
-    elif risk_type == "malaria":
-        query = query.filter(models.PregnancyRecord.risk_malaria == True)
-    elif risk_type == "renal":
-        query = query.filter(models.PregnancyRecord.risk_renal == True)
-        
-    results = query.all()
-    
-    # Enrich with Age, POA, and Active Risks
+    # Enrich with Age, POA, and Active Risks (no extra queries)
     today = datetime.now().date()
-    for mother in results:
-        mother.active_risks = [] # Initialize list
-        
-        # 1. Get Age & Risks from latest pregnancy record
-        preg_record = get_pregnancy_record_by_mother(db, mother.id)
-        if preg_record:
-            if preg_record.mother_age:
-                mother.age = preg_record.mother_age
-            
-            # Populate Active Risks List
-            if preg_record.risk_age_lt_20_gt_35: mother.active_risks.append("Age Risk")
-            if preg_record.risk_5th_pregnancy: mother.active_risks.append("Grand Multipara")
-            if preg_record.risk_birth_interval_lt_1yr: mother.active_risks.append("Short Birth Interval")
-            if preg_record.risk_history_pph: mother.active_risks.append("History of PPH")
-            if preg_record.risk_diabetes: mother.active_risks.append("Diabetes")
-            if preg_record.risk_malaria: mother.active_risks.append("History of Malaria")
-            if preg_record.risk_cardiac: mother.active_risks.append("Heart Disease")
-            if preg_record.risk_renal: mother.active_risks.append("Renal Disease")
-        
-        # 2. Calculate POA
+    results = []
+    for row in query.order_by(models.Mother.id).all():
+        mother = row[0]
+        if row.mother_age:
+            mother.age = row.mother_age
+        mother.active_risks = [label for flag, label in ACTIVE_RISK_LABELS if row._mapping[flag]]
         if mother.pregnancy_start_date:
-            delta = today - mother.pregnancy_start_date
-            weeks = delta.days // 7
-            days = delta.days % 7
-            mother.poa = f"{weeks} Weeks"
-            
+            mother.poa = f"{(today - mother.pregnancy_start_date).days // 7} Weeks"
+        results.append(mother)
+
     return results
 
 
@@ -528,17 +1108,212 @@ def create_leave_request(db: Session, leave: schemas.LeaveRequestCreate, midwife
         status="Pending"
     )
     db.add(db_leave)
+    adjust_midwife_stats(db, midwife_id, pending_leave=1)
+    touch_dashboard(db, midwife_id)
+    db.commit()
+    dashboard_events.publish(midwife_id)
+    db.refresh(db_leave)
+    return db_leave
+
+def get_leave_requests_by_midwife(db: Session, midwife_id: int, cursor: str = None, limit: int = None):
+    query = db.query(models.LeaveRequest).filter(models.LeaveRequest.midwife_id == midwife_id)
+    return pagination.paginate(query, [models.LeaveRequest.id], cursor, limit)
+
+def _area_midwives(moh_area: str):
+    return select(models.Midwife.id).where(models.Midwife.assigned_moh_area == moh_area)
+
+def get_all_leave_requests(db: Session, moh_area: str, cursor: str = None, limit: int = None):
+    query = db.query(models.LeaveRequest).filter(models.LeaveRequest.midwife_id.in_(_area_midwives(moh_area)))
+    return pagination.paginate(query, [models.LeaveRequest.id], cursor, limit)
+
+def get_leave_request(db: Session, leave_id: int):
+    return db.query(models.LeaveRequest).filter(models.LeaveRequest.id == leave_id).first()
+
+# --- MOH leave queue ---
+LEAVE_QUEUE_ORDER = [models.LeaveRequest.start_date, models.LeaveRequest.id]
+
+def get_leave_request_queue(db: Session, moh_area: str, status: str = None, start_date: date = None,
+                            end_date: date = None, cursor: str = None, limit: int = 50):
+    # Requests of midwives in moh_area, joined with the midwife's name/area.
+    # start_date/end_date: only leave that overlaps this window.
+    query = db.query(
+        *models.LeaveRequest.__table__.columns,
+        models.Midwife.full_name.label("midwife_name"),
+        models.Midwife.assigned_moh_area.label("moh_area"),
+    ).join(models.Midwife, models.Midwife.id == models.LeaveRequest.midwife_id)\
+        .filter(models.Midwife.assigned_moh_area == moh_area)
+    if status:
+        query = query.filter(models.LeaveRequest.status == status)
+    if start_date:
+        query = query.filter(models.LeaveRequest.end_date >= start_date)
+    if end_date:
+        query = query.filter(models.LeaveRequest.start_date <= end_date)
+    return pagination.paginate(query, LEAVE_QUEUE_ORDER, cursor, limit)
+
+def update_leave_request(db: Session, leave_id: int, update: schemas.LeaveRequestUpdate, moh_area: str):
+    # None if there is no such request in this MOH area
+    db_leave = db.query(models.LeaveRequest).filter(
+        models.LeaveRequest.id == leave_id,
+        models.LeaveRequest.midwife_id.in_(_area_midwives(moh_area)),
+    ).first()
+    if not db_leave:
+        return None
+    pending_delta = int(update.status == "Pending") - int(db_leave.status == "Pending")
+    db_leave.status = update.status
+    db_leave.moh_comment = update.moh_comment
+    if pending_delta:
+        adjust_midwife_stats(db, db_leave.midwife_id, pending_leave=pending_delta)
+        touch_dashboard(db, db_leave.midwife_id)
     db.commit()
+    if pending_delta:
+        dashboard_events.publish(db_leave.midwife_id)
     db.refresh(db_leave)
     return db_leave
 
-def get_leave_requests_by_midwife(db: Session, midwife_id: int):
-    return db.query(models.LeaveRequest).filter(models.LeaveRequest.midwife_id == midwife_id).all()
+def bulk_update_leave_requests(db: Session, update: schemas.LeaveRequestBulkUpdate, moh_area: str):
+    # One transaction, one UPDATE: either every id (in this MOH area) changes or none do.
+    # Returns (updated_count, missing_ids).
+    ids = set(update.ids)
+    in_scope = and_(models.LeaveRequest.id.in_(ids), models.LeaveRequest.midwife_id.in_(_area_midwives(moh_area)))
+    locked = db.query(models.LeaveRequest.id, models.LeaveRequest.midwife_id, models.LeaveRequest.status)\
+        .filter(in_scope).with_for_update().all()
+    missing = sorted(ids - {row.id for row in locked})
+    if missing:
+        db.rollback()
+        return 0, missing
+    updated = db.query(models.LeaveRequest).filter(in_scope).update(
+        {models.LeaveRequest.status: update.status, models.LeaveRequest.moh_comment: update.moh_comment},
+        synchronize_session=False,
+    )
+    # Pending counter per midwife: rows leaving / entering Pending
+    pending_deltas = {}
+    for row in locked:
+        delta = int(update.status == "Pending") - int(row.status == "Pending")
+        pending_deltas[row.midwife_id] = pending_deltas.get(row.midwife_id, 0) + delta
+    changed = [midwife_id for midwife_id, delta in pending_deltas.items() if delta]
+    for midwife_id in changed:
+        adjust_midwife_stats(db, midwife_id, pending_leave=pending_deltas[midwife_id])
+    if changed:
+        touch_dashboard(db, *changed)
+    db.commit()
+    dashboard_events.publish(*changed)
+    return updated, []
 
-def get_all_leave_requests(db: Session):
-    return db.query(models.LeaveRequest).all()
+# ---------------------------------------------------------
+# --------------------- EMAIL OUTBOX ----------------------
+# ---------------------------------------------------------
 
-    return db_leave
+def get_outbox_counts(db: Session):
+    rows = db.query(models.EmailOutbox.status, func.count(models.EmailOutbox.id))\
+        .group_by(models.EmailOutbox.status).all()
+    return {status: count for status, count in rows}
+
+def requeue_dead_emails(db: Session):
+    # Give dead-lettered mail a fresh set of attempts (e.g. after fixing SMTP settings)
+    requeued = db.query(models.EmailOutbox).filter(models.EmailOutbox.status == "Dead").update(
+        {models.EmailOutbox.status: "Pending", models.EmailOutbox.attempts: 0,
+         models.EmailOutbox.next_attempt_at: datetime.now()},
+        synchronize_session=False,
+    )
+    db.commit()
+    return requeued
+
+# ---------------------------------------------------------
+# ------------------ NIGHTLY MAINTENANCE ------------------
+# ---------------------------------------------------------
+# The batch steps run by maintenance.py, plus the reads behind their
+# endpoints. Each step commits its own transactions.
+
+MAINTENANCE_CHUNK_SIZE = 500
+
+def mark_missed_appointments(db: Session, before: datetime, chunk_size: int = MAINTENANCE_CHUNK_SIZE,
+                             on_chunk=None):
+    # Scheduled visits dated before `before` become Missed, chunk_size per
+    # transaction. on_chunk() runs after each commit (lease renewal; raise to
+    # stop). Returns the number of visits marked.
+    Appointment = models.Appointment
+    window_start = missed_window_start()
+    marked = 0
+    while True:
+        chunk = db.query(Appointment.id, Appointment.midwife_id, Appointment.mother_id, Appointment.date_time)\
+            .filter(Appointment.status == "Scheduled", Appointment.date_time < before)\
+            .order_by(Appointment.date_time, Appointment.id).limit(chunk_size).with_for_update().all()
+        if not chunk:
+            break
+        db.query(Appointment).filter(Appointment.id.in_([row.id for row in chunk]))\
+          .update({Appointment.status: "Missed"}, synchronize_session=False)
+        in_window = {}
+        for row in chunk:
+            in_window[row.midwife_id] = in_window.get(row.midwife_id, 0) + int(row.date_time >= window_start)
+        for midwife_id, missed in in_window.items():
+            adjust_midwife_stats(db, midwife_id, missed_visits=missed)
+        touch_dashboard(db, *in_window)
+        touch_portal(db, sorted({row.mother_id for row in chunk}), "appointments")
+        db.commit()
+        dashboard_events.publish(*in_window)
+        marked += len(chunk)
+        if on_chunk is not None:
+            on_chunk()
+    return marked
+
+def rollup_appointment_counts(db: Session, day: date):
+    # Rebuilds appointment_daily_counts for one day (one transaction); returns rows written
+    Appointment, Daily = models.Appointment, models.AppointmentDailyCount
+    start = datetime.combine(day, datetime.min.time())
+    counts = {}
+    for midwife_id, status, total in db.query(Appointment.midwife_id, Appointment.status, func.count(Appointment.id))\
+            .filter(Appointment.date_time >= start, Appointment.date_time < start + timedelta(days=1))\
+            .group_by(Appointment.midwife_id, Appointment.status):
+        row = counts.setdefault(midwife_id, {"day": day, "midwife_id": midwife_id, "scheduled": 0,
+                                             "completed": 0, "cancelled": 0, "missed": 0})
+        column = (status or "Scheduled").lower()
+        if column in row:
+            row[column] += total
+    db.query(Daily).filter(Daily.day == day).delete(synchronize_session=False)
+    if counts:
+        db.execute(Daily.__table__.insert(), list(counts.values()))
+    db.commit()
+    return len(counts)
+
+def build_appointment_reminders(db: Session, day: date):
+    # Snapshot of the visits still Scheduled on `day` (one transaction). Lists
+    # of earlier days are dropped. Returns the number of reminders.
+    Appointment, Reminder = models.Appointment, models.AppointmentReminder
+    start = datetime.combine(day, datetime.min.time())
+    rows = db.query(Appointment.id, Appointment.midwife_id, Appointment.mother_id, Appointment.date_time,
+                    Appointment.visit_type, models.Mother.full_name, models.Mother.contact_number)\
+        .join(models.Mother, models.Mother.id == Appointment.mother_id)\
+        .filter(Appointment.status == "Scheduled", Appointment.date_time >= start,
+                Appointment.date_time < start + timedelta(days=1)).all()
+    db.query(Reminder).filter(or_(Reminder.visit_date == day, Reminder.visit_date < date.today()))\
+      .delete(synchronize_session=False)
+    if rows:
+        db.execute(Reminder.__table__.insert(), [
+            {"appointment_id": row.id, "visit_date": day, "midwife_id": row.midwife_id, "mother_id": row.mother_id,
+             "date_time": row.date_time, "visit_type": row.visit_type, "mother_name": row.full_name,
+             "contact_number": row.contact_number}
+            for row in rows
+        ])
+    db.commit()
+    return len(rows)
+
+def get_appointment_reminders(db: Session, midwife_id: int, day: date):
+    return db.query(models.AppointmentReminder).filter(
+        models.AppointmentReminder.midwife_id == midwife_id,
+        models.AppointmentReminder.visit_date == day,
+    ).order_by(models.AppointmentReminder.date_time).all()
+
+def get_appointment_daily_counts(db: Session, moh_area: str, start: date, end: date):
+    # Area totals per day from the nightly roll-up (days not rolled up yet are absent)
+    Daily = models.AppointmentDailyCount
+    rows = db.query(Daily.day, func.sum(Daily.scheduled), func.sum(Daily.completed),
+                    func.sum(Daily.cancelled), func.sum(Daily.missed)).filter(
+        Daily.midwife_id.in_(select(models.Midwife.id).where(models.Midwife.assigned_moh_area == moh_area)),
+        Daily.day >= start, Daily.day <= end,
+    ).group_by(Daily.day).order_by(Daily.day).all()
+    return [{"day": day, "scheduled": int(scheduled or 0), "completed": int(completed or 0),
+             "cancelled": int(cancelled or 0), "missed": int(missed or 0)}
+            for day, scheduled, completed, cancelled, missed in rows]
 
 # ---------------------------------------------------------
 # ---------------- SMART CARE PLAN LOGIC ------------------
@@ -563,6 +1338,7 @@ def start_pregnancy(db: Session, mother_id: int, data: schemas.PregnancyRecordCr
         db.add(db_past)
     
     # 4. Update Mother Status & Key Dates
+    before = mother_stats(db_mother.status, db_mother.risk_level)
     db_mother.status = "Pregnant"
     db_mother.risk_level = risk_level
     
@@ -577,39 +1353,23 @@ def start_pregnancy(db: Session, mother_id: int, data: schemas.PregnancyRecordCr
          # Fallback EDD calculation if not provided in record
          db_mother.delivery_date = data.lrmp + timedelta(days=280)
 
-    # 5. Generate Appointments
-    # Clear any existing future Scheduled appointments
-    db.query(models.Appointment).filter(
-        models.Appointment.mother_id == mother_id, 
-        models.Appointment.status == "Scheduled"
-    ).delete()
-
-    schedule_weeks = []
-    if risk_level == "High":
-        # Monthly from Month 3 to 9 (approx weeks 12, 16, 20, 24, 28, 32, 36, 40)
-        schedule_weeks = [12, 16, 20, 24, 28, 32, 36, 40]
-    else:
-        # Standard: Week 12, 26, 36 (Simplified Trimester Plan)
-        schedule_weeks = [12, 26, 36]
-
+    # 5. Generate Appointments from the active care plan: the ANC schedule replaces
+    # any other generated visits still ahead (e.g. PNC from a previous
+    # pregnancy); manual bookings stay
+    plan = care_plans.active_plan(db)
+    db_mother.care_plan_id = plan.id
     base_date = data.lrmp if data.lrmp else datetime.now().date() # Fallback
-
-    for week in schedule_weeks:
-        appt_date = base_date + timedelta(weeks=week)
-        # Check if date is in past? Maybe skip.
-        if appt_date > datetime.now().date():
-             db_appt = models.Appointment(
-                 mother_id=mother_id,
-                 midwife_id=db_mother.midwife_id, # REQUIRED
-                 date_time=datetime.combine(appt_date, datetime.min.time()),
-                 visit_type="Clinic", # Maps to 'visit_type', not 'type'
-                 status="Scheduled",
-                 notes=f"Generated Visit (Week {week})" # Maps to 'notes', not 'remarks'
-             )
-             db.add(db_appt)
+    apply_schedules(db, [(mother_id, db_mother.midwife_id,
+                          desired_schedule(plan, "Pregnant", risk_level, base_date, None))])
     
+    adjust_midwife_stats(db, db_mother.midwife_id,
+                         **stats_delta(before, mother_stats(db_mother.status, db_mother.risk_level)))
+    touch_dashboard(db, db_mother.midwife_id)
+    touch_portal(db, [mother_id], "pregnancy_records")
     db.commit()
+    dashboard_events.publish(db_mother.midwife_id)
     db.refresh(db_mother)
+    principal_cache.invalidate("mother", db_mother.nic)
     return db_mother
 
 def get_pregnancy_record_by_mother(db: Session, mother_id: int):
@@ -641,10 +1401,12 @@ def update_pregnancy_record(db: Session, mother_id: int, data: schemas.Pregnancy
     for item in past_history:
         db_past = models.PastPregnancy(**item.dict(), mother_id=mother_id)
         db.add(db_past)
+    touch_portal(db, [mother_id], "pregnancy_records")
 
     # 4. Update Mother Metadata (Risk, Status, Dates)
     db_mother = get_mother(db, mother_id)
     if db_mother:
+        before = mother_stats(db_mother.status, db_mother.risk_level)
         db_mother.risk_level = risk_level
         # Only update status if it's eligible/postnatal? No, keep it Pregnant if editing record.
         # But allow risk level change.
@@ -654,12 +1416,211 @@ def update_pregnancy_record(db: Session, mother_id: int, data: schemas.Pregnancy
             db_mother.delivery_date = data.edd
         elif data.lrmp:
             db_mother.delivery_date = data.lrmp + timedelta(days=280)
+        # New risk level / LMP: move the generated visits still ahead to match
+        apply_schedules(db, [(mother_id, db_mother.midwife_id, desired_schedule(
+            mother_plan(db, db_mother), db_mother.status, db_mother.risk_level, db_mother.pregnancy_start_date, db_mother.delivery_date))])
+        delta = stats_delta(before, mother_stats(db_mother.status, db_mother.risk_level))
+        if any(delta.values()):
+            adjust_midwife_stats(db, db_mother.midwife_id, **delta)
+            touch_dashboard(db, db_mother.midwife_id)
 
     db.commit()
+    if db_mother:
+        dashboard_events.publish(db_mother.midwife_id)
     db.refresh(db_mother)
+    principal_cache.invalidate("mother", db_mother.nic)
     return db_mother
 
 
+# ---------------------------------------------------------
+# --------------- CARE SCHEDULE GENERATION ----------------
+# ---------------------------------------------------------
+# Generated visits carry a schedule_key ("anc-<LMP>-w12", "pnc-<delivery>-d3");
+# manually booked ones have none and are never touched. desired_schedule()
+# works out the visits a mother should have under her care plan version
+# (care_plans.py), apply_schedules() diffs that against her generated rows:
+#   - a desired key with no row (in any status) is inserted
+#   - a Scheduled row after today whose key is no longer desired is deleted
+#   - a row whose key is still desired but whose date / visit type differ was
+#     rescheduled by hand (a key always maps to the same date), so it is kept
+#   - Completed / Cancelled rows and anything up to today are left alone
+# All inserts for a batch of mothers go out as one multi-row INSERT and all
+# deletes as one DELETE ... WHERE id IN (...). Keys don't depend on the plan
+# version, so moving a mother to a new version only touches the visits that differ.
+
+SCHEDULE_CHUNK_SIZE = 500
+
+def desired_schedule(plan, status: str, risk_level: str, pregnancy_start: date, delivery_date: date,
+                     include_past: bool = False):
+    # {schedule_key: (date_time, visit_type, notes)}, or None when there is no
+    # date to plan from (the mother's generated visits are then left as they are)
+    if status == "Pregnant":
+        if pregnancy_start is None:
+            return None
+        weeks = plan.anc_weeks["High" if risk_level == "High" else "Low"]
+        visits = [(f"anc-{pregnancy_start.isoformat()}-w{week}", pregnancy_start + timedelta(weeks=week),
+                   care_plans.ANC_VISIT_TYPE, f"Generated Visit (Week {week})") for week in weeks]
+        include_past = False # ANC visits already due are not booked after the fact
+    elif status == "Postnatal":
+        if delivery_date is None:
+            return None
+        visits = [(f"pnc-{delivery_date.isoformat()}-d{day}", delivery_date + timedelta(days=day),
+                   care_plans.PNC_VISIT_TYPE, f"PNC Visit {i + 1} (Day {day})") for i, day in enumerate(plan.pnc_days)]
+    else:
+        visits = []
+    today = date.today()
+    return {key: (datetime.combine(day, datetime.min.time()), visit_type, notes)
+            for key, day, visit_type, notes in visits if include_past or day > today}
+
+def apply_schedules(db: Session, plans):
+    # plans: [(mother_id, midwife_id, desired_schedule(...))]. Does NOT commit.
+    # Returns (inserted, deleted, ids of mothers whose visits changed).
+    plans = [plan for plan in plans if plan[2] is not None]
+    if not plans:
+        return 0, 0, set()
+    Appointment = models.Appointment
+    existing = {}
+    for row in db.query(Appointment.id, Appointment.mother_id, Appointment.schedule_key, Appointment.status,
+                        Appointment.date_time).filter(
+            Appointment.mother_id.in_([mother_id for mother_id, _, _ in plans]),
+            Appointment.schedule_key.isnot(None)):
+        existing.setdefault(row.mother_id, {})[row.schedule_key] = row
+
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    deletes, inserts, changed = [], [], set()
+    for mother_id, midwife_id, desired in plans:
+        rows = existing.get(mother_id, {})
+        removed = False
+        inserted_before = len(inserts)
+        for key, row in rows.items():
+            if row.status != "Scheduled" or row.date_time < tomorrow:
+                continue
+            if key not in desired:
+                deletes.append(row.id)
+                removed = True
+        for key, (date_time, visit_type, notes) in desired.items():
+            if key in rows:
+                continue
+            inserts.append({"mother_id": mother_id, "midwife_id": midwife_id, "date_time": date_time,
+                            "visit_type": visit_type, "status": "Scheduled", "notes": notes, "schedule_key": key})
+        if removed or len(inserts) > inserted_before:
+            changed.add(mother_id)
+
+    if deletes:
+        db.query(Appointment).filter(Appointment.id.in_(deletes)).delete(synchronize_session=False)
+    if inserts:
+        db.execute(Appointment.__table__.insert(), inserts)
+    if changed:
+        touch_portal(db, sorted(changed), "appointments")
+    return len(inserts), len(deletes), changed
+
+def mother_plan(db: Session, db_mother):
+    # The mother's care plan version; one without (never pregnant here) gets the active one
+    if db_mother.care_plan_id is not None:
+        plan = care_plans.get_plan(db, db_mother.care_plan_id)
+        if plan is not None:
+            return plan
+    plan = care_plans.active_plan(db)
+    db_mother.care_plan_id = plan.id
+    return plan
+
+def replan_schedules(db: Session, template_id: int = None, moh_area: str = None,
+                     chunk_size: int = SCHEDULE_CHUNK_SIZE):
+    # Re-applies the care plan to every Pregnant / Postnatal mother (of one MOH
+    # area, or all). With template_id, the mothers on any other version are
+    # moved to it first; without, each keeps her own version (e.g. to repair
+    # schedules). One transaction per chunk of mothers; their rows are locked so
+    # a concurrent run can't book the same visit twice. A run that stops halfway
+    # is simply started again: moved mothers are no longer selected.
+    Mother = models.Mother
+    if template_id is not None and care_plans.get_plan(db, template_id) is None:
+        raise LookupError(f"Care plan template {template_id} not found")
+    filters = [Mother.status.in_(ACTIVE_CARE_STATUSES)]
+    if moh_area is not None:
+        filters.append(Mother.midwife_id.in_(
+            select(models.Midwife.id).where(models.Midwife.assigned_moh_area == moh_area)))
+    if template_id is not None:
+        filters.append(or_(Mother.care_plan_id.is_(None), Mother.care_plan_id != template_id))
+    totals = {"mothers": 0, "changed": 0, "inserted": 0, "deleted": 0}
+    last_id = 0
+    while True:
+        chunk = db.query(Mother.id, Mother.midwife_id, Mother.status, Mother.risk_level,
+                         Mother.pregnancy_start_date, Mother.delivery_date, Mother.care_plan_id).filter(
+            *filters, Mother.id > last_id,
+        ).order_by(Mother.id).limit(chunk_size).with_for_update().all()
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        if template_id is not None:
+            db.query(Mother).filter(Mother.id.in_([m.id for m in chunk]))\
+              .update({Mother.care_plan_id: template_id}, synchronize_session=False)
+            plans = {}
+            default = care_plans.get_plan(db, template_id)
+        else:
+            plans = care_plans.get_plans(db, [m.care_plan_id for m in chunk if m.care_plan_id is not None])
+            default = care_plans.active_plan(db)
+        inserted, deleted, changed = apply_schedules(db, [
+            (m.id, m.midwife_id, desired_schedule(plans.get(m.care_plan_id, default), m.status, m.risk_level,
+                                                  m.pregnancy_start_date, m.delivery_date))
+            for m in chunk
+        ])
+        db.commit()
+        totals["mothers"] += len(chunk)
+        totals["changed"] += len(changed)
+        totals["inserted"] += inserted
+        totals["deleted"] += deleted
+    return totals
+
+def get_care_plan_templates(db: Session, moh_area: str):
+    # Newest first, each with how many active mothers of the area follow it
+    Mother = models.Mother
+    counts = dict(db.query(Mother.care_plan_id, func.count(Mother.id)).filter(
+        Mother.midwife_id.in_(select(models.Midwife.id).where(models.Midwife.assigned_moh_area == moh_area)),
+        Mother.status.in_(ACTIVE_CARE_STATUSES),
+    ).group_by(Mother.care_plan_id).all())
+    templates = db.query(models.CarePlanTemplate).order_by(models.CarePlanTemplate.version.desc()).all()
+    for template in templates:
+        template.active_mothers = counts.get(template.id, 0)
+    return templates
+
+def create_care_plan_template(db: Session, template: schemas.CarePlanTemplateCreate, created_by: str):
+    definition = {name: sorted(set(days)) for name, days in template.definition.dict().items()}
+    latest = db.query(func.max(models.CarePlanTemplate.version)).scalar() or 0
+    db_template = models.CarePlanTemplate(
+        version=latest + 1, name=template.name, definition=json.dumps(definition),
+        is_active=False, created_by=created_by, created_at=datetime.now(),
+    )
+    db.add(db_template)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        return None # Another version was created at the same moment; retry
+    if template.activate:
+        _activate(db, db_template.id)
+    db.commit()
+    care_plans.invalidate_active()
+    db.refresh(db_template)
+    return db_template
+
+def _activate(db: Session, template_id: int):
+    Template = models.CarePlanTemplate
+    db.query(Template).filter(Template.id != template_id, Template.is_active.is_(True))\
+      .update({Template.is_active: False}, synchronize_session=False)
+    db.query(Template).filter(Template.id == template_id)\
+      .update({Template.is_active: True}, synchronize_session=False)
+
+def activate_care_plan_template(db: Session, template_id: int):
+    # New pregnancies follow this version from now on (existing mothers: replan)
+    db_template = db.query(models.CarePlanTemplate).filter(models.CarePlanTemplate.id == template_id).first()
+    if not db_template:
+        return None
+    _activate(db, template_id)
+    db.commit()
+    care_plans.invalidate_active()
+    db.refresh(db_template)
+    return db_template
+
 def report_delivery(db: Session, mother_id: int, delivery_date: str):
     # 1. Get Mother
     db_mother = get_mother(db, mother_id)
@@ -673,36 +1634,22 @@ def report_delivery(db: Session, mother_id: int, delivery_date: str):
         dev_date = datetime.strptime(delivery_date, "%Y-%m-%dT%H:%M:%S.%f").date()
 
     # 3. Update Status
+    before = mother_stats(db_mother.status, db_mother.risk_level)
     db_mother.status = "Postnatal"
     db_mother.delivery_date = dev_date
     
-    # 4. Cancel Remaining ANC Appointments
-    db.query(models.Appointment).filter(
-        models.Appointment.mother_id == mother_id,
-        models.Appointment.visit_type == "ANC",
-        models.Appointment.status == "Scheduled"
-    ).delete()
-
-    # 5. Generate PNC Schedule
-    # Visit 1 (Days 1–5) -> Day 3
-    # Visit 2 (Days 5–10) -> Day 7
-    # Visit 3 (Days 11–28) -> Day 14
-    # Visit 4 (Around Day 42) -> Day 42
-    pnc_offsets = [3, 7, 14, 42]
-    
-    for i, day_offset in enumerate(pnc_offsets):
-        appt_date = dev_date + timedelta(days=day_offset)
-        db_appt = models.Appointment(
-            midwife_id=db_mother.midwife_id,
-            mother_id=mother_id,
-            date_time=datetime.combine(appt_date, datetime.min.time()),
-            visit_type="PNC",
-            status="Scheduled",
-            notes=f"PNC Visit {i+1} (Day {day_offset})"
-        )
-        db.add(db_appt)
-
+    # 4-5. Remaining generated ANC visits make way for the PNC schedule. PNC
+    # visits already due are booked too (late report), manual bookings stay.
+    plan = mother_plan(db, db_mother)
+    apply_schedules(db, [(mother_id, db_mother.midwife_id,
+                          desired_schedule(plan, "Postnatal", db_mother.risk_level, None, dev_date, include_past=True))])
+
+    adjust_midwife_stats(db, db_mother.midwife_id,
+                         **stats_delta(before, mother_stats(db_mother.status, db_mother.risk_level)))
+    touch_dashboard(db, db_mother.midwife_id)
     db.commit()
+    dashboard_events.publish(db_mother.midwife_id)
     db.refresh(db_mother)
+    principal_cache.invalidate("mother", db_mother.nic)
     return db_mother
             
\ No newline at end of file
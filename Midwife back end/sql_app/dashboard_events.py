@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+from datetime import date
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .database import SessionLocal
+
+# ---------------------------------------------------------
+# ---------------- DASHBOARD PUSH (WebSocket) -------------
+# ---------------------------------------------------------
+# The midwife home screen used to poll GET /midwives/dashboard-stats every
+# 30 seconds (a request per device per poll). Now it opens
+#
+#     ws://<host>/ws/midwives/dashboard?token=<midwife JWT>
+#
+# and receives:
+#     {"type": "snapshot", "assigned_mothers": 12, "todays_visits": 3,
+#      "high_risk_mothers": 2, "pending_leave": 0, "missed_visits": 1, "version": 41}
+#     {"type": "delta", "changes": {"todays_visits": 4}, "version": 42}
+#     {"type": "ping"}                      every DASHBOARD_HEARTBEAT_SECONDS
+#
+# Writes that change the dashboard bump midwives.dashboard_version in their
+# transaction (crud.touch_dashboard) and call publish() after the commit.
+# Only then are the counters read again: once per change per midwife, shared by
+# all of her open devices. A dashboard with nothing happening costs no queries.
+#
+# Each gunicorn worker has its own hub. The hubs of one host find each other
+# through DASHBOARD_PEER_DIR: every hub binds a Unix datagram socket there,
+# and publish() also sends the midwife ids to every other socket in it. That
+# covers writes made by another worker, and by `python -m sql_app.maintenance`
+# on the same host, without touching the database. A datagram a busy worker
+# can't take is dropped; the next change (or the day rollover) catches up.
+#
+# Workers on other hosts can't be reached that way. Deployments with more than
+# one host set DASHBOARD_SYNC_SECONDS: every worker then reads the versions of
+# the midwives connected to it once per interval, which costs one query per
+# worker per interval while any socket is open, even when nothing changes.
+# It is off by default for that reason.
+#
+# Clients that can't keep a socket open poll GET /midwives/dashboard-stats
+# with If-None-Match; an unchanged dashboard is answered with an empty 304
+# after one primary-key read.
+
+DASHBOARD_HEARTBEAT_SECONDS = float(os.getenv("DASHBOARD_HEARTBEAT_SECONDS", "25"))
+DASHBOARD_SYNC_SECONDS = float(os.getenv("DASHBOARD_SYNC_SECONDS", "0")) # Multi-host only, see above
+DASHBOARD_PEER_DIR = os.getenv("DASHBOARD_PEER_DIR", "" if os.getenv("VERCEL") else "/tmp/midwife-dashboard-peers")
+DASHBOARD_QUEUE_SIZE = 16 # Per connection; a client this far behind gets a fresh snapshot
+
+# --- Metrics ---
+connections = metrics.Counter()
+pushes = metrics.Counter()
+refreshes = metrics.Counter()
+sync_polls = metrics.Counter()
+peer_sends = metrics.Counter()
+peer_received = metrics.Counter()
+peer_drops = metrics.Counter() # Peer's receive buffer full
+
+logger = logging.getLogger(__name__)
+
+STAT_KEYS = ("assigned_mothers", "todays_visits", "high_risk_mothers", "pending_leave", "missed_visits")
+
+def _load_stats(midwife_id: int):
+    from . import crud
+    db = SessionLocal()
+    try:
+        return crud.get_dashboard_stats(db, midwife_id)
+    finally:
+        db.close()
+
+def _load_versions(midwife_ids):
+    from . import crud
+    db = SessionLocal()
+    try:
+        return crud.get_dashboard_versions(db, midwife_ids)
+    finally:
+        db.close()
+
+def _peer_paths(exclude=None):
+    try:
+        names = os.listdir(DASHBOARD_PEER_DIR)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(DASHBOARD_PEER_DIR, name) for name in names
+            if name.endswith(".sock") and os.path.join(DASHBOARD_PEER_DIR, name) != exclude]
+
+def notify_peers(midwife_ids, exclude=None):
+    # Tells the other hubs on this host which dashboards changed
+    if not DASHBOARD_PEER_DIR or not midwife_ids or not hasattr(socket, "AF_UNIX"):
+        return
+    message = ",".join(str(midwife_id) for midwife_id in midwife_ids).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+        sender.setblocking(False)
+        for path in _peer_paths(exclude):
+            try:
+                sender.sendto(message, path)
+                peer_sends.inc()
+            except BlockingIOError:
+                peer_drops.inc()
+            except ConnectionRefusedError:
+                # Left behind by a worker that died; nobody is bound to it
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except (FileNotFoundError, OSError) as e:
+                logger.debug("Dashboard peer %s unreachable: %s", path, e)
+
+class DashboardHub:
+    # All state lives on the event loop thread; publish() is the only entry
+    # point that may be called from other threads (crud runs in the threadpool).
+    def __init__(self):
+        self._loop = None
+        self._channels = {}  # midwife_id -> set of asyncio.Queue
+        self._stats = {}     # midwife_id -> last stats sent (with "version")
+        self._dirty = {}     # midwife_id -> changed again while its refresh was running
+        self._day = date.today()
+        self._watcher = None
+        self._peer_socket = None
+        self._peer_path = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._watcher = asyncio.create_task(self._watch())
+        if DASHBOARD_PEER_DIR and hasattr(socket, "AF_UNIX"):
+            try:
+                self._listen_to_peers()
+            except OSError as e:
+                logger.warning("Dashboard peer socket unavailable, other workers' writes won't be pushed: %s", e)
+
+    def _listen_to_peers(self):
+        os.makedirs(DASHBOARD_PEER_DIR, exist_ok=True)
+        path = os.path.join(DASHBOARD_PEER_DIR, f"{os.getpid()}-{secrets.token_hex(4)}.sock")
+        peer_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer_socket.bind(path)
+        peer_socket.setblocking(False)
+        self._peer_socket, self._peer_path = peer_socket, path
+        self._loop.add_reader(peer_socket.fileno(), self._on_peer_message)
+
+    def _on_peer_message(self):
+        while True:
+            try:
+                message = self._peer_socket.recv(4096)
+            except BlockingIOError:
+                return
+            peer_received.inc()
+            for part in message.split(b","):
+                if part.isdigit():
+                    self._changed(int(part))
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        if self._peer_socket is not None:
+            self._loop.remove_reader(self._peer_socket.fileno())
+            self._peer_socket.close()
+            try:
+                os.unlink(self._peer_path)
+            except FileNotFoundError:
+                pass
+            self._peer_socket = self._peer_path = None
+        self._loop = None
+
+    def publish(self, *midwife_ids: int):
+        # Also tells the other workers on this host (even when this hub isn't running: CLI, maintenance sidecar)
+        notify_peers(midwife_ids, exclude=self._peer_path)
+        loop = self._loop
+        if loop is None:
+            return # Hub not running (CLI, migrations, benchmarks)
+        for midwife_id in midwife_ids:
+            loop.call_soon_threadsafe(self._changed, midwife_id)
+
+    def _changed(self, midwife_id: int):
+        if midwife_id not in self._channels:
+            return # Nobody listening on this worker
+        if midwife_id in self._dirty:
+            self._dirty[midwife_id] = True # Coalesce into the running refresh
+            return
+        self._dirty[midwife_id] = False
+        asyncio.create_task(self._refresh(midwife_id))
+
+    async def _refresh(self, midwife_id: int):
+        try:
+            while True:
+                stats = await run_in_threadpool(_load_stats, midwife_id)
+                refreshes.inc()
+                self._push(midwife_id, stats)
+                if not self._dirty.get(midwife_id):
+                    break
+                self._dirty[midwife_id] = False
+        finally:
+            self._dirty.pop(midwife_id, None)
+
+    def _push(self, midwife_id: int, stats: dict):
+        if midwife_id not in self._channels:
+            return
+        previous = self._stats.get(midwife_id, {})
+        self._stats[midwife_id] = stats
+        changes = {key: stats[key] for key in STAT_KEYS if stats[key] != previous.get(key)}
+        if not changes:
+            return
+        message = {"type": "delta", "changes": changes, "version": stats["version"]}
+        for queue in self._channels[midwife_id]:
+            if queue.full():
+                # Slow client: drop what it hasn't read and send the whole state instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "snapshot", **stats})
+            else:
+                queue.put_nowait(message)
+            pushes.inc()
+
+    async def subscribe(self, midwife_id: int):
+        # Returns (queue, snapshot). Reuses the counts if another device of the
+        # same midwife is already connected to this worker.
+        queue = asyncio.Queue(maxsize=DASHBOARD_QUEUE_SIZE)
+        # Listen first, so a change committed while the counts load is not lost
+        self._channels.setdefault(midwife_id, set()).add(queue)
+        connections.inc()
+        if midwife_id not in self._stats:
+            try:
+                stats = await run_in_threadpool(_load_stats, midwife_id)
+            except Exception:
+                self.unsubscribe(midwife_id, queue)
+                raise
+            self._stats.setdefault(midwife_id, stats)
+        return queue, {"type": "snapshot", **self._stats[midwife_id]}
+
+    def unsubscribe(self, midwife_id: int, queue):
+        channel = self._channels.get(midwife_id)
+        if channel is None:
+            return
+        channel.discard(queue)
+        if not channel:
+            del self._channels[midwife_id]
+            self._stats.pop(midwife_id, None)
+
+    async def _watch(self):
+        # Day rollover resets "today's visits"; with DASHBOARD_SYNC_SECONDS, other
+        # hosts' writes show up as a newer dashboard_version. No queries while
+        # nobody is connected, and none at all between rollovers without sync.
+        interval = DASHBOARD_SYNC_SECONDS if DASHBOARD_SYNC_SECONDS > 0 else 60
+        while True:
+            await asyncio.sleep(interval)
+            if not self._channels:
+                continue
+            try:
+                if date.today() != self._day:
+                    self._day = date.today()
+                    stale = list(self._channels)
+                elif DASHBOARD_SYNC_SECONDS > 0:
+                    versions = await run_in_threadpool(_load_versions, list(self._channels))
+                    sync_polls.inc()
+                    stale = [midwife_id for midwife_id, version in versions.items()
+                             if midwife_id in self._stats and version != self._stats[midwife_id]["version"]]
+                else:
+                    stale = []
+                for midwife_id in stale:
+                    self._changed(midwife_id)
+            except Exception:
+                logger.exception("Dashboard sync failed")
+
+    def get_stats(self):
+        return {
+            "midwives_connected": len(self._channels),
+            "connections_open": sum(len(c) for c in self._channels.values()),
+            "connections_total": connections.snapshot(),
+            "pushes": pushes.snapshot(),
+            "refreshes": refreshes.snapshot(),
+            "sync_polls": sync_polls.snapshot(),
+            "peer_dir": DASHBOARD_PEER_DIR or None,
+            "peer_listening": self._peer_socket is not None,
+            "peer_sends": peer_sends.snapshot(),
+            "peer_received": peer_received.snapshot(),
+            "peer_drops": peer_drops.snapshot(),
+            "heartbeat_seconds": DASHBOARD_HEARTBEAT_SECONDS,
+            "sync_seconds": DASHBOARD_SYNC_SECONDS,
+        }
+
+hub = DashboardHub()
+
+def publish(*midwife_ids: int):
+    hub.publish(*midwife_ids)
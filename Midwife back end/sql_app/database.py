@@ -1,7 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from . import metrics
 
 # 1. Get the Database URL from environment variables (for Railway).
 # 2. If not found (running locally), use your hardcoded local connection.
@@ -19,6 +24,106 @@ if SQLALCHEMY_DATABASE_URL.startswith("mysql://"):
 elif SQLALCHEMY_DATABASE_URL.startswith("mysql+pymysql://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("mysql+pymysql://", "mysql+mysqlconnector://", 1)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# --- CONNECTION POOL SETTINGS ---
+# Defaults are sized for the Procfile (4 gunicorn workers, one pool each):
+# 4 x (5 + 10) = 60 connections max, well under MySQL's default 151.
+# DB_POOL_PROFILE=serverless (automatic on Vercel) uses NullPool instead,
+# because a frozen serverless instance can't keep idle connections alive.
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "serverless" if os.getenv("VERCEL") else "default")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # seconds waiting for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # seconds, keeps us below the server's idle cut-off
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+
+# Pool instrumentation (see get_pool_stats / GET /internal/pool-stats)
+pool_wait_ms = metrics.Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+pool_connects = metrics.Counter()
+pool_invalidations = metrics.Counter() # stale connections caught by pre-ping etc.
+
+class _TimedCheckoutMixin:
+    # Times how long a request waits for the pool to hand out a connection
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_ms.observe((time.perf_counter() - start) * 1000)
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_kwargs(poolclass):
+    if DB_POOL_PROFILE == "serverless":
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _instrument(sync_engine):
+    event.listen(sync_engine, "connect", lambda *args: pool_connects.inc())
+    event.listen(sync_engine, "invalidate", lambda *args: pool_invalidations.inc())
+
+def _pool_status(pool):
+    if isinstance(pool, NullPool):
+        return {"class": "NullPool"}
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+def get_pool_stats():
+    stats = {
+        "profile": DB_POOL_PROFILE,
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        },
+        "pid": os.getpid(),
+        "sync_pool": _pool_status(engine.pool),
+        "connects": pool_connects.snapshot(),
+        "invalidations": pool_invalidations.snapshot(),
+        "wait_ms": pool_wait_ms.snapshot(),
+    }
+    if async_engine is not None:
+        stats["async_pool"] = _pool_status(async_engine.pool)
+    return stats
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_kwargs(InstrumentedQueuePool))
+_instrument(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# --- ASYNC MODE (DB_ASYNC=1) ---
+# Requests then wait on MySQL through the aiomysql driver instead of holding a
+# threadpool thread each. The sync engine above is still used for migrations,
+# the seed/reset helpers and the background jobs.
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    SQLALCHEMY_DATABASE_URL.replace("mysql+mysqlconnector://", "mysql+aiomysql://", 1)
+)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, **_pool_kwargs(InstrumentedAsyncQueuePool))
+    _instrument(async_engine.sync_engine)
+    # expire_on_commit=False: attributes must stay readable after commit,
+    # because an expired attribute can't be lazily refreshed outside a greenlet.
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
\ No newline at end of file
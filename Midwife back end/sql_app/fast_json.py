@@ -0,0 +1,133 @@
+import os
+import time
+import typing
+from decimal import Decimal
+from functools import lru_cache
+from typing import List
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from . import metrics
+
+# ---------------------------------------------------------
+# ---------------- FAST JSON LIST RESPONSES ---------------
+# ---------------------------------------------------------
+# An endpoint that returns ORM rows with response_model=List[schemas.X] makes
+# FastAPI validate every row into the pydantic model, dump it back to dicts,
+# walk those again with jsonable_encoder and finally json.dumps() the lot.
+# For the wide list endpoints (mothers, pregnancy records, visits) that is
+# most of the request time. Endpoints opt in with
+#
+#     return fast_json.list_response(schemas.ANCVisit, visits, response)
+#
+# which builds the body with orjson in one pass:
+#   - trusted (default): the rows come from our own queries, so each schema
+#     is compiled once into a list of (field, default, nested encoder) and
+#     the attribute values go to orjson as they are; no validation at all
+#   - FAST_JSON_TRUSTED=0: validate once through a cached TypeAdapter
+#     (List[schema]) and encode that; use it when chasing a field mismatch
+# Schemas with validators, serializers or aliases always take the second way.
+#
+# The route keeps its response_model for the OpenAPI docs (a Response
+# returned directly is not run through it). FAST_JSON=0 hands the rows back
+# to FastAPI's normal path. Compare with: python benchmarks/json_responses.py
+
+FAST_JSON = os.getenv("FAST_JSON", "1").lower() in ("1", "true", "yes")
+FAST_JSON_TRUSTED = os.getenv("FAST_JSON_TRUSTED", "1").lower() in ("1", "true", "yes")
+
+# --- Metrics ---
+responses = metrics.Counter()
+rows_encoded = metrics.Counter()
+encode_ms = metrics.Histogram([1, 5, 10, 25, 50, 100, 250])
+
+def _default(value):
+    # The only column type orjson doesn't know; the schemas declare these as float
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def _nested_model(annotation):
+    # (model, is_list) for Model / Optional[Model] / List[Model], else (None, False)
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _nested_model(args[0]) if len(args) == 1 else (None, False)
+    if origin in (list, List):
+        model, _ = _nested_model(typing.get_args(annotation)[0])
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+@lru_cache(maxsize=None)
+def is_plain(schema):
+    decorators = schema.__pydantic_decorators__
+    if (decorators.validators or decorators.field_validators or decorators.root_validators
+            or decorators.field_serializers or decorators.model_serializers
+            or decorators.model_validators or decorators.computed_fields):
+        return False
+    for field in schema.model_fields.values():
+        if field.alias or field.serialization_alias:
+            return False
+        model, _ = _nested_model(field.annotation)
+        if model is not None and not is_plain(model):
+            return False
+    return True
+
+@lru_cache(maxsize=None)
+def row_encoder(schema):
+    # ORM object -> dict with the schema's fields, compiled once per schema
+    fields = []
+    for name, field in schema.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        model, many = _nested_model(field.annotation)
+        fields.append((name, default, row_encoder(model) if model is not None else None, many))
+
+    def encode(obj):
+        # Loaded ORM attributes are plain entries in __dict__; only the rest
+        # (expired, lazy relationships, non-column fields) go through getattr
+        loaded = getattr(obj, "__dict__", {})
+        row = {}
+        for name, default, nested, many in fields:
+            value = loaded[name] if name in loaded else getattr(obj, name, default)
+            if nested is not None and value is not None:
+                value = [nested(item) for item in value] if many else nested(value)
+            row[name] = value
+        return row
+    return encode
+
+@lru_cache(maxsize=None)
+def list_adapter(schema):
+    return TypeAdapter(List[schema])
+
+def encode_list(schema, rows, trusted: bool = None):
+    if trusted is None:
+        trusted = FAST_JSON_TRUSTED
+    if trusted and is_plain(schema):
+        encode = row_encoder(schema)
+        return orjson.dumps([encode(row) for row in rows], default=_default)
+    adapter = list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(list(rows), from_attributes=True))
+
+def list_response(schema, rows, response: Response = None):
+    if not FAST_JSON:
+        return rows
+    started_at = time.perf_counter()
+    body = encode_list(schema, rows)
+    encode_ms.observe((time.perf_counter() - started_at) * 1000)
+    responses.inc()
+    rows_encoded.inc(len(rows))
+    # Headers the endpoint already set (next cursor, ETag, ...)
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"} if response else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def get_stats():
+    return {
+        "enabled": FAST_JSON,
+        "trusted": FAST_JSON_TRUSTED,
+        "responses": responses.snapshot(),
+        "rows": rows_encoded.snapshot(),
+        "encode_ms": encode_ms.snapshot(),
+    }
@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# ---------------------------------------------------------
+# ---------------- CONDITIONAL GET (ETag) -----------------
+# ---------------------------------------------------------
+# Responses that are large and rarely change (the mother health file) carry
+# an ETag. A client that sends it back in If-None-Match gets an empty 304
+# instead of the same body again, which is what matters on a slow 3G link:
+#
+#     return http_cache.etag_response(request, body_bytes)
+#
+# The tag is a hash of the exact body, so it changes whenever any field does.
+#
+# Where a version number is cheaper than building the body (the /my-* lists),
+# check_not_modified() compares a version-based tag and Last-Modified before
+# anything is loaded.
+
+CACHE_CONTROL = "private, no-cache" # Clients may keep it, but must revalidate
+
+def make_etag(body: bytes):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): ignore W/ and accept any tag in the list
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
+
+def etag_response(request: Request, body: bytes, media_type: str = "application/json"):
+    etag = make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def http_date(value: datetime):
+    # Naive datetimes are local time (the app stores datetime.now())
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def modified_since_matches(request: Request, last_modified: datetime):
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+
+def check_not_modified(request: Request, etag: str, last_modified: datetime = None):
+    # Returns (headers, not_modified). If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if request.headers.get("if-none-match"):
+        return headers, etag_matches(request, etag)
+    return headers, modified_since_matches(request, last_modified)
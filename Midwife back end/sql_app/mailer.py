@@ -0,0 +1,255 @@
+import os
+import smtplib
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from . import metrics, models
+from .database import SessionLocal
+
+# ---------------------------------------------------------
+# ------------------- EMAIL OUTBOX SENDER -----------------
+# ---------------------------------------------------------
+# Request handlers never talk to SMTP. They add an EmailOutbox row with
+# enqueue() in the same transaction as the data the mail is about, commit,
+# and return. A background thread (OutboxWorker, started by main.py) then:
+#   - claims due Pending rows in batches (FOR UPDATE SKIP LOCKED on MySQL,
+#     so the gunicorn workers don't send the same mail twice)
+#   - sends them over one SMTP connection that is kept open between batches
+#   - on failure retries with exponential backoff; after OUTBOX_MAX_ATTEMPTS
+#     (or a permanent 5xx refusal) the row is parked as Dead for a human
+#     (POST /internal/outbox/requeue-dead puts them back)
+#
+# Local development / tests: run the stand-in server from smtp_stub.py and
+#     SMTP_SERVER=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 SENDER_PASSWORD=
+#
+# Standalone sender (e.g. OUTBOX_WORKER=0 on the web dynos):
+#     python -m sql_app.mailer
+
+# --- CONFIGURATION ---
+# For development, using Gmail App Password is easiest.
+# 1. Turn on 2-Step Verification in Google Account.
+# 2. Search for "App Passwords" and create one.
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", "30")) # seconds
+SENDER_EMAIL = os.getenv("SENDER_EMAIL", "akithaperera6@gmail.com")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD", "yorzrasoojnanqpd") # empty = no AUTH
+
+# No background threads on serverless (the instance is frozen between requests)
+OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "0" if os.getenv("VERCEL") else "1").lower() in ("1", "true", "yes")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "30")) # 30s, 1m, 2m, 4m, ...
+OUTBOX_BACKOFF_MAX_SECONDS = int(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+OUTBOX_SMTP_IDLE_SECONDS = int(os.getenv("OUTBOX_SMTP_IDLE_SECONDS", "60")) # close the connection after this
+
+# --- Metrics ---
+sent = metrics.Counter()
+retried = metrics.Counter()
+dead = metrics.Counter()
+smtp_connects = metrics.Counter()
+send_ms = metrics.Histogram([10, 50, 100, 250, 500, 1000, 5000])
+
+def enqueue(db, to_email: str, subject: str, body: str):
+    # Does NOT commit: the caller's commit makes the mail and its data durable together
+    db_mail = models.EmailOutbox(
+        to_email=to_email, subject=subject, body=body,
+        status="Pending", attempts=0, next_attempt_at=datetime.now(),
+    )
+    db.add(db_mail)
+    return db_mail
+
+def enqueue_many(db, mails):
+    # mails: [(to_email, subject, body)]; one multi-row INSERT, no commit (see enqueue)
+    if not mails:
+        return
+    now = datetime.now()
+    db.execute(models.EmailOutbox.__table__.insert(), [
+        {"to_email": to_email, "subject": subject, "body": body,
+         "status": "Pending", "attempts": 0, "next_attempt_at": now, "created_at": now}
+        for to_email, subject, body in mails
+    ])
+
+def backoff(attempts: int):
+    return timedelta(seconds=min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS))
+
+def is_connection_error(exc: Exception):
+    # "This connection is gone": stop the batch, reconnect next time. (SMTPException
+    # subclasses OSError, so plain socket errors are told apart explicitly.)
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+def is_permanent(exc: Exception):
+    # 5xx for this message/recipient: retrying won't help (server-wide problems always retry)
+    if is_connection_error(exc):
+        return False
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+def build_message(db_mail: models.EmailOutbox):
+    message = MIMEMultipart()
+    message["From"] = SENDER_EMAIL
+    message["To"] = db_mail.to_email
+    message["Subject"] = db_mail.subject
+    message.attach(MIMEText(db_mail.body or "", "plain"))
+    return message
+
+class SmtpConnection:
+    # One SMTP session reused across sends (connect + STARTTLS + AUTH once)
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            if SMTP_STARTTLS:
+                server.starttls()
+            if SENDER_PASSWORD:
+                server.login(SENDER_EMAIL, SENDER_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        smtp_connects.inc()
+        return server
+
+    def send(self, message):
+        if self._server is None:
+            self._server = self._connect()
+            self._last_used = time.monotonic()
+        try:
+            self._server.sendmail(SENDER_EMAIL, message["To"], message.as_string())
+        except Exception as e:
+            if is_connection_error(e):
+                self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > OUTBOX_SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+
+def send_batch(db, connection: SmtpConnection):
+    # Sends up to OUTBOX_BATCH_SIZE due mails; returns how many rows were claimed
+    now = datetime.now()
+    batch = db.query(models.EmailOutbox).filter(
+        models.EmailOutbox.status == "Pending",
+        models.EmailOutbox.next_attempt_at <= now,
+    ).order_by(models.EmailOutbox.id).limit(OUTBOX_BATCH_SIZE).with_for_update(skip_locked=True).all()
+
+    for db_mail in batch:
+        started_at = time.perf_counter()
+        try:
+            connection.send(build_message(db_mail))
+        except Exception as e:
+            db_mail.attempts += 1
+            db_mail.last_error = f"{type(e).__name__}: {e}"[:1000]
+            if is_permanent(e) or db_mail.attempts >= OUTBOX_MAX_ATTEMPTS:
+                db_mail.status = "Dead"
+                dead.inc()
+                print(f"Email {db_mail.id} to {db_mail.to_email} dead-lettered: {db_mail.last_error}")
+            else:
+                db_mail.next_attempt_at = now + backoff(db_mail.attempts)
+                retried.inc()
+            if is_connection_error(e):
+                break # The rest of the batch stays Pending and is picked up next round
+            continue
+        send_ms.observe((time.perf_counter() - started_at) * 1000)
+        db_mail.status = "Sent"
+        db_mail.sent_at = datetime.now()
+        db_mail.attempts += 1
+        db_mail.body = None
+        db_mail.last_error = None
+        sent.inc()
+
+    db.commit()
+    return len(batch)
+
+class OutboxWorker:
+    def __init__(self):
+        self.connection = SmtpConnection()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.connection.close()
+
+    def wake(self):
+        # Called after a commit that queued mail, so it goes out without waiting a poll
+        self._wake.set()
+
+    def run_once(self):
+        db = SessionLocal()
+        try:
+            return send_batch(db, self.connection)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                claimed = 0
+            if claimed >= OUTBOX_BATCH_SIZE:
+                continue # Probably more waiting
+            self.connection.close_if_idle()
+            self._wake.wait(OUTBOX_POLL_SECONDS)
+            self._wake.clear()
+
+worker = OutboxWorker()
+
+def get_stats():
+    return {
+        "worker_enabled": OUTBOX_WORKER,
+        "smtp_server": f"{SMTP_SERVER}:{SMTP_PORT}",
+        "sent": sent.snapshot(),
+        "retried": retried.snapshot(),
+        "dead": dead.snapshot(),
+        "smtp_connects": smtp_connects.snapshot(),
+        "send_ms": send_ms.snapshot(),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] != "run":
+        sys.exit("usage: python -m sql_app.mailer [run]")
+    print(f"Sending queued email via {SMTP_SERVER}:{SMTP_PORT} (Ctrl+C to stop)")
+    worker.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop()
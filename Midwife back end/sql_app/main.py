@@ -1,16 +1,28 @@
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
+import os
+import time
 
-from . import crud, models, schemas
-from .database import SessionLocal, engine
+from . import async_crud, care_plans, compression, crud, dashboard_events, fast_json, http_cache, mailer, maintenance, midwife_import, midwife_stats, migrations, models, pagination, passwords, principal_cache, route_plans, schemas
+from .database import AsyncSessionLocal, SessionLocal, engine, get_pool_stats
 
 from datetime import date 
 
-from fastapi.staticfiles import StaticFiles
+# Background threads and sockets report through `logging` (gunicorn doesn't
+# configure the root logger, so give it a handler unless one is already set)
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+logging.getLogger("sql_app").setLevel(os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
 
 # --- Auth Constants ---
 
@@ -18,9 +30,31 @@ SECRET_KEY = "YOUR_VERY_SECRET_KEY_GOES_HERE" # Change this!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+# Schema changes are applied by `python -m sql_app.migrations upgrade` (see migrations.py),
+# not at import time. Refuse to start if the database is behind the code.
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "1").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_SCHEMA_CHECK:
+        await run_in_threadpool(migrations.check_schema_current, engine)
+    # Background sender for queued email (see mailer.py)
+    if mailer.OUTBOX_WORKER:
+        mailer.worker.start()
+    # Pushes dashboard changes to connected midwives (see dashboard_events.py)
+    dashboard_events.hub.start()
+    # Periodic recount of the dashboard counters (see midwife_stats.py)
+    midwife_stats.reconciler.start()
+    # Nightly Missed sweep / roll-ups / reminders, one worker at a time (see maintenance.py)
+    maintenance.scheduler.start()
+    yield
+    await run_in_threadpool(maintenance.scheduler.stop)
+    await run_in_threadpool(midwife_stats.reconciler.stop)
+    await dashboard_events.hub.stop()
+    if mailer.OUTBOX_WORKER:
+        await run_in_threadpool(mailer.worker.stop)
+
+app = FastAPI(lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 app.add_middleware(
@@ -29,15 +63,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
-
-def get_db():
+# gzip / br for large JSON + payload size per endpoint (see compression.py)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Yields an AsyncSession when DB_ASYNC=1, otherwise a normal Session.
+# Endpoints don't care which: they go through async_crud either way.
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+# Plain sync session for the seed/reset helpers
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# bcrypt pool is saturated: tell the client to retry instead of queueing forever
+@app.exception_handler(passwords.PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: passwords.PasswordPoolBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please try again"},
+        headers={"Retry-After": "2"},
+    )
+
+@app.exception_handler(pagination.InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: pagination.InvalidCursor):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Invalid cursor"})
+
+# Shared list parameters (see pagination.py). No limit = the old unbounded list.
+PageLimit = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 oauth2_scheme_mother = OAuth2PasswordBearer(tokenUrl="mother/token")
 oauth2_scheme_moh = OAuth2PasswordBearer(tokenUrl="moh/token") # MOH Web Portal (NEW)
@@ -53,25 +120,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def check_login_password(db, user, password: str):
+    # Verifies off the event loop and upgrades the stored hash if BCRYPT_ROUNDS changed
+    if user is None:
+        return False
+    valid, new_hash = await passwords.verify_and_update(password, user.hashed_password)
+    if valid and new_hash:
+        await async_crud.set_password_hash(db, type(user), user.id, new_hash)
+    return valid
+
 # --- Dependency Functions (Updated) ---
 
+def decode_token_subject(token: str, credentials_exception: HTTPException):
+    # Verified tokens are memoized until their own expiry (see principal_cache)
+    subject = principal_cache.verified_tokens.get(token)
+    if subject is not None:
+        return subject
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        subject: str = payload.get("sub")
+        if subject is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+    expires_in = payload.get("exp", 0) - time.time()
+    principal_cache.verified_tokens.set(token, subject, ttl=expires_in)
+    return subject
+
 async def get_current_midwife(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    # ... (Keep existing code) ...
+    # NOTE: Returns a cached, session-less copy of the midwife (columns only)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    midwife = crud.get_midwife_by_username(db, username=token_data.username)
+    token_data = schemas.TokenData(username=decode_token_subject(token, credentials_exception))
+    cache_key = ("midwife", token_data.username)
+    midwife = principal_cache.principals.get(cache_key)
     if midwife is None:
+        midwife = await async_crud.get_midwife_by_username(db, username=token_data.username)
+        if midwife is None:
+            raise credentials_exception
+        midwife = principal_cache.snapshot(midwife)
+        principal_cache.principals.set(cache_key, midwife)
+    # Suspended accounts (is_active = False) are locked out
+    if midwife.is_active is False:
         raise credentials_exception
     return midwife
 
@@ -81,17 +174,15 @@ async def get_current_mother(db: Session = Depends(get_db), token: str = Depends
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        nic: str = payload.get("sub")
-        if nic is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(sub_id=nic)
-    except JWTError:
-        raise credentials_exception
-    mother = crud.get_mother_by_nic(db, nic=token_data.sub_id)
+    token_data = schemas.TokenData(sub_id=decode_token_subject(token, credentials_exception))
+    cache_key = ("mother", token_data.sub_id)
+    mother = principal_cache.principals.get(cache_key)
     if mother is None:
-        raise credentials_exception
+        mother = await async_crud.get_mother_by_nic(db, nic=token_data.sub_id)
+        if mother is None:
+            raise credentials_exception
+        mother = principal_cache.snapshot(mother)
+        principal_cache.principals.set(cache_key, mother)
     return mother
 
 # --- NEW: MOH Auth Dependency ---
@@ -101,17 +192,15 @@ async def get_current_moh(db: Session = Depends(get_db), token: str = Depends(oa
         detail="Could not validate credentials (MOH)",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    moh = crud.get_moh_officer_by_username(db, username=token_data.username)
+    token_data = schemas.TokenData(username=decode_token_subject(token, credentials_exception))
+    cache_key = ("moh", token_data.username)
+    moh = principal_cache.principals.get(cache_key)
     if moh is None:
-        raise credentials_exception
+        moh = await async_crud.get_moh_officer_by_username(db, username=token_data.username)
+        if moh is None:
+            raise credentials_exception
+        moh = principal_cache.snapshot(moh)
+        principal_cache.principals.set(cache_key, moh)
     return moh
 
 
@@ -119,17 +208,18 @@ async def get_current_moh(db: Session = Depends(get_db), token: str = Depends(oa
 
 # 1. MOH Self-Registration (For System Admin to create the first MOH account)
 @app.post("/moh/register", response_model=schemas.MOHOfficer)
-def register_moh(moh: schemas.MOHOfficerCreate, db: Session = Depends(get_db)):
-    db_moh = crud.get_moh_officer_by_username(db, username=moh.username)
+async def register_moh(moh: schemas.MOHOfficerCreate, db: Session = Depends(get_db)):
+    db_moh = await async_crud.get_moh_officer_by_username(db, username=moh.username)
     if db_moh:
         raise HTTPException(status_code=400, detail="MOH Username already registered")
-    return crud.create_moh_officer(db=db, moh=moh)
+    hashed_password = await passwords.hash_password(moh.password)
+    return await async_crud.create_moh_officer(db=db, moh=moh, hashed_password=hashed_password)
 
 # 2. MOH Login (Web Login)
 @app.post("/moh/token", response_model=schemas.Token)
 async def login_for_moh(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    moh = crud.get_moh_officer_by_username(db, username=form_data.username)
-    if not moh or not crud.verify_password(form_data.password, moh.hashed_password):
+    moh = await async_crud.get_moh_officer_by_username(db, username=form_data.username)
+    if not await check_login_password(db, moh, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -140,70 +230,146 @@ async def login_for_moh(db: Session = Depends(get_db), form_data: OAuth2Password
 
 # 3. Midwife Registration (Used by the MOH Web Form)
 @app.post("/midwives/full", response_model=schemas.Midwife, status_code=status.HTTP_201_CREATED)
-def register_new_midwife_from_web(
+async def register_new_midwife_from_web(
     midwife_data: schemas.MidwifeRegistration, 
     db: Session = Depends(get_db),
     # Ensure only a logged-in MOH can access this endpoint
     current_moh: schemas.MOHOfficer = Depends(get_current_moh) 
 ):
-    db_midwife = crud.register_full_midwife(db=db, midwife_data=midwife_data)
+    generated_password = crud.generate_secure_password()
+    hashed_password = await passwords.hash_password(generated_password)
+    db_midwife = await async_crud.register_full_midwife(
+        db=db, midwife_data=midwife_data, generated_password=generated_password, hashed_password=hashed_password
+    )
     
     if db_midwife is None:
         raise HTTPException(status_code=400, detail="Username or NIC already exists.")
-        
-    return db_midwife
 
-# 4. View All Midwives (For MOH Directory/Management)
+    # Credentials email was queued with the midwife row; nudge the sender
+    mailer.worker.wake()
+    return await async_crud.load_for_response(db, db_midwife)
+
+# 3b. Bulk Midwife Registration from a CSV / XLSX file (see midwife_import.py)
+@app.post("/midwives/import", response_model=schemas.MidwifeImportReport)
+async def import_midwives_from_file(
+    file: UploadFile = File(...),
+    dry_run: bool = False, # Validate and check conflicts only
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    try:
+        return await midwife_import.import_midwives(db, file.file, file.filename, dry_run=dry_run)
+    except midwife_import.ImportFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 4. View the Midwives of the officer's MOH area (For MOH Directory/Management)
 @app.get("/midwives/", response_model=List[schemas.Midwife])
-def get_all_midwives_for_moh(
+async def get_all_midwives_for_moh(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
     db: Session = Depends(get_db),
     current_moh: schemas.MOHOfficer = Depends(get_current_moh)
 ):
-    # Currently returns all midwives; can be filtered by moh_area if needed later
-    return db.query(models.Midwife).all()
+    # Midwives of the officer's own MOH area
+    midwives = await async_crud.get_all_midwives(db, current_moh.moh_area, cursor=cursor, limit=limit)
+    return pagination.set_next_cursor(response, await async_crud.load_for_response(db, midwives))
+
+# 4b. Midwife Directory for the officer's own MOH area (light rows, one page at a time)
+@app.get("/midwives/directory", response_model=List[schemas.MidwifeDirectoryEntry])
+async def get_midwife_directory(
+    response: Response,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    ids: Optional[List[int]] = Query(None),
+    sort: str = Query("name", pattern="^-?(name|username|id)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    midwives = await async_crud.get_midwife_directory(
+        db, current_moh.moh_area, search=search, is_active=is_active, ids=ids,
+        sort=sort, cursor=cursor, limit=limit
+    )
+    return pagination.set_next_cursor(response, midwives)
+
+@app.get("/midwives/directory/summary", response_model=schemas.MidwifeDirectorySummary)
+async def get_midwife_directory_summary(
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    return await async_crud.get_midwife_directory_summary(db, current_moh.moh_area)
+
+# 5. Suspend / Re-activate a Midwife
+@app.put("/midwives/{midwife_id}/status", response_model=dict)
+async def set_midwife_status(
+    midwife_id: int,
+    status_update: schemas.MidwifeStatusUpdate,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    db_midwife = await async_crud.set_midwife_active(db, midwife_id, status_update.is_active, current_moh.moh_area)
+    if db_midwife is None:
+        raise HTTPException(status_code=404, detail="Midwife not found in your area")
+    return {"message": "Midwife status updated", "is_active": db_midwife.is_active}
 
 
 
 # ... (Register and Login endpoints stay the same) ...
 @app.post("/register/", response_model=schemas.Midwife)
-def register_midwife(midwife: schemas.MidwifeCreate, db: Session = Depends(get_db)):
-    db_midwife = crud.get_midwife_by_username(db, username=midwife.username)
+async def register_midwife(midwife: schemas.MidwifeCreate, db: Session = Depends(get_db)):
+    db_midwife = await async_crud.get_midwife_by_username(db, username=midwife.username)
     if db_midwife:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_midwife(db=db, midwife=midwife)
+    hashed_password = await passwords.hash_password(midwife.password)
+    db_midwife = await async_crud.create_midwife(db=db, midwife=midwife, hashed_password=hashed_password)
+    return await async_crud.load_for_response(db, db_midwife)
 
 @app.post("/token", response_model=schemas.Token)
 async def login_for_midwife(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    midwife = crud.get_midwife_by_username(db, username=form_data.username)
-    if not midwife or not crud.verify_password(form_data.password, midwife.hashed_password):
+    midwife = await async_crud.get_midwife_by_username(db, username=form_data.username)
+    if not await check_login_password(db, midwife, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Suspended accounts get the same answer get_current_midwife would give their token
+    if midwife.is_active is False:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     access_token = create_access_token(data={"sub": midwife.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/midwives/me/", response_model=schemas.Midwife)
-async def read_midwives_me(current_midwife: schemas.Midwife = Depends(get_current_midwife)):
-    return current_midwife
+async def read_midwives_me(db: Session = Depends(get_db), current_midwife: schemas.Midwife = Depends(get_current_midwife)):
+    # current_midwife is a cached copy without relationships; read the full row
+    midwife = await async_crud.get_midwife(db, current_midwife.id)
+    return await async_crud.load_for_response(db, midwife)
 
 @app.put("/midwives/me/password", response_model=dict)
-def change_midwife_password(
+async def change_midwife_password(
     password_data: schemas.PasswordChange,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    success = crud.update_midwife_password(db, midwife_id=current_midwife.id, password_data=password_data)
-    if not success:
+    db_midwife = await async_crud.get_midwife(db, current_midwife.id)
+    if not db_midwife or not await passwords.verify_password(password_data.old_password, db_midwife.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect old password")
+
+    new_hash = await passwords.hash_password(password_data.new_password)
+    await async_crud.update_midwife_password(db, midwife_id=current_midwife.id, new_hash=new_hash)
         
     return {"message": "Password updated successfully"}
 
 @app.post("/mother/token", response_model=schemas.Token)
 async def login_for_mother(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    mother = crud.get_mother_by_nic(db, nic=form_data.username)
-    if not mother or not crud.verify_password(form_data.password, mother.hashed_password):
+    mother = await async_crud.get_mother_by_nic(db, nic=form_data.username)
+    if not await check_login_password(db, mother, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect NIC or password",
@@ -213,57 +379,235 @@ async def login_for_mother(db: Session = Depends(get_db), form_data: OAuth2Passw
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/mothers/me/", response_model=schemas.Mother)
-async def read_mothers_me(current_mother: schemas.Mother = Depends(get_current_mother)):
-    return current_mother
-
+async def read_mothers_me(db: Session = Depends(get_db), current_mother: schemas.Mother = Depends(get_current_mother)):
+    # current_mother is a cached copy without relationships; read the full row
+    mother = await async_crud.get_mother(db, current_mother.id)
+    return await async_crud.load_for_response(db, mother)
+
+# Fallback for clients without the WebSocket below: poll with If-None-Match and
+# an unchanged dashboard is answered with an empty 304.
+# Returns assigned_mothers, todays_visits, high_risk_mothers, pending_leave.
 @app.get("/midwives/dashboard-stats")
-def get_dashboard_stats(
+async def get_dashboard_stats(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    assigned_mothers = crud.get_mother_count_by_midwife(db, current_midwife.id)
-    todays_visits = crud.get_todays_appointments_count(db, current_midwife.id)
-    
-    return {
-        "assigned_mothers": assigned_mothers,
-        "todays_visits": todays_visits
-    }
+    # Counters are maintained on write (midwife_stats): one primary-key read
+    stats = await async_crud.get_dashboard_stats(db, current_midwife.id)
+    # "Today's visits" also changes at midnight without any write
+    etag = f'W/"dashboard-{current_midwife.id}-{stats.pop("version")}-{date.today().isoformat()}"'
+    headers = {"ETag": etag, "Cache-Control": http_cache.CACHE_CONTROL}
+    if http_cache.etag_matches(request, etag.removeprefix("W/")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return stats
+
+# Push channel for the home dashboard: ?token=<midwife JWT>. Sends a snapshot,
+# then deltas as mothers / appointments change, and a ping as heartbeat.
+@app.websocket("/ws/midwives/dashboard")
+async def dashboard_socket(websocket: WebSocket, token: Optional[str] = None):
+    token = token or websocket.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    # Short-lived session for the login check only; nothing is held while the socket is open
+    db_gen = get_db()
+    db = await db_gen.__anext__()
+    try:
+        current_midwife = await get_current_midwife(db, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        await db_gen.aclose()
+
+    await websocket.accept()
+    queue, snapshot = await dashboard_events.hub.subscribe(current_midwife.id)
+    try:
+        await websocket.send_json(snapshot)
+
+        async def push():
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), dashboard_events.DASHBOARD_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = {"type": "ping"}
+                await websocket.send_json(message)
+
+        async def listen():
+            # Client messages are only read to notice the disconnect
+            while True:
+                await websocket.receive_text()
+
+        tasks = [asyncio.create_task(push()), asyncio.create_task(listen())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error("Dashboard socket error", exc_info=task.exception())
+    finally:
+        dashboard_events.hub.unsubscribe(current_midwife.id, queue)
 
 # --- MIDWIFE ACTIONS (UPDATED) ---
 
 @app.post("/mothers/", response_model=schemas.Mother)
-def create_mother_for_midwife(
+async def create_mother_for_midwife(
     mother: schemas.MotherCreate, 
     db: Session = Depends(get_db), 
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    db_mother = crud.get_mother_by_nic(db, nic=mother.nic)
+    db_mother = await async_crud.get_mother_by_nic(db, nic=mother.nic)
     if db_mother:
         raise HTTPException(status_code=400, detail="Mother with this NIC already registered")
-    return crud.create_mother(db=db, mother=mother, midwife_id=current_midwife.id)
+    hashed_password = await passwords.hash_password(mother.password)
+    db_mother = await async_crud.create_mother(db=db, mother=mother, midwife_id=current_midwife.id, hashed_password=hashed_password)
+    return await async_crud.load_for_response(db, db_mother)
+
+# Bulk registration: one NIC lookup, parallel hashing, one multi-row INSERT.
+# Duplicate / already registered NICs are skipped and reported, the rest are created.
+MOTHER_BULK_MAX = int(os.getenv("MOTHER_BULK_MAX", "200"))
+
+@app.post("/mothers/bulk", response_model=schemas.MotherBulkResult, status_code=201)
+async def create_mothers_bulk(
+    bulk: schemas.MotherBulkCreate,
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    if not bulk.mothers:
+        raise HTTPException(status_code=400, detail="No mothers to register")
+    if len(bulk.mothers) > MOTHER_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MOTHER_BULK_MAX} mothers per request")
+
+    existing = await async_crud.find_existing_mother_nics(db, list({m.nic for m in bulk.mothers}))
+    accepted, skipped, seen = [], [], set()
+    for index, mother in enumerate(bulk.mothers):
+        if mother.nic in existing:
+            skipped.append({"index": index, "nic": mother.nic, "reason": "Mother with this NIC already registered"})
+        elif mother.nic in seen:
+            skipped.append({"index": index, "nic": mother.nic, "reason": "NIC appears earlier in this request"})
+        else:
+            seen.add(mother.nic)
+            accepted.append(mother)
+
+    created = []
+    if accepted:
+        hashes = await passwords.hash_many([mother.password for mother in accepted])
+        created = await async_crud.bulk_create_mothers(db, list(zip(accepted, hashes)), current_midwife.id)
+        if created is None:
+            raise HTTPException(status_code=409, detail="Some of these NICs were registered meanwhile; please retry")
+    return {"created": created, "skipped": skipped}
+
+# MOH: move mothers (and their future Scheduled visits) between midwives of the area
+@app.post("/mothers/transfer", response_model=dict)
+async def transfer_mothers(
+    transfer: schemas.MotherTransfer,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    if not transfer.mother_ids:
+        raise HTTPException(status_code=400, detail="No mothers to transfer")
+    if transfer.to_midwife_id == transfer.from_midwife_id:
+        raise HTTPException(status_code=400, detail="Mothers are already assigned to this midwife")
+    target = await async_crud.get_midwife(db, transfer.to_midwife_id)
+    if not target or target.assigned_moh_area != current_moh.moh_area:
+        raise HTTPException(status_code=404, detail="Midwife not found in your area")
+    if target.is_active is False: # NULL = active (rows older than the column default)
+        raise HTTPException(status_code=400, detail="Cannot transfer mothers to an inactive midwife")
+
+    moved, appointments_moved, missing = await async_crud.transfer_mothers(db, transfer, current_moh.moh_area)
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Mothers not found under that midwife in your area", "ids": missing})
+    return {"message": f"{moved} mothers transferred", "mothers": moved, "appointments": appointments_moved}
+
+# MOH: re-apply each active mother's care plan version to her visits (repairs
+# schedules). Only generated visits still ahead are touched.
+@app.post("/mothers/schedules/regenerate", response_model=dict)
+async def regenerate_area_schedules(
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    return await async_crud.replan_schedules(db, moh_area=current_moh.moh_area)
+
+# --- Care plan templates (MOH): versions of the visit schedule ---
+@app.get("/care-plans/", response_model=List[schemas.CarePlanTemplate])
+async def read_care_plan_templates(
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    return await async_crud.get_care_plan_templates(db, current_moh.moh_area)
+
+@app.post("/care-plans/", response_model=schemas.CarePlanTemplate, status_code=status.HTTP_201_CREATED)
+async def create_care_plan_template(
+    template: schemas.CarePlanTemplateCreate,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    db_template = await async_crud.create_care_plan_template(db, template, current_moh.username)
+    if db_template is None:
+        raise HTTPException(status_code=409, detail="Another care plan version was created meanwhile; please retry")
+    return db_template
+
+@app.post("/care-plans/{template_id}/activate", response_model=schemas.CarePlanTemplate)
+async def activate_care_plan_template(
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    db_template = await async_crud.activate_care_plan_template(db, template_id)
+    if db_template is None:
+        raise HTTPException(status_code=404, detail="Care plan template not found")
+    return db_template
+
+# Moves every Pregnant / Postnatal mother of the officer's area to this version
+# and re-plans her generated visits still ahead. Safe to repeat or resume.
+@app.post("/care-plans/{template_id}/replan", response_model=dict)
+async def replan_care_plan(
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    try:
+        return await async_crud.replan_schedules(db, template_id=template_id, moh_area=current_moh.moh_area)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Care plan template not found")
 
 # UPDATED: Accepts 'search' parameter
 @app.get("/mothers/", response_model=List[schemas.Mother])
-def read_mothers_for_midwife(
+async def read_mothers_for_midwife(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE), 
     search: Optional[str] = None, # New parameter
+    cursor: Optional[str] = None, # Keyset paging (preferred over skip)
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    mothers = crud.get_mothers_by_midwife(db, midwife_id=current_midwife.id, skip=skip, limit=limit, search=search)
-    return mothers
+    mothers = await async_crud.get_mothers_by_midwife(
+        db, midwife_id=current_midwife.id, skip=skip, limit=limit, search=search, cursor=cursor
+    )
+    mothers = pagination.set_next_cursor(response, await async_crud.load_for_response(db, mothers))
+    return fast_json.list_response(schemas.Mother, mothers, response)
+
+# Typeahead search (NIC prefix / name words), lightweight rows ordered by relevance
+@app.get("/mothers/search", response_model=List[schemas.MotherSearchResult])
+async def search_mothers_for_midwife(
+    q: str,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    return await async_crud.search_mothers(db, current_midwife.id, q, limit=min(limit, 100))
 
 # NEW: Update Mother Details
 @app.put("/mothers/{mother_id}", response_model=schemas.Mother)
-def update_mother_details(
+async def update_mother_details(
     mother_id: int,
     mother_update: schemas.MotherUpdate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # 1. Check if mother exists
-    db_mother = crud.get_mother(db, mother_id=mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id=mother_id)
     if not db_mother:
         raise HTTPException(status_code=404, detail="Mother not found")
         
@@ -272,57 +616,63 @@ def update_mother_details(
         raise HTTPException(status_code=403, detail="Not authorized to edit this mother")
         
     # 3. Update
-    return crud.update_mother(db=db, mother_id=mother_id, mother_update=mother_update)
+    updated_mother = await async_crud.update_mother(db=db, mother_id=mother_id, mother_update=mother_update)
+    return await async_crud.load_for_response(db, updated_mother)
 
 @app.post("/mothers/{mother_id}/records/", response_model=schemas.HealthRecord)
-def create_record_for_mother(
+async def create_record_for_mother(
     mother_id: int,
     record: schemas.HealthRecordCreate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.create_health_record(db=db, record=record, mother_id=mother_id)
+    return await async_crud.create_health_record(db=db, record=record, mother_id=mother_id)
 
 @app.get("/mothers/{mother_id}/records/", response_model=List[schemas.HealthRecord])
-def read_records_for_mother(
+async def read_records_for_mother(
     mother_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    records = crud.get_health_records_for_mother(db, mother_id=mother_id)
-    return records
+    records = await async_crud.get_health_records_for_mother(db, mother_id=mother_id, skip=skip, limit=limit, cursor=cursor)
+    return pagination.set_next_cursor(response, records)
             
 # --- PREGNANCY RECORD ENDPOINTS ---
 
 @app.post("/mothers/{mother_id}/pregnancy-records/", response_model=schemas.PregnancyRecord)
-def create_pregnancy_record_for_mother(
+async def create_pregnancy_record_for_mother(
     mother_id: int,
     record: schemas.PregnancyRecordCreate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Check if mother exists
-    db_mother = crud.get_mother(db, mother_id=mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id=mother_id)
     if not db_mother:
         raise HTTPException(status_code=404, detail="Mother not found")
         
-    return crud.create_pregnancy_record(db=db, record=record, mother_id=mother_id)
+    return await async_crud.create_pregnancy_record(db=db, record=record, mother_id=mother_id)
 
 @app.get("/mothers/{mother_id}/pregnancy-records/", response_model=List[schemas.PregnancyRecord])
-def read_pregnancy_records_for_mother(
+async def read_pregnancy_records_for_mother(
     mother_id: int,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.get_pregnancy_records_for_mother(db, mother_id=mother_id)
+    records = await async_crud.get_pregnancy_records_for_mother(db, mother_id=mother_id)
+    return fast_json.list_response(schemas.PregnancyRecord, records)
 
 @app.get("/mothers/{mother_id}/pregnancy-record", response_model=schemas.PregnancyRecord)
-def read_latest_pregnancy_record_for_mother(
+async def read_latest_pregnancy_record_for_mother(
     mother_id: int,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    records = crud.get_pregnancy_records_for_mother(db, mother_id=mother_id)
+    records = await async_crud.get_pregnancy_records_for_mother(db, mother_id=mother_id)
     if not records:
         raise HTTPException(status_code=404, detail="No pregnancy record found")
     # Return the latest one (assuming ID order or date)
@@ -331,250 +681,421 @@ def read_latest_pregnancy_record_for_mother(
 # --- DELIVERY RECORD ENDPOINTS ---
 
 @app.post("/mothers/{mother_id}/delivery-records/", response_model=schemas.DeliveryRecord)
-def create_delivery_record_for_mother(
+async def create_delivery_record_for_mother(
     mother_id: int,
     record: schemas.DeliveryRecordCreate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Check if mother exists
-    db_mother = crud.get_mother(db, mother_id=mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id=mother_id)
     if not db_mother:
         raise HTTPException(status_code=404, detail="Mother not found")
         
-    return crud.create_delivery_record(db=db, record=record, mother_id=mother_id)
+    return await async_crud.create_delivery_record(db=db, record=record, mother_id=mother_id)
 
 @app.get("/mothers/{mother_id}/delivery-records/", response_model=List[schemas.DeliveryRecord])
-def read_delivery_records_for_mother(
+async def read_delivery_records_for_mother(
     mother_id: int,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.get_delivery_records_for_mother(db, mother_id=mother_id)
+    return await async_crud.get_delivery_records_for_mother(db, mother_id=mother_id)
 
 # --- ANTENATAL PLAN ENDPOINTS ---
 
 @app.post("/mothers/{mother_id}/antenatal-plans/", response_model=schemas.AntenatalPlan)
-def create_antenatal_plan_for_mother(
+async def create_antenatal_plan_for_mother(
     mother_id: int,
     plan: schemas.AntenatalPlanCreate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Check if mother exists
-    db_mother = crud.get_mother(db, mother_id=mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id=mother_id)
     if not db_mother:
         raise HTTPException(status_code=404, detail="Mother not found")
         
-    return crud.create_antenatal_plan(db=db, plan=plan, mother_id=mother_id)
+    return await async_crud.create_antenatal_plan(db=db, plan=plan, mother_id=mother_id)
 
 @app.get("/mothers/{mother_id}/antenatal-plans/", response_model=List[schemas.AntenatalPlan])
-def read_antenatal_plans_for_mother(
+async def read_antenatal_plans_for_mother(
     mother_id: int,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.get_antenatal_plans_for_mother(db, mother_id=mother_id)
+    return await async_crud.get_antenatal_plans_for_mother(db, mother_id=mother_id)
 
 # --- MOTHER PORTAL ENDPOINTS (READ-ONLY) ---
+# Every write to one of these lists bumps its version on the mother's row
+# (crud.touch_portal). The version is read first, with one primary-key
+# lookup, and sent as a strong ETag + Last-Modified; a client that already
+# has it gets an empty 304 before the list is loaded or serialized. Reading
+# the version before the list means a body is never older than its tag.
+
+async def portal_not_modified(request: Request, response: Response, db, mother_id: int, resource: str, variant: str = ""):
+    # Returns the 304 to send, or None after putting the validators on `response`
+    version, modified_at = await async_crud.get_portal_version(db, mother_id, resource) or (0, None)
+    etag = f'"{resource}-{mother_id}-{version or 0}{variant}"'
+    headers, not_modified = http_cache.check_not_modified(request, etag, modified_at)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 @app.get("/my-pregnancy-records/", response_model=List[schemas.PregnancyRecord])
-def read_my_pregnancy_records(
+async def read_my_pregnancy_records(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_mother: schemas.Mother = Depends(get_current_mother)
 ):
     # The 'current_mother' dependency ensures this is a valid mother login
-    return crud.get_pregnancy_records_for_mother(db, mother_id=current_mother.id)
+    cached = await portal_not_modified(request, response, db, current_mother.id, "pregnancy_records")
+    if cached:
+        return cached
+    records = await async_crud.get_pregnancy_records_for_mother(db, mother_id=current_mother.id)
+    return fast_json.list_response(schemas.PregnancyRecord, records, response)
 
 @app.get("/my-delivery-records/", response_model=List[schemas.DeliveryRecord])
-def read_my_delivery_records(
+async def read_my_delivery_records(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_mother: schemas.Mother = Depends(get_current_mother)
 ):
-    return crud.get_delivery_records_for_mother(db, mother_id=current_mother.id)
+    cached = await portal_not_modified(request, response, db, current_mother.id, "delivery_records")
+    if cached:
+        return cached
+    return await async_crud.get_delivery_records_for_mother(db, mother_id=current_mother.id)
 
 @app.get("/my-antenatal-plans/", response_model=List[schemas.AntenatalPlan])
-def read_my_antenatal_plans(
+async def read_my_antenatal_plans(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_mother: schemas.Mother = Depends(get_current_mother)
 ):
-    return crud.get_antenatal_plans_for_mother(db, mother_id=current_mother.id)
+    cached = await portal_not_modified(request, response, db, current_mother.id, "antenatal_plans")
+    if cached:
+        return cached
+    return await async_crud.get_antenatal_plans_for_mother(db, mother_id=current_mother.id)
 
 @app.get("/my-appointments/", response_model=List[schemas.Appointment])
-def read_my_appointments(
+async def read_my_appointments(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
     db: Session = Depends(get_db),
     current_mother: schemas.Mother = Depends(get_current_mother)
 ):
-    return crud.get_appointments_by_mother(db, mother_id=current_mother.id)
+    # Each page has its own tag
+    page = hashlib.sha256(f"{cursor}|{limit}".encode()).hexdigest()[:12] if cursor or limit else ""
+    cached = await portal_not_modified(request, response, db, current_mother.id, "appointments",
+                                       f"-{page}" if page else "")
+    if cached:
+        return cached
+    appointments = await async_crud.get_appointments_by_mother(db, mother_id=current_mother.id, cursor=cursor, limit=limit)
+    pagination.set_next_cursor(response, appointments)
+    return fast_json.list_response(schemas.Appointment, appointments, response)
 
 # --- APPOINTMENT ENDPOINTS (Midwife) ---
 
 @app.post("/appointments/", response_model=schemas.Appointment)
-def create_appointment(
+async def create_appointment(
     appointment: schemas.AppointmentCreate,
     mother_id: int, # Pass as query param for simplicity, or in body
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Verify mother belongs to midwife
-    db_mother = crud.get_mother(db, mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id)
     if not db_mother or db_mother.midwife_id != current_midwife.id:
         raise HTTPException(status_code=400, detail="Invalid Mother ID")
         
-    return crud.create_appointment(db, appointment, current_midwife.id, mother_id)
+    return await async_crud.create_appointment(db, appointment, current_midwife.id, mother_id)
 
 @app.get("/appointments/", response_model=List[schemas.Appointment])
-def get_midwife_appointments(
+async def get_midwife_appointments(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    appointments = await async_crud.get_appointments_by_midwife(
+        db, current_midwife.id, start_date, end_date, cursor=cursor, limit=limit
+    )
+    pagination.set_next_cursor(response, appointments)
+    return fast_json.list_response(schemas.Appointment, appointments, response)
+
+# Month view: visits per day and visit type (a few hundred bytes, not the full list)
+@app.get("/appointments/calendar", response_model=schemas.CalendarMonth)
+async def get_appointment_calendar(
+    year: int = Query(..., ge=2000, le=2100),
+    month: int = Query(..., ge=1, le=12),
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.get_appointments_by_midwife(db, current_midwife.id, start_date, end_date)
+    return await async_crud.get_calendar_month(db, current_midwife.id, year, month)
+
+# Selected day: the visits themselves, with the mothers' contact details
+@app.get("/appointments/calendar/{day}", response_model=List[schemas.CalendarVisit])
+async def get_appointment_calendar_day(
+    day: date,
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    visits = await async_crud.get_calendar_day(db, current_midwife.id, day)
+    return fast_json.list_response(schemas.CalendarVisit, visits)
+
+# The day's home visits in a short route order (see route_plans.py). Send the
+# phone's position as start_lat / start_lon to start the route from there.
+@app.get("/appointments/home-visit-plan/{day}", response_model=schemas.HomeVisitPlan)
+async def get_home_visit_plan(
+    day: date,
+    request: Request,
+    response: Response,
+    start_lat: Optional[float] = Query(None, ge=-90, le=90),
+    start_lon: Optional[float] = Query(None, ge=-180, le=180),
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    if (start_lat is None) != (start_lon is None):
+        raise HTTPException(status_code=400, detail="Send both start_lat and start_lon, or neither")
+    start = (start_lat, start_lon) if start_lat is not None else None
+    plan, signature = await async_crud.get_home_visit_plan(db, current_midwife.id, day, start)
+    headers, not_modified = http_cache.check_not_modified(request, f'"plan-{current_midwife.id}-{day}-{signature}"')
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return plan
+
+# Tomorrow's visits with the mothers' phone numbers (built nightly by maintenance.py)
+@app.get("/appointments/reminders", response_model=List[schemas.AppointmentReminder])
+async def get_appointment_reminders(
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    return await async_crud.get_appointment_reminders(db, current_midwife.id, date.today() + timedelta(days=1))
+
+# MOH: visits per day by status for the area, from the nightly roll-up
+@app.get("/appointments/daily-counts", response_model=List[schemas.AppointmentDailyCount])
+async def get_appointment_daily_counts(
+    start_date: date,
+    end_date: date,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    if end_date < start_date or (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="Date range must be between 1 and 367 days")
+    return await async_crud.get_appointment_daily_counts(db, current_moh.moh_area, start_date, end_date)
 
 @app.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
-def update_appointment(
+async def update_appointment(
     appointment_id: int,
     status_update: schemas.AppointmentUpdate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Ensure ownership
-    appt = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+    appt = await async_crud.get_appointment(db, appointment_id)
     if not appt or appt.midwife_id != current_midwife.id:
         raise HTTPException(status_code=404, detail="Appointment not found")
         
-    return crud.update_appointment(db, appointment_id, status_update)
+    return await async_crud.update_appointment(db, appointment_id, status_update)
 
 @app.delete("/appointments/{appointment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_appointment(
+async def delete_appointment(
     appointment_id: int,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Ensure ownership/permission
-    appt = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+    appt = await async_crud.get_appointment(db, appointment_id)
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
         
     if appt.midwife_id != current_midwife.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this appointment")
     
-    return crud.delete_appointment(db, appointment_id)
+    return await async_crud.delete_appointment(db, appointment_id)
 
 # --- ANC Visits ---
 @app.post("/anc-visits/", response_model=schemas.ANCVisit)
-def create_anc_visit(visit: schemas.ANCVisitCreate, db: Session = Depends(get_db)):
+async def create_anc_visit(visit: schemas.ANCVisitCreate, db: Session = Depends(get_db)):
     # Check if already exists?
-    existing = crud.get_anc_visit_by_appointment(db, visit.appointment_id)
+    existing = await async_crud.get_anc_visit_by_appointment(db, visit.appointment_id)
     if existing:
         raise HTTPException(status_code=400, detail="ANC Data already recorded for this appointment")
-    return crud.create_anc_visit(db, visit)
+    return await async_crud.create_anc_visit(db, visit)
 
 @app.get("/appointments/{appointment_id}/anc-visit", response_model=schemas.ANCVisit)
-def get_anc_visit(appointment_id: int, db: Session = Depends(get_db)):
-    visit = crud.get_anc_visit_by_appointment(db, appointment_id)
+async def get_anc_visit(appointment_id: int, db: Session = Depends(get_db)):
+    visit = await async_crud.get_anc_visit_by_appointment(db, appointment_id)
     if visit is None:
         raise HTTPException(status_code=404, detail="ANC Data not found")
     return visit
 
 @app.get("/mothers/{mother_id}/anc-visits", response_model=List[schemas.ANCVisit])
-def get_mother_anc_visits(mother_id: int, db: Session = Depends(get_db)):
-    return crud.get_mother_anc_visits(db, mother_id)
+async def get_mother_anc_visits(
+    mother_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
+    db: Session = Depends(get_db)
+):
+    visits = await async_crud.get_mother_anc_visits(db, mother_id, cursor=cursor, limit=limit)
+    pagination.set_next_cursor(response, visits)
+    return fast_json.list_response(schemas.ANCVisit, visits, response)
 
 
 # --- PNC Visits ---
 @app.post("/pnc-visits/", response_model=schemas.PNCVisit)
-def create_pnc_visit(visit: schemas.PNCVisitCreate, db: Session = Depends(get_db)):
+async def create_pnc_visit(visit: schemas.PNCVisitCreate, db: Session = Depends(get_db)):
     # Check if already exists?
-    existing = crud.get_pnc_visit_by_appointment(db, visit.appointment_id)
+    existing = await async_crud.get_pnc_visit_by_appointment(db, visit.appointment_id)
     if existing:
         raise HTTPException(status_code=400, detail="PNC Data already recorded for this appointment")
-    return crud.create_pnc_visit(db, visit)
+    return await async_crud.create_pnc_visit(db, visit)
 
 @app.get("/appointments/{appointment_id}/pnc-visit", response_model=schemas.PNCVisit)
-def get_pnc_visit(appointment_id: int, db: Session = Depends(get_db)):
-    visit = crud.get_pnc_visit_by_appointment(db, appointment_id)
+async def get_pnc_visit(appointment_id: int, db: Session = Depends(get_db)):
+    visit = await async_crud.get_pnc_visit_by_appointment(db, appointment_id)
     if visit is None:
         raise HTTPException(status_code=404, detail="PNC Data not found")
     return visit
 
 @app.get("/mothers/{mother_id}/pnc-visits", response_model=List[schemas.PNCVisit])
-def get_mother_pnc_visits(mother_id: int, db: Session = Depends(get_db)):
-    return crud.get_mother_pnc_visits(db, mother_id)
+async def get_mother_pnc_visits(
+    mother_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
+    db: Session = Depends(get_db)
+):
+    visits = await async_crud.get_mother_pnc_visits(db, mother_id, cursor=cursor, limit=limit)
+    pagination.set_next_cursor(response, visits)
+    return fast_json.list_response(schemas.PNCVisit, visits, response)
 
 
 # --- LEAVE REQUEST ENDPOINTS ---
 
 @app.post("/leave-requests/", response_model=schemas.LeaveRequest)
-def create_leave_request(
+async def create_leave_request(
     leave: schemas.LeaveRequestCreate,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    leave_req = crud.create_leave_request(db, leave, current_midwife.id)
+    leave_req = await async_crud.create_leave_request(db, leave, current_midwife.id)
     if leave_req is None:
         raise HTTPException(status_code=400, detail="Duplicate or Overlapping Leave Request")
     return leave_req
 
 @app.get("/leave-requests/me", response_model=List[schemas.LeaveRequest])
-def get_my_leave_requests(
+async def get_my_leave_requests(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
-    return crud.get_leave_requests_by_midwife(db, current_midwife.id)
+    leaves = await async_crud.get_leave_requests_by_midwife(db, current_midwife.id, cursor=cursor, limit=limit)
+    return pagination.set_next_cursor(response, leaves)
+
+# For MOH: requests in the officer's own area, names joined in SQL
+@app.get("/leave-requests/queue", response_model=List[schemas.LeaveRequestQueueItem])
+async def get_leave_request_queue(
+    response: Response,
+    status_filter: Optional[schemas.LeaveStatus] = Query(None, alias="status"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    leaves = await async_crud.get_leave_request_queue(
+        db, current_moh.moh_area, status=status_filter,
+        start_date=start_date, end_date=end_date, cursor=cursor, limit=limit
+    )
+    return pagination.set_next_cursor(response, leaves)
+
+@app.post("/leave-requests/bulk", response_model=dict)
+async def bulk_update_leave_requests(
+    update_data: schemas.LeaveRequestBulkUpdate,
+    db: Session = Depends(get_db),
+    current_moh: schemas.MOHOfficer = Depends(get_current_moh)
+):
+    updated, missing = await async_crud.bulk_update_leave_requests(db, update_data, current_moh.moh_area)
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Leave requests not found in your area", "ids": missing})
+    return {"message": f"{updated} leave requests updated", "updated": updated}
 
-# For MOH
+# For MOH: every request in the officer's area (the queue above is the filterable version)
 @app.get("/leave-requests/", response_model=List[schemas.LeaveRequest])
-def get_all_leave_requests(
+async def get_all_leave_requests(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = PageLimit,
     db: Session = Depends(get_db),
     current_moh: schemas.MOHOfficer = Depends(get_current_moh)
 ):
-    return crud.get_all_leave_requests(db)
+    leaves = await async_crud.get_all_leave_requests(db, current_moh.moh_area, cursor=cursor, limit=limit)
+    return pagination.set_next_cursor(response, leaves)
 
 @app.put("/leave-requests/{leave_id}", response_model=schemas.LeaveRequest)
-def update_leave_request(
+async def update_leave_request(
     leave_id: int,
     update_data: schemas.LeaveRequestUpdate,
     db: Session = Depends(get_db),
     current_moh: schemas.MOHOfficer = Depends(get_current_moh)
 ):
-    return crud.update_leave_request(db, leave_id, update_data)
+    leave = await async_crud.update_leave_request(db, leave_id, update_data, current_moh.moh_area)
+    if leave is None:
+        raise HTTPException(status_code=404, detail="Leave request not found in your area")
+    return leave
             
 # --- MOTHER PASSWORD CHANGE ---
 
 @app.put("/mothers/me/password", response_model=dict)
-def change_mother_password(
+async def change_mother_password(
     password_data: schemas.PasswordChange,
     db: Session = Depends(get_db),
     current_mother: schemas.Mother = Depends(get_current_mother)
 ):
-    success = crud.update_mother_password(db, mother_id=current_mother.id, password_data=password_data)
-    if not success:
+    db_mother = await async_crud.get_mother(db, current_mother.id)
+    if not db_mother or not await passwords.verify_password(password_data.old_password, db_mother.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect old password")
+
+    new_hash = await passwords.hash_password(password_data.new_password)
+    await async_crud.update_mother_password(db, mother_id=current_mother.id, new_hash=new_hash)
         
     return {"message": "Password updated successfully"}
 
 # --- SMART CARE PLAN ENDPOINTS ---
 
 @app.post("/mothers/{mother_id}/pregnancy", response_model=schemas.Mother)
-def start_pregnancy(mother_id: int, data: schemas.PregnancyStart, db: Session = Depends(get_db), current_midwife: models.Midwife = Depends(get_current_midwife)):
-    db_mother = crud.get_mother(db, mother_id)
+async def start_pregnancy(mother_id: int, data: schemas.PregnancyStart, db: Session = Depends(get_db), current_midwife: models.Midwife = Depends(get_current_midwife)):
+    db_mother = await async_crud.get_mother(db, mother_id)
     if not db_mother or db_mother.midwife_id != current_midwife.id:
         raise HTTPException(status_code=404, detail="Mother not found or not assigned to you")
         
-    updated_mother = crud.start_pregnancy(db, mother_id, data.record_data, data.past_history, data.risk_level)
-    return updated_mother
+    updated_mother = await async_crud.start_pregnancy(db, mother_id, data.record_data, data.past_history, data.risk_level)
+    return await async_crud.load_for_response(db, updated_mother)
 
 @app.get("/mothers/{mother_id}/pregnancy", response_model=schemas.PregnancyStart)
-def get_pregnancy_record(mother_id: int, db: Session = Depends(get_db)):
+async def get_pregnancy_record(mother_id: int, db: Session = Depends(get_db)):
     # Note: Returns the data shape matching the Input form, not the raw DB model
-    db_record = crud.get_pregnancy_record_by_mother(db, mother_id)
+    db_record = await async_crud.get_pregnancy_record_by_mother(db, mother_id)
     if not db_record:
         raise HTTPException(status_code=404, detail="No pregnancy record found")
     
-    past_history = crud.get_past_pregnancies_by_mother(db, mother_id)
-    db_mother = crud.get_mother(db, mother_id)
+    past_history = await async_crud.get_past_pregnancies_by_mother(db, mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id)
     
     return schemas.PregnancyStart(
         record_data=db_record,
@@ -582,64 +1103,166 @@ def get_pregnancy_record(mother_id: int, db: Session = Depends(get_db)):
         risk_level=db_mother.risk_level if db_mother else "Low"
     )
 
+# Whole health file in one round trip: ?sections=pregnancy,anc_visits,... (default: all).
+# Sends an ETag; a client that still has the same file gets an empty 304.
+@app.get("/mothers/{mother_id}/health-file", response_model=schemas.MotherHealthFile)
+async def get_mother_health_file(
+    mother_id: int,
+    request: Request,
+    sections: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_midwife: schemas.Midwife = Depends(get_current_midwife)
+):
+    selected = list(crud.HEALTH_FILE_SECTIONS)
+    if sections:
+        selected = list(dict.fromkeys(s.strip() for s in sections.split(",") if s.strip()))
+        unknown = [s for s in selected if s not in crud.HEALTH_FILE_SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+
+    health_file = await async_crud.get_mother_health_file(db, mother_id, selected)
+    if not health_file or health_file["mother"].midwife_id != current_midwife.id:
+        raise HTTPException(status_code=404, detail="Mother not found or not assigned to you")
+    body = schemas.MotherHealthFile.model_validate(health_file, from_attributes=True).model_dump_json()
+    return http_cache.etag_response(request, body.encode())
+
 @app.put("/mothers/{mother_id}/pregnancy", response_model=schemas.Mother)
-def update_pregnancy_record(mother_id: int, data: schemas.PregnancyStart, db: Session = Depends(get_db), current_midwife: models.Midwife = Depends(get_current_midwife)):
-    db_mother = crud.get_mother(db, mother_id)
+async def update_pregnancy_record(mother_id: int, data: schemas.PregnancyStart, db: Session = Depends(get_db), current_midwife: models.Midwife = Depends(get_current_midwife)):
+    db_mother = await async_crud.get_mother(db, mother_id)
     if not db_mother or db_mother.midwife_id != current_midwife.id:
          raise HTTPException(status_code=404, detail="Mother not found or not assigned")
     
-    updated_mother = crud.update_pregnancy_record(db, mother_id, data.record_data, data.past_history, data.risk_level)
-    return updated_mother
+    updated_mother = await async_crud.update_pregnancy_record(db, mother_id, data.record_data, data.past_history, data.risk_level)
+    return await async_crud.load_for_response(db, updated_mother)
 
 @app.post("/mothers/{mother_id}/delivery", response_model=schemas.Mother)
-def report_delivery(
+async def report_delivery(
     mother_id: int,
     data: schemas.DeliveryReport,
     db: Session = Depends(get_db),
     current_midwife: schemas.Midwife = Depends(get_current_midwife)
 ):
     # Verify ownership
-    db_mother = crud.get_mother(db, mother_id)
+    db_mother = await async_crud.get_mother(db, mother_id)
     if not db_mother or db_mother.midwife_id != current_midwife.id:
         raise HTTPException(status_code=404, detail="Mother not found or not assigned to you")
         
-    updated_mother = crud.report_delivery(db, mother_id, data.delivery_date)
-    return updated_mother
+    updated_mother = await async_crud.report_delivery(db, mother_id, data.delivery_date)
+    return await async_crud.load_for_response(db, updated_mother)
 
 
 # new section added for the web ---
 
 @app.get("/mothers/risks/stats")
-def get_risk_stats(
+async def get_risk_stats(
     db: Session = Depends(get_db),
     current_midwife: models.Midwife = Depends(get_current_midwife)
 ):
     # Returns counts for each risk category
-    return crud.get_risk_stats(db, current_midwife.id)
+    return await async_crud.get_risk_stats(db, current_midwife.id)
 
 @app.get("/mothers/risks/{risk_type}", response_model=List[schemas.Mother])
-def get_mothers_by_risk(
+async def get_mothers_by_risk(
     risk_type: str,
     db: Session = Depends(get_db),
     current_midwife: models.Midwife = Depends(get_current_midwife)
 ):
     # risk_type: "high_risk", "diabetes", "cardiac", "age", "pph", "gravidity"
-    return crud.get_mothers_by_risk(db, current_midwife.id, risk_type)
+    mothers = await async_crud.get_mothers_by_risk(db, current_midwife.id, risk_type)
+    return fast_json.list_response(schemas.Mother, await async_crud.load_for_response(db, mothers))
+
+
+# --- INTERNAL: OPERATIONS ---
+
+@app.get("/internal/pool-stats")
+async def read_pool_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker connection pool state and checkout wait-time histogram
+    return get_pool_stats()
+
+@app.get("/internal/principal-cache-stats")
+async def read_principal_cache_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker hit/miss counters for the auth token + principal caches
+    return principal_cache.get_stats()
+
+@app.get("/internal/payload-stats")
+async def read_payload_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker response sizes per endpoint and compression counters (see compression.py)
+    return compression.get_stats()
+
+@app.get("/internal/json-stats")
+async def read_json_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker fast JSON list encoder counters (see fast_json.py)
+    return fast_json.get_stats()
+
+@app.get("/internal/dashboard-push-stats")
+async def read_dashboard_push_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker open dashboard sockets, pushes and count refreshes
+    return dashboard_events.hub.get_stats()
+
+@app.get("/internal/midwife-stats")
+async def read_midwife_stats_job(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Reconciliation runs / rows repaired (per worker)
+    return midwife_stats.get_stats()
+
+@app.post("/internal/midwife-stats/reconcile")
+async def reconcile_midwife_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Recount every midwife's dashboard counters now and repair drift
+    return await run_in_threadpool(midwife_stats.reconcile)
+
+@app.get("/internal/care-plan-stats")
+async def read_care_plan_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker compiled care plan cache
+    return care_plans.get_stats()
+
+@app.get("/internal/route-plan-stats")
+async def read_route_plan_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker home-visit plan cache and build times
+    return route_plans.get_stats()
+
+@app.get("/internal/maintenance-stats")
+async def read_maintenance_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Nightly run / step durations and the last result (per worker)
+    return maintenance.get_stats()
+
+@app.post("/internal/maintenance/run")
+async def run_maintenance(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Run the nightly steps now (still only if no other worker holds the lock)
+    result = await run_in_threadpool(maintenance.run_once, True)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running on another worker")
+    return result
+
+@app.get("/internal/password-pool-stats")
+async def read_password_pool_stats(current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Per-worker bcrypt pool queue depth, wait time and hash duration
+    return passwords.get_stats()
+
+@app.get("/internal/outbox-stats")
+async def read_outbox_stats(db: Session = Depends(get_db), current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    # Queue size by status (Pending / Sent / Dead) plus sender counters
+    return {"counts": await async_crud.get_outbox_counts(db), **mailer.get_stats()}
+
+@app.post("/internal/outbox/requeue-dead")
+async def requeue_dead_emails(db: Session = Depends(get_db), current_moh: schemas.MOHOfficer = Depends(get_current_moh)):
+    requeued = await async_crud.requeue_dead_emails(db)
+    mailer.worker.wake()
+    return {"requeued": requeued}
 
 
 # --- TEMPORARY SEED ENDPOINT ---
 @app.get("/seed-moh")
-def seed_moh(db: Session = Depends(get_db)):
+def seed_moh(db: Session = Depends(get_sync_db)):
     existing = crud.get_moh_officer_by_username(db, "moh_admin")
     if existing:
         # Force Reset Password
         existing.hashed_password = crud.get_password_hash("password123")
         db.commit()
+        principal_cache.invalidate("moh", existing.username)
         return {"message": "User 'moh_admin' exists. PASSWORD RESET to: password123"}
     
 
 @app.get("/seed-moh")
-def seed_moh(db: Session = Depends(get_db)):
+def seed_moh(db: Session = Depends(get_sync_db)):
     # 1. Check if MOH Admin exists
     moh = crud.get_moh_officer_by_username(db, "moh_admin")
     if not moh:
@@ -654,7 +1277,7 @@ def seed_moh(db: Session = Depends(get_db)):
     return {"message": "MOH Admin already exists"}
 
 @app.get("/seed-leave")
-def seed_leave(db: Session = Depends(get_db)):
+def seed_leave(db: Session = Depends(get_sync_db)):
     # 1. Get or Create a Midwife
     midwife = db.query(models.Midwife).first()
     if not midwife:
@@ -662,7 +1285,8 @@ def seed_leave(db: Session = Depends(get_db)):
             username="test_midwife",
             hashed_password=crud.get_password_hash("123"),
             full_name="Test Midwife",
-            nic="123456789V"
+            nic="123456789V",
+            assigned_moh_area="Colombo"
         )
         db.add(midwife)
         db.commit()
@@ -692,12 +1316,11 @@ def seed_leave(db: Session = Depends(get_db)):
 @app.get("/reset-db-smart")
 def reset_db_smart():
     # WARNING: This deletes all data!
-    models.Base.metadata.drop_all(bind=engine)
-    models.Base.metadata.create_all(bind=engine)
+    migrations.reset(engine)
     return {"message": "Database has been RESET for Smart Care Plan features. Please re-seed data."}
 
 @app.get("/seed-dashboard-v2")
-def seed_dashboard(db: Session = Depends(get_db)):
+def seed_dashboard(db: Session = Depends(get_sync_db)):
     midwife = crud.get_midwife_by_username(db, "test_midwife")
     if not midwife:
         # Create midwife if not exists (after reset)
@@ -705,7 +1328,8 @@ def seed_dashboard(db: Session = Depends(get_db)):
             username="test_midwife",
             hashed_password=crud.get_password_hash("123"),
             full_name="Test Midwife",
-            nic="123456789V"
+            nic="123456789V",
+            assigned_moh_area="Colombo"
         )
         db.add(midwife)
         db.commit()
@@ -754,4 +1378,5 @@ def seed_dashboard(db: Session = Depends(get_db)):
     return {"message": "Seeded Dashboard: 1 Midwife, 5 Mothers, 3 Appointments, 1 MOH Officer (moh_admin)"}
 
 # This tells FastAPI: "If someone goes to http://localhost:8000/static/login.html, show them that file."
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+# Serves the .br / .gz variants written at deploy time when the browser accepts them
+app.mount("/static", compression.PrecompressedStaticFiles(directory="static"), name="static")
\ No newline at end of file
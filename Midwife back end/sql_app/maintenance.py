@@ -0,0 +1,233 @@
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from . import crud, metrics, models
+from .database import SessionLocal
+
+# ---------------------------------------------------------
+# ---------------- NIGHTLY MAINTENANCE --------------------
+# ---------------------------------------------------------
+# Once a day, at MAINTENANCE_AT local time, one process runs these steps in order:
+#   missed     Scheduled visits dated before today become Missed
+#              (MAINTENANCE_CHUNK_SIZE per transaction; dashboards and the
+#              mothers' /my-appointments are updated like any other write)
+#   rollup     appointment_daily_counts for the last MAINTENANCE_ROLLUP_DAYS
+#              days (late edits of recent visits are picked up again)
+#   reminders  tomorrow's Scheduled visits, with the mother's phone number,
+#              for GET /appointments/reminders
+#   counters   midwife_stats recount (the missed-visit window moves on)
+#
+# Every gunicorn worker runs the scheduler thread, but only the one holding
+# the lease on the job_locks row does the work. The lease is renewed between
+# chunks; a worker that dies mid-run leaves it to expire after
+# MAINTENANCE_LEASE_SECONDS, and the next worker to check picks the run up.
+# Every step is idempotent, so a run cut short is simply run again.
+#
+# Sidecar / cron instead (MAINTENANCE_AT= on the web workers):
+#     python -m sql_app.maintenance run      # once, now (still takes the lock)
+#     python -m sql_app.maintenance          # scheduler in the foreground
+#
+# GET /internal/maintenance-stats shows step durations and the last result;
+# POST /internal/maintenance/run starts a run now.
+
+MAINTENANCE_AT = os.getenv("MAINTENANCE_AT", "" if os.getenv("VERCEL") else "02:30") # HH:MM, empty = off
+MAINTENANCE_POLL_SECONDS = float(os.getenv("MAINTENANCE_POLL_SECONDS", "60"))
+MAINTENANCE_LEASE_SECONDS = int(os.getenv("MAINTENANCE_LEASE_SECONDS", "300"))
+MAINTENANCE_ROLLUP_DAYS = int(os.getenv("MAINTENANCE_ROLLUP_DAYS", "7"))
+JOB_NAME = "nightly-maintenance"
+STEPS = ("missed", "rollup", "reminders", "counters")
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+# --- Metrics ---
+runs = metrics.Counter()
+failures = metrics.Counter()
+lock_busy = metrics.Counter()
+run_ms = metrics.Histogram([1000, 5000, 30000, 120000, 600000])
+step_ms = {step: metrics.Histogram([100, 1000, 5000, 30000, 120000]) for step in STEPS}
+step_rows = {step: metrics.Counter() for step in STEPS}
+last_result = {}
+
+logger = logging.getLogger(__name__)
+
+class LeaseLost(Exception):
+    pass
+
+# --- Leader election (lease on a job_locks row) ---
+
+def acquire(db, name: str = JOB_NAME):
+    # True if this process now holds the lease (or already did)
+    Lock = models.JobLock
+    now = datetime.now()
+    values = {Lock.holder: HOLDER, Lock.locked_until: now + timedelta(seconds=MAINTENANCE_LEASE_SECONDS)}
+    taken = db.query(Lock).filter(
+        Lock.name == name,
+        or_(Lock.locked_until.is_(None), Lock.locked_until < now, Lock.holder == HOLDER),
+    ).update(values, synchronize_session=False)
+    if not taken and db.query(Lock.name).filter(Lock.name == name).first() is None:
+        db.add(models.JobLock(name=name, holder=HOLDER, locked_until=values[Lock.locked_until]))
+        taken = 1
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback() # Another worker created the row first
+        return False
+    return bool(taken)
+
+def renew(db, name: str = JOB_NAME):
+    Lock = models.JobLock
+    renewed = db.query(Lock).filter(Lock.name == name, Lock.holder == HOLDER).update(
+        {Lock.locked_until: datetime.now() + timedelta(seconds=MAINTENANCE_LEASE_SECONDS)},
+        synchronize_session=False,
+    )
+    db.commit()
+    if not renewed:
+        raise LeaseLost(f"{name}: lease taken over by another worker")
+
+def release(db, name: str = JOB_NAME, finished_on: date = None):
+    Lock = models.JobLock
+    values = {Lock.locked_until: None}
+    if finished_on is not None:
+        values.update({Lock.last_run_on: finished_on, Lock.last_finished_at: datetime.now()})
+    db.query(Lock).filter(Lock.name == name, Lock.holder == HOLDER).update(values, synchronize_session=False)
+    db.commit()
+
+def last_run_on(db, name: str = JOB_NAME):
+    return db.query(models.JobLock.last_run_on).filter(models.JobLock.name == name).scalar()
+
+def last_finished_at(db, name: str = JOB_NAME):
+    return db.query(models.JobLock.last_finished_at).filter(models.JobLock.name == name).scalar()
+
+# --- The run ---
+
+def _steps(db, today: date):
+    def keep_lease():
+        renew(db)
+    yield "missed", lambda: crud.mark_missed_appointments(
+        db, datetime.combine(today, datetime.min.time()), on_chunk=keep_lease)
+    yield "rollup", lambda: sum(crud.rollup_appointment_counts(db, today - timedelta(days=days))
+                                for days in range(MAINTENANCE_ROLLUP_DAYS, 0, -1))
+    yield "reminders", lambda: crud.build_appointment_reminders(db, today + timedelta(days=1))
+    yield "counters", lambda: crud.reconcile_midwife_stats(db, on_chunk=keep_lease)["repaired"]
+
+def run_once(force: bool = False):
+    # Runs the steps if this process gets the lease and (unless force) today's
+    # run hasn't happened yet. Returns the result, or None if there was nothing to do.
+    db = SessionLocal()
+    today = date.today()
+    try:
+        if not force and last_run_on(db) == today:
+            return None
+        if not acquire(db):
+            lock_busy.inc()
+            return None
+        if not force and last_run_on(db) == today:
+            release(db) # Finished by another worker just before we took the lease
+            return None
+        started_at = time.perf_counter()
+        result = {"started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "holder": HOLDER, "steps": {}}
+        try:
+            for step, fn in _steps(db, today):
+                step_started = time.perf_counter()
+                rows = fn()
+                elapsed = (time.perf_counter() - step_started) * 1000
+                step_ms[step].observe(elapsed)
+                step_rows[step].inc(rows)
+                result["steps"][step] = {"rows": rows, "ms": round(elapsed, 1)}
+                renew(db)
+        except Exception as e:
+            db.rollback()
+            failures.inc()
+            result["error"] = str(e)
+            last_result.clear()
+            last_result.update(result)
+            if isinstance(e, LeaseLost):
+                logger.warning("Maintenance stopped after %s: %s", list(result["steps"]), e)
+            else:
+                release(db) # Let the next check (any worker) try again
+            raise # Logged by the caller (scheduler, endpoint, CLI)
+        release(db, finished_on=today)
+        elapsed = (time.perf_counter() - started_at) * 1000
+        run_ms.observe(elapsed)
+        runs.inc()
+        result["ms"] = round(elapsed, 1)
+        last_result.clear()
+        last_result.update(result)
+        logger.info("Maintenance finished in %.0f ms: %s", elapsed, result["steps"])
+        return result
+    finally:
+        db.close()
+
+def _due(now: datetime):
+    hour, minute = (int(part) for part in MAINTENANCE_AT.split(":"))
+    return (now.hour, now.minute) >= (hour, minute)
+
+class Scheduler:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        self._done_on = None # Day this process last saw a finished run (saves the DB check)
+
+    def start(self):
+        if self._thread is not None or not MAINTENANCE_AT:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(MAINTENANCE_POLL_SECONDS):
+            now = datetime.now()
+            if self._done_on == now.date() or not _due(now):
+                continue
+            try:
+                run_once()
+                db = SessionLocal()
+                try:
+                    if last_run_on(db) == now.date():
+                        self._done_on = now.date()
+                finally:
+                    db.close()
+            except LeaseLost:
+                pass # Logged by run_once; the worker holding the lease carries on
+            except Exception:
+                logger.exception("Maintenance run failed (steps done: %s)", list(last_result.get("steps", {})))
+
+scheduler = Scheduler()
+
+def get_stats():
+    return {
+        "at": MAINTENANCE_AT or None,
+        "holder": HOLDER,
+        "runs": runs.snapshot(),
+        "failures": failures.snapshot(),
+        "lock_busy": lock_busy.snapshot(),
+        "run_ms": run_ms.snapshot(),
+        "steps": {step: {"ms": step_ms[step].snapshot(), "rows": step_rows[step].snapshot()} for step in STEPS},
+        "last_result": dict(last_result),
+    }
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "schedule"
+    if command == "run":
+        print(run_once(force=True) or "lock held by another worker")
+    elif command == "schedule":
+        if not MAINTENANCE_AT:
+            sys.exit("MAINTENANCE_AT is not set")
+        scheduler._run()
+    else:
+        sys.exit("usage: python -m sql_app.maintenance [run|schedule]")
@@ -0,0 +1,51 @@
+import bisect
+import threading
+
+# ---------------------------------------------------------
+# ---------------- IN-PROCESS METRICS ---------------------
+# ---------------------------------------------------------
+# Small thread-safe counters/histograms for the /internal/* endpoints.
+# Values are per gunicorn worker (each worker is its own process).
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, buckets):
+        # buckets: sorted upper bounds; anything above the last goes to "+Inf"
+        self.buckets = list(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 3),
+                "avg": round(self._sum / self._count, 3) if self._count else 0.0,
+                "max": round(self._max, 3),
+                "buckets": dict(zip(labels, self._counts)),
+            }
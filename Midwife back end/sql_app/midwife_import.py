@@ -0,0 +1,182 @@
+import codecs
+import csv
+import os
+from datetime import datetime
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from . import async_crud, crud, mailer, passwords, schemas
+
+# ---------------------------------------------------------
+# ---------------- BULK MIDWIFE IMPORT --------------------
+# ---------------------------------------------------------
+# POST /midwives/import takes a CSV or XLSX file with one midwife per row.
+# Header names are the MidwifeRegistration fields (full_name, nic,
+# date_of_birth, phone_number, email, residential_address, slmc_reg_no,
+# service_grade, assigned_moh_area, is_active); username = NIC and the
+# password is generated, as in POST /midwives/full.
+#
+# The file is read IMPORT_CHUNK_SIZE rows at a time (parsing runs in the
+# threadpool). Per chunk:
+#   1. validate rows against schemas.MidwifeRegistration
+#   2. reject NIC/email/phone repeated earlier in the same file
+#   3. one query for NIC/email/phone already in the database
+#   4. hash the generated passwords on the password pool, in parallel
+#   5. one multi-row INSERT of midwives + their queued credential emails
+#
+# Generated passwords are random one-time secrets (~60 bits), so they are
+# hashed at IMPORT_BCRYPT_ROUNDS; the normal login path rehashes them at
+# BCRYPT_ROUNDS the first time the midwife signs in. At the full cost a
+# 5,000 row import would spend most of an hour in bcrypt.
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "20000"))
+IMPORT_BCRYPT_ROUNDS = int(os.getenv("IMPORT_BCRYPT_ROUNDS", "5"))
+
+class ImportFileError(Exception):
+    pass
+
+def _header(name):
+    return str(name or "").strip().lower().replace(" ", "_")
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) # Excel turns phone numbers / NICs into numbers
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+def _csv_rows(file):
+    reader = csv.reader(codecs.iterdecode(file, "utf-8-sig"))
+    header = [_header(name) for name in next(reader, [])]
+    for row_number, values in enumerate(reader, start=2):
+        if any(v.strip() for v in values):
+            yield row_number, dict(zip(header, values))
+
+def _xlsx_rows(file):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError("XLSX import needs the openpyxl package; upload a CSV instead")
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [_header(name) for name in next(rows, [])]
+    for row_number, values in enumerate(rows, start=2):
+        if any(v is not None and str(v).strip() for v in values):
+            yield row_number, dict(zip(header, values))
+
+def open_rows(file, filename: str):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return _csv_rows(file)
+    if name.endswith(".xlsx"):
+        return _xlsx_rows(file)
+    raise ImportFileError("Upload a .csv or .xlsx file")
+
+def validate_row(values: dict):
+    # Returns (MidwifeRegistration, None) or (None, [error, ...])
+    values = {key: _clean(value) for key, value in values.items() if key}
+    values = {key: value for key, value in values.items()
+              if value is not None and key not in ("username", "password")}
+    try:
+        return schemas.MidwifeRegistration(username=values.get("nic") or "", password="", **values), None
+    except ValidationError as e:
+        return None, [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+def read_chunk(rows, size: int):
+    # Next `size` rows, already validated: [(row_number, registration or None, errors)]
+    chunk = []
+    for row_number, values in rows:
+        chunk.append((row_number, *validate_row(values)))
+        if len(chunk) >= size:
+            break
+    return chunk
+
+def _result(row_number, status, username=None, errors=None, password=None):
+    return {"row": row_number, "status": status, "username": username, "errors": errors or [], "password": password}
+
+async def import_midwives(db, file, filename: str, dry_run: bool = False):
+    rows = open_rows(file, filename)
+    results = []
+    seen = {"nic": set(), "email": set(), "phone_number": set()}
+    total = 0
+
+    while True:
+        try:
+            chunk = await run_in_threadpool(read_chunk, rows, IMPORT_CHUNK_SIZE)
+        except (UnicodeDecodeError, csv.Error, ValueError, KeyError) as e:
+            raise ImportFileError(f"Could not read the file: {e}")
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > IMPORT_MAX_ROWS:
+            raise ImportFileError(f"Too many rows (max {IMPORT_MAX_ROWS})")
+
+        # 1-2. Validation errors and duplicates within the file
+        candidates = []
+        for row_number, registration, errors in chunk:
+            if registration is None:
+                results.append(_result(row_number, "invalid", errors=errors))
+                continue
+            keys = {"nic": registration.nic, "email": (registration.email or "").lower() or None,
+                    "phone_number": registration.phone_number}
+            repeated = [field for field, value in keys.items() if value and value in seen[field]]
+            for field, value in keys.items():
+                if value:
+                    seen[field].add(value)
+            if repeated:
+                results.append(_result(row_number, "duplicate", registration.nic,
+                                       [f"{field} appears earlier in the file" for field in repeated]))
+                continue
+            candidates.append((row_number, registration, keys))
+
+        # 3. Conflicts with existing midwives (one query for the chunk)
+        taken = await async_crud.find_midwife_conflicts(
+            db,
+            nics=[keys["nic"] for _, _, keys in candidates],
+            emails=[keys["email"] for _, _, keys in candidates if keys["email"]],
+            phones=[keys["phone_number"] for _, _, keys in candidates if keys["phone_number"]],
+        )
+        accepted = []
+        for row_number, registration, keys in candidates:
+            conflicts = [field for field, value in keys.items() if value and value in taken[field]]
+            if conflicts:
+                results.append(_result(row_number, "conflict", registration.nic,
+                                       [f"{field} already registered" for field in conflicts]))
+            else:
+                accepted.append((row_number, registration))
+
+        if dry_run:
+            results.extend(_result(row_number, "valid", registration.nic) for row_number, registration in accepted)
+            continue
+        if not accepted:
+            continue
+
+        # 4. Hash generated passwords in parallel, 5. insert chunk + queue emails
+        generated = [crud.generate_secure_password() for _ in accepted]
+        hashes = await passwords.hash_many(generated, rounds=IMPORT_BCRYPT_ROUNDS)
+        mails = [
+            (registration.email, *crud.credentials_email(registration.full_name, registration.nic, password))
+            for (_, registration), password in zip(accepted, generated) if registration.email
+        ]
+        registrations = [(registration, hashed) for (_, registration), hashed in zip(accepted, hashes)]
+        if await async_crud.bulk_create_midwives(db, registrations, mails):
+            for (row_number, registration), password in zip(accepted, generated):
+                # No email on file: the report is the only place the MOH can get the password
+                results.append(_result(row_number, "created", registration.nic,
+                                       password=None if registration.email else password))
+        else:
+            for row_number, registration in accepted:
+                results.append(_result(row_number, "failed", registration.nic,
+                                       ["registered by someone else during the import; upload this row again"]))
+
+    if not dry_run:
+        mailer.worker.wake()
+    results.sort(key=lambda r: r["row"])
+    created = sum(1 for r in results if r["status"] in ("created", "valid"))
+    return {"total": total, "created": created, "failed": total - created, "dry_run": dry_run, "rows": results}
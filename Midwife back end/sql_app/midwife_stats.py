@@ -0,0 +1,133 @@
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from . import crud, maintenance, metrics
+from .database import SessionLocal
+
+# ---------------------------------------------------------
+# -------------- MIDWIFE STATS RECONCILIATION -------------
+# ---------------------------------------------------------
+# The dashboard counters in midwife_stats are adjusted by every write (see
+# crud.adjust_midwife_stats). Anything that changes the tables behind their
+# back (manual SQL, a write path that forgot to adjust, a restore) makes them
+# drift, so they are recounted from the source tables every
+# STATS_RECONCILE_SECONDS by a background thread (0 = off).
+#
+# Every gunicorn worker runs the thread, but the recount runs under a lease
+# on its job_locks row (the same leader election as maintenance.py): each
+# STATS_RECONCILE_POLL_SECONDS a worker checks when the last recount finished
+# (one primary-key read), and only the one that takes the lease once it is
+# due does the work. So it runs once per interval, not once per worker.
+# Off on the web workers (STATS_RECONCILE_SECONDS=0), it can run from cron:
+#     python -m sql_app.midwife_stats
+#
+# POST /internal/midwife-stats/reconcile runs it on demand.
+
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "0" if os.getenv("VERCEL") else "3600"))
+STATS_RECONCILE_POLL_SECONDS = min(STATS_RECONCILE_SECONDS, maintenance.MAINTENANCE_POLL_SECONDS) or 60
+JOB_NAME = "midwife-stats-reconcile"
+
+# --- Metrics ---
+runs = metrics.Counter()
+repaired = metrics.Counter()
+run_ms = metrics.Histogram([100, 500, 1000, 5000, 30000, 120000])
+lock_busy = metrics.Counter()
+last_result = {}
+
+logger = logging.getLogger(__name__)
+
+def reconcile(db=None, on_chunk=None):
+    own_session = db is None
+    db = SessionLocal() if own_session else db
+    started_at = time.perf_counter()
+    try:
+        result = crud.reconcile_midwife_stats(db, on_chunk=on_chunk)
+    finally:
+        if own_session:
+            db.close()
+    run_ms.observe((time.perf_counter() - started_at) * 1000)
+    runs.inc()
+    repaired.inc(result["repaired"])
+    last_result.update(result, finished_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+    if result["repaired"]:
+        logger.info("Repaired %d of %d midwife_stats rows", result["repaired"], result["checked"])
+    return result
+
+def _due(db):
+    finished_at = maintenance.last_finished_at(db, JOB_NAME)
+    return finished_at is None or finished_at <= datetime.now() - timedelta(seconds=STATS_RECONCILE_SECONDS)
+
+def reconcile_if_due():
+    # Recounts if the last recount (by any worker) is STATS_RECONCILE_SECONDS
+    # old and this process gets the lease. Returns the result, or None.
+    db = SessionLocal()
+    try:
+        if not _due(db):
+            return None
+        if not maintenance.acquire(db, JOB_NAME):
+            lock_busy.inc()
+            return None
+        if not _due(db):
+            maintenance.release(db, JOB_NAME) # Another worker finished just before we took the lease
+            return None
+        try:
+            result = reconcile(db, on_chunk=lambda: maintenance.renew(db, JOB_NAME))
+        except maintenance.LeaseLost:
+            raise
+        except Exception:
+            db.rollback()
+            maintenance.release(db, JOB_NAME)
+            raise
+        maintenance.release(db, JOB_NAME, finished_on=date.today())
+        return result
+    finally:
+        db.close()
+
+class Reconciler:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or STATS_RECONCILE_SECONDS <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="midwife-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(STATS_RECONCILE_POLL_SECONDS):
+            try:
+                reconcile_if_due()
+            except maintenance.LeaseLost as e:
+                logger.warning("Midwife stats recount stopped: %s", e)
+            except Exception:
+                logger.exception("Midwife stats recount failed")
+
+reconciler = Reconciler()
+
+def get_stats():
+    return {
+        "interval_seconds": STATS_RECONCILE_SECONDS,
+        "holder": maintenance.HOLDER,
+        "runs": runs.snapshot(),
+        "lock_busy": lock_busy.snapshot(),
+        "repaired": repaired.snapshot(),
+        "run_ms": run_ms.snapshot(),
+        "last_result": dict(last_result),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] != "reconcile":
+        sys.exit("usage: python -m sql_app.midwife_stats [reconcile]")
+    print(reconcile())
@@ -0,0 +1,286 @@
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import DATETIME, Column, Integer, MetaData, String, Table, bindparam, func, inspect, select, text
+
+from . import models
+from .database import engine
+
+# ---------------------------------------------------------
+# ------------------ SCHEMA MIGRATIONS --------------------
+# ---------------------------------------------------------
+# The app no longer runs create_all() when it is imported. The schema is
+# upgraded once per deploy (see Procfile.txt):
+#
+#     python -m sql_app.migrations upgrade   # apply pending migrations
+#     python -m sql_app.migrations status    # show current / latest version
+#
+# Every applied migration is recorded in `schema_version`. On startup
+# main.py calls check_schema_current(), which refuses to boot if the
+# database is behind the code.
+#
+# Steps must be idempotent (check before create/alter): MySQL commits DDL
+# immediately, so a step interrupted halfway has to be safe to re-run. A
+# fresh database also gets tables created from the *current* models in the
+# baseline step, so later steps will find their columns/indexes present.
+# An existing database is not rebuilt, so a step may only touch what it
+# introduces: indexes are created by name, never "whatever the model has now"
+# (a later index can depend on a column that a later step adds).
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version", version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255)),
+    Column("applied_at", DATETIME),
+)
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+# --- Idempotent DDL helpers ---
+
+def _create_tables(conn, *model_classes):
+    for model in model_classes:
+        model.__table__.create(bind=conn, checkfirst=True)
+
+def _create_indexes(conn, model, *index_names):
+    indexes = {index.name: index for index in model.__table__.indexes}
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(model.__tablename__)}
+    for name in index_names:
+        if name not in existing:
+            indexes[name].create(bind=conn)
+
+def _add_columns(conn, model, *column_names):
+    table = model.__table__
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+# --- Migrations (append new ones at the bottom, never edit applied ones) ---
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+    _create_tables(
+        conn,
+        models.Midwife, models.Mother, models.MOHOfficer, models.Appointment,
+        models.ANCVisit, models.PNCVisit, models.HealthRecord, models.PregnancyRecord,
+        models.PastPregnancy, models.DeliveryRecord, models.AntenatalPlan, models.LeaveRequest,
+    )
+
+@migration(2, "composite indexes for hot crud queries")
+def _hot_query_indexes(conn):
+    # See the __table_args__ comments in models.py for the query each index serves
+    _create_indexes(conn, models.Mother, "ix_mothers_midwife_status")
+    _create_indexes(conn, models.Appointment, "ix_appointments_midwife_date", "ix_appointments_mother_status")
+    _create_indexes(conn, models.PregnancyRecord, "ix_pregnancy_records_mother_created")
+    _create_indexes(conn, models.ANCVisit, "ix_anc_visits_mother_date")
+    _create_indexes(conn, models.PNCVisit, "ix_pnc_visits_mother_date")
+    _create_indexes(conn, models.LeaveRequest, "ix_leave_requests_midwife_dates")
+
+@migration(3, "mother search: name token table + (midwife_id, nic) index")
+def _mother_search(conn):
+    from .crud import tokenize_search_text
+    _create_tables(conn, models.MotherSearchToken)
+    _create_indexes(conn, models.Mother, "ix_mothers_midwife_nic")
+
+    # Backfill tokens for existing mothers, in chunks
+    tokens = models.MotherSearchToken.__table__
+    mothers = models.Mother.__table__
+    conn.execute(tokens.delete())
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(mothers.c.id, mothers.c.midwife_id, mothers.c.full_name)
+            .where(mothers.c.id > last_id).order_by(mothers.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        values = [
+            {"mother_id": row.id, "midwife_id": row.midwife_id, "token": token}
+            for row in rows for token in tokenize_search_text(row.full_name)
+        ]
+        if values:
+            conn.execute(tokens.insert(), values)
+        conn.commit()
+        last_id = rows[-1].id
+
+@migration(4, "keyset pagination indexes")
+def _keyset_pagination_indexes(conn):
+    _create_indexes(conn, models.Mother, "ix_mothers_midwife_id")
+    _create_indexes(conn, models.HealthRecord, "ix_health_records_mother_id")
+
+@migration(5, "midwife directory: assigned_moh_area index")
+def _midwife_directory_index(conn):
+    _create_indexes(conn, models.Midwife, "ix_midwives_area_name")
+
+@migration(6, "leave queue: (status, start_date) index")
+def _leave_queue_index(conn):
+    _create_indexes(conn, models.LeaveRequest, "ix_leave_requests_status_start")
+
+@migration(7, "email outbox table")
+def _email_outbox(conn):
+    _create_tables(conn, models.EmailOutbox)
+
+@migration(8, "midwives.dashboard_version for dashboard push / conditional GET")
+def _dashboard_version(conn):
+    _add_columns(conn, models.Midwife, "dashboard_version")
+
+@migration(9, "midwife_stats counters (backfilled)")
+def _midwife_stats(conn):
+    from .crud import reconcile_midwife_stats
+    from sqlalchemy.orm import Session
+    _create_tables(conn, models.MidwifeStats)
+    db = Session(bind=conn)
+    reconcile_midwife_stats(db)
+    db.close()
+
+@migration(10, "mother portal ETag / Last-Modified columns")
+def _mother_portal_versions(conn):
+    columns = [f"{resource}_{suffix}" for resource in
+               ("pregnancy_records", "delivery_records", "antenatal_plans", "appointments")
+               for suffix in ("version", "modified_at")]
+    _add_columns(conn, models.Mother, *columns)
+    mothers = models.Mother.__table__
+    now = datetime.now()
+    for name in columns:
+        conn.execute(mothers.update().where(mothers.c[name].is_(None))
+                     .values({name: 0 if name.endswith("_version") else now}))
+
+@migration(11, "appointments.schedule_key for generated visits (backfilled)")
+def _appointment_schedule_key(conn):
+    _add_columns(conn, models.Appointment, "schedule_key")
+
+    # Visits made by the old generator are recognised by their notes
+    patterns = [
+        (re.compile(r"^Generated Visit \(Week (\d+)\)$"), lambda n: timedelta(weeks=n), "anc-{base}-w{n}"),
+        (re.compile(r"^PNC Visit \d+ \(Day (\d+)\)$"), lambda n: timedelta(days=n), "pnc-{base}-d{n}"),
+    ]
+    appointments = models.Appointment.__table__
+    generated = appointments.c.notes.like("Generated Visit (Week %") | appointments.c.notes.like("PNC Visit % (Day %")
+    set_key = appointments.update().where(appointments.c.id == bindparam("row_id")).values(schedule_key=bindparam("key"))
+    seen = set(conn.execute(
+        select(appointments.c.mother_id, appointments.c.schedule_key).where(appointments.c.schedule_key.isnot(None))
+    ).all())
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(appointments.c.id, appointments.c.mother_id, appointments.c.date_time, appointments.c.notes)
+            .where(appointments.c.id > last_id, appointments.c.schedule_key.is_(None), generated)
+            .order_by(appointments.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        values = []
+        for row in rows:
+            for pattern, offset, template in patterns:
+                match = pattern.match(row.notes)
+                if not match:
+                    continue
+                n = int(match.group(1))
+                key = template.format(base=(row.date_time.date() - offset(n)).isoformat(), n=n)
+                if (row.mother_id, key) not in seen: # Repeats stay unkeyed, i.e. manual
+                    seen.add((row.mother_id, key))
+                    values.append({"row_id": row.id, "key": key})
+                break
+        if values:
+            conn.execute(set_key, values)
+        conn.commit()
+        last_id = rows[-1].id
+    _create_indexes(conn, models.Appointment, "ix_appointments_mother_schedule")
+
+@migration(12, "care plan templates (version 1 = the former built-in schedule), mothers.care_plan_id")
+def _care_plan_templates(conn):
+    _create_tables(conn, models.CarePlanTemplate)
+    _add_columns(conn, models.Mother, "care_plan_id")
+    templates = models.CarePlanTemplate.__table__
+    template_id = conn.execute(select(templates.c.id).where(templates.c.version == 1)).scalar()
+    if template_id is None:
+        definition = {
+            "anc_weeks_high": [12, 16, 20, 24, 28, 32, 36, 40], # Monthly from Month 3 to 9
+            "anc_weeks_low": [12, 26, 36],                      # Simplified Trimester Plan
+            "pnc_days": [3, 7, 14, 42],                         # Days 1-5, 5-10, 11-28, around 42
+        }
+        template_id = conn.execute(templates.insert().values(
+            version=1, name="Standard schedule", definition=json.dumps(definition),
+            is_active=True, created_at=datetime.now(),
+        )).inserted_primary_key[0]
+    # Everyone who already had visits generated got them from this schedule
+    mothers = models.Mother.__table__
+    conn.execute(mothers.update().where(mothers.c.care_plan_id.is_(None), mothers.c.status != "Eligible")
+                 .values(care_plan_id=template_id))
+
+@migration(13, "nightly maintenance: job locks, daily counts, reminders, missed-visit counter")
+def _nightly_maintenance(conn):
+    _create_tables(conn, models.JobLock, models.AppointmentDailyCount, models.AppointmentReminder)
+    _add_columns(conn, models.MidwifeStats, "missed_visits")
+    stats = models.MidwifeStats.__table__
+    conn.execute(stats.update().where(stats.c.missed_visits.is_(None)).values(missed_visits=0))
+    _create_indexes(conn, models.Appointment, "ix_appointments_status_date")
+
+@migration(14, "mothers.latitude / longitude for home-visit routes")
+def _mother_coordinates(conn):
+    _add_columns(conn, models.Mother, "latitude", "longitude")
+
+# --- Runner ---
+
+def current_version(conn):
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+def upgrade(bind=engine, log=print):
+    with bind.connect() as conn:
+        version_metadata.create_all(bind=conn)
+        conn.commit()
+        version = current_version(conn)
+        for number, description, fn in MIGRATIONS:
+            if number <= version:
+                continue
+            log(f"Applying migration {number}: {description}")
+            fn(conn)
+            conn.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.now()
+            ))
+            conn.commit()
+        return current_version(conn)
+
+def reset(bind=engine):
+    # Drops EVERYTHING and rebuilds from scratch (used by /reset-db-smart)
+    models.Base.metadata.drop_all(bind=bind)
+    version_metadata.drop_all(bind=bind)
+    return upgrade(bind, log=lambda message: None)
+
+def check_schema_current(bind=engine):
+    with bind.connect() as conn:
+        version = current_version(conn)
+    if version < latest_version():
+        raise RuntimeError(
+            f"Database schema is at version {version} but this code needs {latest_version()}. "
+            f"Run: python -m sql_app.migrations upgrade"
+        )
+    return version
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        print(f"Schema at version {upgrade()}")
+    elif command == "status":
+        with engine.connect() as conn:
+            print(f"Database: {current_version(conn)}  Latest: {latest_version()}")
+    else:
+        sys.exit("usage: python -m sql_app.migrations [upgrade|status]")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, TEXT, DECIMAL, DATETIME, Boolean, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, TEXT, DECIMAL, DATETIME, Boolean, Date, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -6,6 +6,10 @@ from datetime import datetime
 # --- UPDATED MODEL: Midwife ---
 class Midwife(Base):
     __tablename__ = "midwives"
+    __table_args__ = (
+        # MOH directory: WHERE assigned_moh_area = ? [ORDER BY full_name]
+        Index("ix_midwives_area_name", "assigned_moh_area", "full_name"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
@@ -23,6 +27,10 @@ class Midwife(Base):
     is_active = Column(Boolean, default=True) # For suspension
     
     is_active = Column(Boolean, default=True) # For suspension
+
+    # Bumped (in the same transaction) by every write that changes the home
+    # dashboard: mothers assigned, appointments. See dashboard_events.py.
+    dashboard_version = Column(Integer, default=0)
     
     mothers = relationship("Mother", back_populates="owner")
     appointments = relationship("Appointment", back_populates="midwife")
@@ -30,10 +38,21 @@ class Midwife(Base):
 
 class Mother(Base):
     __tablename__ = "mothers"
+    __table_args__ = (
+        # Caseload lists, counts and risk stats: WHERE midwife_id = ? [AND status IN (...)]
+        Index("ix_mothers_midwife_status", "midwife_id", "status"),
+        # Search: WHERE midwife_id = ? AND nic LIKE 'prefix%'
+        Index("ix_mothers_midwife_nic", "midwife_id", "nic"),
+        # Keyset paging of the caseload: WHERE midwife_id = ? AND id > ? ORDER BY id
+        Index("ix_mothers_midwife_id", "midwife_id", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String(255), nullable=False)
     nic = Column(String(20), unique=True)
     address = Column(TEXT)
+    # Home location (WGS84 degrees) for the daily home-visit route, see route_plans.py
+    latitude = Column(DECIMAL(9, 6))
+    longitude = Column(DECIMAL(9, 6))
     contact_number = Column(String(20))
     hashed_password = Column(String(255), nullable=False)
     midwife_id = Column(Integer, ForeignKey("midwives.id"), nullable=False)
@@ -43,6 +62,21 @@ class Mother(Base):
     risk_level = Column(String(50), default="Low") # Low, High
     pregnancy_start_date = Column(Date) # LMP
     delivery_date = Column(Date) # Actual Delivery Date
+    # care_plan_templates.id the generated visits follow (set when a pregnancy
+    # starts). No FK: the baseline migration creates mothers before that table.
+    care_plan_id = Column(Integer)
+
+    # Mother-portal cache validators, one pair per /my-* list. Bumped in the
+    # same transaction as any write to that list (crud.touch_portal) and sent
+    # as ETag / Last-Modified, so an unchanged list is a 304.
+    pregnancy_records_version = Column(Integer, default=0)
+    pregnancy_records_modified_at = Column(DATETIME, default=datetime.now)
+    delivery_records_version = Column(Integer, default=0)
+    delivery_records_modified_at = Column(DATETIME, default=datetime.now)
+    antenatal_plans_version = Column(Integer, default=0)
+    antenatal_plans_modified_at = Column(DATETIME, default=datetime.now)
+    appointments_version = Column(Integer, default=0)
+    appointments_modified_at = Column(DATETIME, default=datetime.now)
     
     owner = relationship("Midwife", back_populates="mothers")
     health_records = relationship("HealthRecord", back_populates="mother")
@@ -55,8 +89,24 @@ class Mother(Base):
     anc_visits = relationship("ANCVisit", back_populates="mother")
     pnc_visits = relationship("PNCVisit", back_populates="mother")
 
+# --- Mother name search index (one row per word of Mother.full_name) ---
+class MotherSearchToken(Base):
+    __tablename__ = "mother_search_tokens"
+    __table_args__ = (
+        # Typeahead: WHERE midwife_id = ? AND token LIKE 'prefix%'
+        Index("ix_mother_search_tokens_midwife_token", "midwife_id", "token"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    mother_id = Column(Integer, ForeignKey("mothers.id"), nullable=False, index=True)
+    midwife_id = Column(Integer, ForeignKey("midwives.id"), nullable=False) # copied from Mother for the index
+    token = Column(String(64), nullable=False)
+
 class ANCVisit(Base):
     __tablename__ = "anc_visits"
+    __table_args__ = (
+        # get_mother_anc_visits: WHERE mother_id = ? ORDER BY visit_date
+        Index("ix_anc_visits_mother_date", "mother_id", "visit_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     mother_id = Column(Integer, ForeignKey("mothers.id"), nullable=False)
     appointment_id = Column(Integer, ForeignKey("appointments.id"), unique=True, nullable=False)
@@ -91,6 +141,10 @@ class ANCVisit(Base):
 
 class PNCVisit(Base):
     __tablename__ = "pnc_visits"
+    __table_args__ = (
+        # get_mother_pnc_visits: WHERE mother_id = ? ORDER BY visit_date
+        Index("ix_pnc_visits_mother_date", "mother_id", "visit_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     mother_id = Column(Integer, ForeignKey("mothers.id"), nullable=False)
     appointment_id = Column(Integer, ForeignKey("appointments.id"), unique=True, nullable=False)
@@ -123,6 +177,10 @@ class PNCVisit(Base):
 
 class HealthRecord(Base):
     __tablename__ = "health_records"
+    __table_args__ = (
+        # Keyset paging: WHERE mother_id = ? AND id > ? ORDER BY id
+        Index("ix_health_records_mother_id", "mother_id", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     visit_date = Column(DATETIME, nullable=False)
     weight_kg = Column(DECIMAL(5, 2))
@@ -133,6 +191,10 @@ class HealthRecord(Base):
 
 class PregnancyRecord(Base):
     __tablename__ = "pregnancy_records"
+    __table_args__ = (
+        # Latest record per mother: ORDER BY created_at DESC / ROW_NUMBER() OVER (PARTITION BY mother_id ...)
+        Index("ix_pregnancy_records_mother_created", "mother_id", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     mother_id = Column(Integer, ForeignKey("mothers.id"), nullable=False)
     created_at = Column(DATETIME)
@@ -319,9 +381,61 @@ class MOHOfficer(Base):
     moh_area = Column(String(100))
     email = Column(String(255))
 
+# --- Email Outbox (written with the business row, sent by mailer.py) ---
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Sender poll: WHERE status = 'Pending' AND next_attempt_at <= now ORDER BY id
+        Index("ix_email_outbox_status_next", "status", "next_attempt_at"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(TEXT) # Cleared once sent (credential mails contain a password)
+    status = Column(String(20), default="Pending", nullable=False) # Pending, Sent, Dead
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DATETIME, default=datetime.now, nullable=False)
+    last_error = Column(TEXT)
+    created_at = Column(DATETIME, default=datetime.now)
+    sent_at = Column(DATETIME)
+
+# --- Dashboard counters, one row per midwife (see crud.adjust_midwife_stats) ---
+class MidwifeStats(Base):
+    __tablename__ = "midwife_stats"
+    midwife_id = Column(Integer, ForeignKey("midwives.id"), primary_key=True)
+    assigned_mothers = Column(Integer, default=0, nullable=False)
+    high_risk_mothers = Column(Integer, default=0, nullable=False) # Active (Pregnant/Postnatal) and High
+    pending_leave = Column(Integer, default=0, nullable=False)
+    completed_today = Column(Integer, default=0, nullable=False) # Completed visits dated completed_today_date
+    completed_today_date = Column(Date)
+    missed_visits = Column(Integer, default=0, nullable=False) # Missed, dated in the last MISSED_WINDOW_DAYS
+    reconciled_at = Column(DATETIME)
+
+# --- Care plan templates: the visit schedule, one immutable row per version (see care_plans.py) ---
+class CarePlanTemplate(Base):
+    __tablename__ = "care_plan_templates"
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, unique=True, nullable=False)
+    name = Column(String(255), nullable=False)
+    definition = Column(TEXT, nullable=False) # JSON: anc_weeks_high, anc_weeks_low, pnc_days
+    is_active = Column(Boolean, default=False, nullable=False) # Exactly one; used for new pregnancies
+    created_by = Column(String(255)) # MOH username
+    created_at = Column(DATETIME, default=datetime.now)
+
 # --- NEW: Appointment Model ---
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Calendar ranges + today's count: WHERE midwife_id = ? AND date_time BETWEEN ...
+        Index("ix_appointments_midwife_date", "midwife_id", "date_time"),
+        # Care-plan regeneration: WHERE mother_id = ? AND status = 'Scheduled'
+        Index("ix_appointments_mother_status", "mother_id", "status"),
+        # Schedule diff: WHERE mother_id IN (...) AND schedule_key IS NOT NULL;
+        # unique, so a generated visit can't be booked twice
+        Index("ix_appointments_mother_schedule", "mother_id", "schedule_key", unique=True),
+        # Nightly sweep: WHERE status = 'Scheduled' AND date_time < today
+        Index("ix_appointments_status_date", "status", "date_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     midwife_id = Column(Integer, ForeignKey("midwives.id"), nullable=False)
@@ -329,17 +443,62 @@ class Appointment(Base):
     
     date_time = Column(DATETIME, nullable=False)
     visit_type = Column(String(50)) # e.g., "Home Visit", "Clinic"
-    status = Column(String(50), default="Scheduled") # Scheduled, Completed, Cancelled
+    status = Column(String(50), default="Scheduled") # Scheduled, Completed, Cancelled, Missed (set nightly)
     notes = Column(TEXT)
+    # Set on visits made by the schedule generator ("anc-2026-01-05-w12"),
+    # NULL on manually booked ones (crud.apply_schedules never touches those)
+    schedule_key = Column(String(40))
     
     midwife = relationship("Midwife", back_populates="appointments")
     mother = relationship("Mother", back_populates="appointments")
     anc_visit = relationship("ANCVisit", uselist=False, back_populates="appointment")
     pnc_visit = relationship("PNCVisit", uselist=False, back_populates="appointment")
 
+# --- Nightly maintenance (see maintenance.py) ---
+class JobLock(Base):
+    # One row per job; whoever holds an unexpired lease is the leader
+    __tablename__ = "job_locks"
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(255)) # "host:pid"
+    locked_until = Column(DATETIME)
+    last_run_on = Column(Date) # Day of the last complete run
+    last_finished_at = Column(DATETIME)
+
+class AppointmentDailyCount(Base):
+    # Visits per midwife per day by status, rolled up nightly
+    __tablename__ = "appointment_daily_counts"
+    day = Column(Date, primary_key=True)
+    midwife_id = Column(Integer, ForeignKey("midwives.id"), primary_key=True)
+    scheduled = Column(Integer, default=0, nullable=False)
+    completed = Column(Integer, default=0, nullable=False)
+    cancelled = Column(Integer, default=0, nullable=False)
+    missed = Column(Integer, default=0, nullable=False)
+
+class AppointmentReminder(Base):
+    # Tomorrow's visits, with what the midwife needs to phone the mother
+    __tablename__ = "appointment_reminders"
+    __table_args__ = (
+        # Reminder list: WHERE midwife_id = ? AND visit_date = ? ORDER BY date_time
+        Index("ix_appointment_reminders_midwife_date", "midwife_id", "visit_date", "date_time"),
+    )
+    appointment_id = Column(Integer, ForeignKey("appointments.id"), primary_key=True)
+    visit_date = Column(Date, nullable=False, index=True)
+    midwife_id = Column(Integer, ForeignKey("midwives.id"), nullable=False)
+    mother_id = Column(Integer, ForeignKey("mothers.id"), nullable=False)
+    date_time = Column(DATETIME, nullable=False)
+    visit_type = Column(String(50))
+    mother_name = Column(String(255))
+    contact_number = Column(String(20))
+
 # --- NEW: Leave Request Model ---
 class LeaveRequest(Base):
     __tablename__ = "leave_requests"
+    __table_args__ = (
+        # Overlap check: WHERE midwife_id = ? AND start_date <= ? AND end_date >= ?
+        Index("ix_leave_requests_midwife_dates", "midwife_id", "start_date", "end_date"),
+        # MOH queue: WHERE status = ? ORDER BY start_date, id
+        Index("ix_leave_requests_status_start", "status", "start_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     midwife_id = Column(Integer, ForeignKey("midwives.id"), nullable=False)
@@ -0,0 +1,100 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+
+# ---------------------------------------------------------
+# ------------------ KEYSET PAGINATION --------------------
+# ---------------------------------------------------------
+# List endpoints page with an opaque cursor instead of OFFSET, so page 1,000
+# costs the same as page 1 (an index seek past the last row seen):
+#
+#     GET /appointments/?limit=50                  -> first 50 rows
+#     GET /appointments/?limit=50&cursor=<token>   -> the next 50
+#
+# The token for the next page is returned in the X-Next-Cursor header (absent
+# on the last page). The body stays a plain JSON list, so existing clients
+# that send neither `limit` nor `cursor` see exactly what they got before.
+#
+# A cursor is the sort key of the last row (base64 JSON). Every paginated
+# query sorts on indexed columns ending in the primary key, so the order is
+# stable even when dates repeat.
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(Exception):
+    pass
+
+class Page(list):
+    # A list of rows plus the cursor for the following page (None = last page)
+    def __init__(self, items=(), next_cursor=None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _from_json(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(values):
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of keys")
+        return [_from_json(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise InvalidCursor()
+
+def _after(columns, values, descending=False):
+    # (a, b, c) > (x, y, z) spelled out for every backend, plus a redundant
+    # a >= x so the planner starts an index range there instead of scanning
+    # (< and <= when paging backwards through a descending sort)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        past = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, past))
+    if len(columns) == 1:
+        return clauses[0]
+    start = columns[0] <= values[0] if descending else columns[0] >= values[0]
+    return and_(start, or_(*clauses))
+
+def paginate(query, columns, cursor: str = None, limit: int = None, skip: int = 0, descending: bool = False):
+    # `columns` is the sort key (all ascending, or all descending) and must end
+    # with the primary key. limit=None keeps the old unbounded behaviour.
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    query = query.order_by(*[column.desc() for column in columns] if descending else columns)
+    if skip:
+        query = query.offset(skip)
+    if limit is None:
+        return Page(query.all())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return Page(rows)
+    last = rows[limit - 1]
+    return Page(rows[:limit], encode_cursor([getattr(last, column.key) for column in columns]))
+
+def set_next_cursor(response, page):
+    next_cursor = getattr(page, "next_cursor", None)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return page
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+from . import metrics
+
+# ---------------------------------------------------------
+# ----------------- PASSWORD HASHING POOL -----------------
+# ---------------------------------------------------------
+# bcrypt is deliberately slow (~250 ms at cost 12). Async endpoints must
+# never run it on the event loop, so hashing and verification go through a
+# dedicated, bounded thread pool (bcrypt releases the GIL while hashing, so
+# threads give real parallelism).
+#
+# BCRYPT_ROUNDS            cost factor for new hashes (default 12)
+# PASSWORD_HASH_WORKERS    pool threads (default: CPU count)
+# PASSWORD_HASH_MAX_PENDING  running + queued jobs before new ones are
+#                          refused with PasswordPoolBusy (-> 503)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+def make_context(rounds: int):
+    # min/max rounds = the configured cost, so needs_update() / verify_and_update()
+    # flag any stored hash made with a different cost for rehashing
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+pwd_context = make_context(BCRYPT_ROUNDS)
+
+class PasswordPoolBusy(Exception):
+    pass
+
+# --- Metrics ---
+queue_wait_ms = metrics.Histogram([1, 5, 10, 50, 100, 250, 500, 1000, 5000])
+hash_ms = metrics.Histogram([50, 100, 200, 300, 500, 1000, 2000])
+rejected = metrics.Counter()
+rehashed = metrics.Counter()
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_lock = threading.Lock()
+_pending = 0
+_max_pending_seen = 0
+
+def _truncate(password: str):
+    # bcrypt only uses the first 72 bytes
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    return password_bytes
+
+# --- Inline (blocking) versions: seed helpers, scripts, code already off the loop ---
+
+def hash_sync(password: str):
+    return pwd_context.hash(_truncate(password))
+
+def verify_sync(plain_password: str, hashed_password: str):
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
+
+def _verify_and_update_sync(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(_truncate(plain_password), hashed_password)
+
+# --- Pooled (awaitable) versions: use these from async endpoints ---
+
+def _submit(fn, *args):
+    global _pending, _max_pending_seen
+    with _lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            rejected.inc()
+            raise PasswordPoolBusy()
+        _pending += 1
+        _max_pending_seen = max(_max_pending_seen, _pending)
+    enqueued_at = time.perf_counter()
+
+    def job():
+        global _pending
+        started_at = time.perf_counter()
+        queue_wait_ms.observe((started_at - enqueued_at) * 1000)
+        try:
+            return fn(*args)
+        finally:
+            hash_ms.observe((time.perf_counter() - started_at) * 1000)
+            with _lock:
+                _pending -= 1
+
+    return asyncio.wrap_future(_executor.submit(job))
+
+async def hash_password(password: str):
+    return await _submit(hash_sync, password)
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await _submit(verify_sync, plain_password, hashed_password)
+
+async def verify_and_update(plain_password: str, hashed_password: str):
+    # Returns (valid, new_hash). new_hash is set when the stored hash was made
+    # with a different cost than BCRYPT_ROUNDS and should replace it.
+    valid, new_hash = await _submit(_verify_and_update_sync, plain_password, hashed_password)
+    if valid and new_hash:
+        rehashed.inc()
+    return valid, new_hash
+
+async def hash_many(plain_passwords, rounds: int = None):
+    # Bulk hashing (imports). At most 2 jobs per worker are queued at a time so
+    # logins arriving meanwhile still get through. `rounds` lets callers hash
+    # random one-time passwords cheaply; verify_and_update() upgrades them to
+    # BCRYPT_ROUNDS on first login.
+    context = make_context(rounds) if rounds else pwd_context
+    window = PASSWORD_HASH_WORKERS * 2
+    hashes = []
+    for start in range(0, len(plain_passwords), window):
+        jobs = [_submit(context.hash, _truncate(p)) for p in plain_passwords[start:start + window]]
+        hashes.extend(await asyncio.gather(*jobs))
+    return hashes
+
+def get_stats():
+    return {
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "pending": _pending,
+        "max_pending_seen": _max_pending_seen,
+        "rejected": rejected.snapshot(),
+        "rehashed": rehashed.snapshot(),
+        "queue_wait_ms": queue_wait_ms.snapshot(),
+        "hash_ms": hash_ms.snapshot(),
+    }
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect as sa_inspect
+
+from . import metrics
+
+# ---------------------------------------------------------
+# ------------- AUTHENTICATED PRINCIPAL CACHE -------------
+# ---------------------------------------------------------
+# get_current_midwife / get_current_mother / get_current_moh used to decode
+# the JWT and SELECT the user on every request. Both results are cached here:
+#
+# - verified_tokens: token -> subject, never kept past the token's own "exp"
+# - principals: (kind, subject) -> detached column snapshot of the user
+#
+# Each gunicorn worker has its own cache, so an invalidation only reaches the
+# worker that handled the change; PRINCIPAL_CACHE_TTL bounds how long the
+# other workers can serve the old row.
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "2048"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60")) # seconds
+
+class TTLCache:
+    # Bounded LRU where every entry also carries its own expiry time
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.Counter()
+        self.misses = metrics.Counter()
+        self.evictions = metrics.Counter()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._data[key]
+        self.misses.inc()
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        hits, misses = self.hits.snapshot(), self.misses.snapshot()
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "evictions": self.evictions.snapshot(),
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+
+
+verified_tokens = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+principals = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def snapshot(obj):
+    # Column values only, not attached to any session. Relationship lists on
+    # the copy are empty, so endpoints that return the user itself (/me)
+    # must re-read it with their own session.
+    mapper = sa_inspect(type(obj))
+    return type(obj)(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+def invalidate(kind: str, subject: str):
+    # kind: "midwife" / "mother" / "moh" (same keys as main.py uses)
+    principals.pop((kind, subject))
+
+def get_stats():
+    return {
+        "verified_tokens": verified_tokens.stats(),
+        "principals": principals.stats(),
+    }
@@ -0,0 +1,151 @@
+import hashlib
+import math
+import os
+import time
+
+from . import metrics
+from .principal_cache import TTLCache
+
+# ---------------------------------------------------------
+# ---------------- DAILY HOME-VISIT ROUTE -----------------
+# ---------------------------------------------------------
+# GET /appointments/home-visit-plan/{day} orders the midwife's Scheduled home
+# visits of that day into a short walking / bus route:
+#   1. distance matrix: great-circle km between every pair of homes (and the
+#      start point, if the app sends one), computed once per plan
+#   2. nearest neighbour: from the start point, or from every home in turn
+#      when there is none (the shortest of those paths is kept)
+#   3. 2-opt: reverse any stretch of the path that makes it shorter, until
+#      no reversal helps (at most ROUTE_MAX_PASSES passes)
+# The booked times are shown with each stop but not enforced. Mothers without
+# coordinates can't be placed; they are listed after the route, in time order.
+#
+# Plans are cached per (midwife, day). Each entry carries a fingerprint of
+# the visits it was built from (ids, times, coordinates) and of the start
+# point (rounded to ~100 m, so a phone's GPS jitter doesn't rebuild it), so a
+# plan whose visits changed is rebuilt, whichever worker made the change.
+# Appointment writes also drop the entry here straight away (invalidate()).
+
+ROUTE_PLAN_CACHE_SIZE = int(os.getenv("ROUTE_PLAN_CACHE_SIZE", "1024"))
+ROUTE_PLAN_CACHE_TTL = int(os.getenv("ROUTE_PLAN_CACHE_TTL", str(12 * 3600))) # seconds
+ROUTE_MAX_PASSES = 50
+ROUTE_MULTI_START_MAX = 60 # Above this many homes, NN starts from the earliest visit only
+EARTH_RADIUS_KM = 6371.0
+
+plans = TTLCache(ROUTE_PLAN_CACHE_SIZE, ROUTE_PLAN_CACHE_TTL)
+
+# --- Metrics ---
+builds = metrics.Counter()
+build_ms = metrics.Histogram([1, 5, 25, 100, 500])
+stops_per_plan = metrics.Histogram([5, 10, 20, 40, 80])
+
+def haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+def distance_matrix(points):
+    n = len(points)
+    dist = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            dist[i][j] = dist[j][i] = haversine_km(points[i], points[j])
+    return dist
+
+def path_km(dist, order):
+    return sum(dist[a][b] for a, b in zip(order, order[1:]))
+
+def nearest_neighbour(dist, start: int):
+    order, left = [start], set(range(len(dist))) - {start}
+    while left:
+        here = order[-1]
+        nearest = min(left, key=lambda node: (dist[here][node], node))
+        order.append(nearest)
+        left.remove(nearest)
+    return order
+
+def two_opt(dist, order, fixed_start: bool):
+    # Open path: reversing order[i..j] swaps edges (i-1, i) and (j, j+1); an
+    # end of the path has no edge to swap
+    n = len(order)
+    for _ in range(ROUTE_MAX_PASSES):
+        improved = False
+        for i in range(1 if fixed_start else 0, n - 1):
+            for j in range(i + 1, n):
+                a, b, c = order[i - 1] if i > 0 else None, order[i], order[j]
+                d = order[j + 1] if j + 1 < n else None
+                before = (dist[a][b] if a is not None else 0) + (dist[c][d] if d is not None else 0)
+                after = (dist[a][c] if a is not None else 0) + (dist[b][d] if d is not None else 0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+def solve(points, start=None):
+    # Visiting order of `points` [(lat, lon)], as indexes into it
+    if len(points) <= 1:
+        return list(range(len(points)))
+    if start is not None:
+        dist = distance_matrix([start] + list(points))
+        order = two_opt(dist, nearest_neighbour(dist, 0), fixed_start=True)
+        return [node - 1 for node in order[1:]]
+    dist = distance_matrix(points)
+    starts = range(len(points)) if len(points) <= ROUTE_MULTI_START_MAX else [0]
+    order = min((nearest_neighbour(dist, s) for s in starts), key=lambda o: path_km(dist, o))
+    return two_opt(dist, order, fixed_start=False)
+
+def fingerprint(visits, start=None):
+    key = repr([(v["appointment_id"], v["date_time"].isoformat(), v["latitude"], v["longitude"]) for v in visits])
+    if start is not None:
+        key += repr((round(start[0], 3), round(start[1], 3)))
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+def build_plan(day, visits, start=None):
+    # visits: dicts with appointment_id, date_time, latitude, longitude, ...
+    # (in booked-time order). Returns the plan served by the endpoint.
+    located = [v for v in visits if v["latitude"] is not None and v["longitude"] is not None]
+    unlocated = [v for v in visits if v["latitude"] is None or v["longitude"] is None]
+    points = [(float(v["latitude"]), float(v["longitude"])) for v in located]
+    order = solve(points, start)
+    stops, total, previous = [], 0.0, start
+    for position, index in enumerate(order, 1):
+        leg = haversine_km(previous, points[index]) if previous is not None else 0.0
+        total += leg
+        previous = points[index]
+        stops.append({**located[index], "order": position, "leg_km": round(leg, 2)})
+    return {
+        "day": day,
+        "start_latitude": start[0] if start else None,
+        "start_longitude": start[1] if start else None,
+        "total_km": round(total, 2),
+        "stops": stops,
+        "unlocated": unlocated,
+    }
+
+def get_plan(midwife_id: int, day, visits, start=None):
+    # Returns (plan, fingerprint); rebuilt only when the visits changed
+    signature = fingerprint(visits, start)
+    cached = plans.get((midwife_id, day))
+    if cached is not None and cached[0] == signature:
+        return cached[1], signature
+    started_at = time.perf_counter()
+    plan = build_plan(day, visits, start)
+    build_ms.observe((time.perf_counter() - started_at) * 1000)
+    builds.inc()
+    stops_per_plan.observe(len(plan["stops"]))
+    plans.set((midwife_id, day), (signature, plan))
+    return plan, signature
+
+def invalidate(midwife_id: int, *days):
+    for day in days:
+        plans.pop((midwife_id, day))
+
+def get_stats():
+    return {
+        "cache": plans.stats(),
+        "builds": builds.snapshot(),
+        "build_ms": build_ms.snapshot(),
+        "stops": stops_per_plan.snapshot(),
+    }
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, Json
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Annotated, Dict, List, Literal, Optional
 
 # --- HealthRecord Schemas ---
 class HealthRecordBase(BaseModel):
@@ -193,10 +193,15 @@ class AntenatalPlan(AntenatalPlanBase):
         from_attributes = True
 
 # --- Mother Schemas ---
+Latitude = Annotated[float, Field(ge=-90, le=90)]
+Longitude = Annotated[float, Field(ge=-180, le=180)]
+
 class MotherBase(BaseModel):
     full_name: str
     nic: Optional[str] = None
     address: Optional[str] = None
+    latitude: Optional[Latitude] = None # Home location, for the home-visit route
+    longitude: Optional[Longitude] = None
     contact_number: Optional[str] = None
     # New Fields
     status: Optional[str] = "Eligible"
@@ -221,6 +226,8 @@ class MotherCreate(MotherBase):
 class MotherUpdate(BaseModel):
     full_name: Optional[str] = None
     address: Optional[str] = None
+    latitude: Optional[Latitude] = None
+    longitude: Optional[Longitude] = None
     contact_number: Optional[str] = None
     status: Optional[str] = None
     risk_level: Optional[str] = None
@@ -242,6 +249,64 @@ class Mother(MotherBase):
 
 
 
+    class Config:
+        from_attributes = True
+
+# Lightweight row for typeahead search results
+class MotherSearchResult(BaseModel):
+    id: int
+    full_name: str
+    nic: Optional[str] = None
+    contact_number: Optional[str] = None
+    status: Optional[str] = None
+    risk_level: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Bulk registration (POST /mothers/bulk)
+class MotherBulkCreate(BaseModel):
+    mothers: List[MotherCreate]
+
+class MotherBulkSkipped(BaseModel):
+    index: int # Position in the request list
+    nic: str
+    reason: str
+
+class MotherBulkResult(BaseModel):
+    created: List[MotherSearchResult]
+    skipped: List[MotherBulkSkipped]
+
+# Bulk transfer to another midwife (POST /mothers/transfer)
+class MotherTransfer(BaseModel):
+    mother_ids: List[int]
+    from_midwife_id: int
+    to_midwife_id: int
+
+# --- Care plan templates (visit schedule versions, see care_plans.py) ---
+ANCWeek = Annotated[int, Field(ge=4, le=42)]
+PNCDay = Annotated[int, Field(ge=1, le=60)]
+
+class CarePlanDefinition(BaseModel):
+    anc_weeks_high: List[ANCWeek] = Field(min_length=1)
+    anc_weeks_low: List[ANCWeek] = Field(min_length=1)
+    pnc_days: List[PNCDay] = Field(min_length=1)
+
+class CarePlanTemplateCreate(BaseModel):
+    name: str
+    definition: CarePlanDefinition
+    activate: bool = True # Use it for new pregnancies straight away
+
+class CarePlanTemplate(BaseModel):
+    id: int
+    version: int
+    name: str
+    definition: Json[CarePlanDefinition] # Stored as JSON text
+    is_active: bool
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    active_mothers: int = 0 # Pregnant / Postnatal mothers of the officer's area on this version
+
     class Config:
         from_attributes = True
 
@@ -259,6 +324,75 @@ class AppointmentUpdate(BaseModel):
     notes: Optional[str] = None
     date_time: Optional[datetime] = None
 
+# Calendar (GET /appointments/calendar, /appointments/calendar/{day})
+class CalendarDay(BaseModel):
+    day: date
+    total: int
+    by_type: Dict[str, int] # visit_type -> count
+
+class CalendarMonth(BaseModel):
+    year: int
+    month: int
+    total: int
+    days: List[CalendarDay] # Only days with visits
+
+class CalendarVisit(BaseModel):
+    id: int
+    midwife_id: int
+    mother_id: int
+    date_time: datetime
+    visit_type: Optional[str] = None
+    status: str
+    notes: Optional[str] = None
+    mother_name: Optional[str] = None
+    mother_address: Optional[str] = None
+    mother_contact_number: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Route-ordered home visits of one day (GET /appointments/home-visit-plan/{day})
+class HomeVisitStop(BaseModel):
+    appointment_id: int
+    mother_id: int
+    mother_name: Optional[str] = None
+    address: Optional[str] = None
+    contact_number: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    date_time: datetime # As booked; the route doesn't enforce it
+    notes: Optional[str] = None
+    order: Optional[int] = None # 1-based position in the route
+    leg_km: Optional[float] = None # Straight-line km from the previous stop (or the start point)
+
+class HomeVisitPlan(BaseModel):
+    day: date
+    start_latitude: Optional[float] = None
+    start_longitude: Optional[float] = None
+    total_km: float
+    stops: List[HomeVisitStop]
+    unlocated: List[HomeVisitStop] # No coordinates for the mother; in booked-time order
+
+# Tomorrow's visits to remind mothers of (GET /appointments/reminders)
+class AppointmentReminder(BaseModel):
+    appointment_id: int
+    mother_id: int
+    mother_name: Optional[str] = None
+    contact_number: Optional[str] = None
+    date_time: datetime
+    visit_type: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Nightly roll-up, area totals for one day (GET /appointments/daily-counts)
+class AppointmentDailyCount(BaseModel):
+    day: date
+    scheduled: int
+    completed: int
+    cancelled: int
+    missed: int
+
 class Appointment(AppointmentBase):
     id: int
     midwife_id: int
@@ -280,10 +414,16 @@ class LeaveRequestBase(BaseModel):
 class LeaveRequestCreate(LeaveRequestBase):
     pass
 
+LeaveStatus = Literal["Pending", "Approved", "Rejected"]
+
 class LeaveRequestUpdate(BaseModel):
-    status: str
+    status: LeaveStatus
     moh_comment: Optional[str] = None
 
+# Approve / reject many requests at once (all or nothing)
+class LeaveRequestBulkUpdate(LeaveRequestUpdate):
+    ids: List[int]
+
 class LeaveRequest(LeaveRequestBase):
     id: int
     midwife_id: int
@@ -293,6 +433,11 @@ class LeaveRequest(LeaveRequestBase):
     class Config:
         from_attributes = True
 
+# MOH queue row: the request plus the midwife's name and area (joined in SQL)
+class LeaveRequestQueueItem(LeaveRequest):
+    midwife_name: Optional[str] = None
+    moh_area: Optional[str] = None
+
 # ------------------------------
 # MOH & MIDWIFE MANAGEMENT SCHEMAS
 # ------------------------------
@@ -328,6 +473,21 @@ class MidwifeRegistration(BaseModel):
     user_must_change_password: bool = True
     is_active: bool = True
 
+# Bulk import report (POST /midwives/import)
+class MidwifeImportRow(BaseModel):
+    row: int # Line in the file (header = 1)
+    status: str # created, valid (dry run), invalid, duplicate, conflict, failed
+    username: Optional[str] = None
+    errors: List[str] = []
+    password: Optional[str] = None # Only for created rows without an email address
+
+class MidwifeImportReport(BaseModel):
+    total: int
+    created: int # Rows that were (or, in a dry run, would be) created
+    failed: int
+    dry_run: bool
+    rows: List[MidwifeImportRow]
+
 # 3. Legacy Midwife Create (Mobile/Old) - Restored to prevent crash
 class MidwifeCreate(BaseModel):
     username: str
@@ -354,6 +514,27 @@ class Midwife(MidwifeBase):
     class Config:
         from_attributes = True
 
+class MidwifeStatusUpdate(BaseModel):
+    is_active: bool
+
+# Lightweight row for the MOH directory (no nested mothers)
+class MidwifeDirectoryEntry(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    nic: Optional[str] = None
+    phone_number: Optional[str] = None
+    email: Optional[str] = None
+    service_grade: Optional[str] = None
+    assigned_moh_area: Optional[str] = None
+    is_active: Optional[bool] = True
+    class Config:
+        from_attributes = True
+
+class MidwifeDirectorySummary(BaseModel):
+    total: int
+    active: int
+
 # --- Token Schemas ---
 class Token(BaseModel):
     access_token: str
@@ -436,4 +617,23 @@ class PNCVisit(PNCVisitBase):
     mother_id: int
     appointment_id: int
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# --- Mother Health File (GET /mothers/{id}/health-file) ---
+# Everything the health-file / care screens show, in one response. Sections
+# that were not requested are null.
+class MotherProfile(MotherBase):
+    id: int
+    midwife_id: int
+    class Config:
+        from_attributes = True
+
+class MotherHealthFile(BaseModel):
+    mother: MotherProfile
+    pregnancy: Optional[PregnancyStart] = None # Same shape as GET /mothers/{id}/pregnancy
+    pregnancy_records: Optional[List[PregnancyRecord]] = None
+    delivery_records: Optional[List[DeliveryRecord]] = None
+    antenatal_plans: Optional[List[AntenatalPlan]] = None
+    health_records: Optional[List[HealthRecord]] = None
+    anc_visits: Optional[List[ANCVisit]] = None
+    pnc_visits: Optional[List[PNCVisit]] = None
+    appointments: Optional[List[Appointment]] = None
@@ -0,0 +1,98 @@
+import socketserver
+import sys
+import threading
+
+# ---------------------------------------------------------
+# ----------------- LOCAL SMTP STAND-IN -------------------
+# ---------------------------------------------------------
+# A tiny SMTP server that accepts every message and keeps it in memory, so
+# the outbox sender (mailer.py) can be exercised without a real mail account:
+#
+#     python -m sql_app.smtp_stub            # 127.0.0.1:1025, prints each mail
+#     SMTP_SERVER=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 SENDER_PASSWORD= uvicorn sql_app.main:app
+#
+# In scripts: stub = SmtpStub(port=0).start(); ... stub.messages; stub.stop()
+# stub.fail_next = N makes the next N messages get a temporary 451 error.
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        stub = self.server.stub
+        stub.connections += 1
+        self.reply("220 smtp-stub ESMTP")
+        envelope = {"from": None, "to": []}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 smtp-stub")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip("<> "), "to": []}
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command[8:].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in iter(self.rfile.readline, b""):
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw[1:] if raw.startswith(b"..") else raw)
+                if stub.fail_next > 0:
+                    stub.fail_next -= 1
+                    self.reply("451 Temporary failure (stub)")
+                    continue
+                stub.record(envelope, b"".join(data).decode(errors="replace"))
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SmtpStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, echo: bool = False):
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self.host, self.port = self._server.server_address
+
+    def record(self, envelope, data: str):
+        with self._lock:
+            self.messages.append({"from": envelope["from"], "to": list(envelope["to"]), "data": data})
+        if self.echo:
+            subject = next((l[9:] for l in data.splitlines() if l.startswith("Subject: ")), "")
+            print(f"[smtp-stub] {envelope['from']} -> {', '.join(envelope['to'])}: {subject}")
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="smtp-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    stub = SmtpStub(port=port, echo=True)
+    print(f"SMTP stub listening on {stub.host}:{stub.port} (Ctrl+C to stop)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
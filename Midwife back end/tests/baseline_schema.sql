@@ -0,0 +1,277 @@
+-- Schema as create_all() left it before versioned migrations (SQLite dialect).
+-- tests/test_migrations.py upgrades a database built from this to head.
+CREATE TABLE midwives (
+	id INTEGER NOT NULL, 
+	username VARCHAR(255) NOT NULL, 
+	hashed_password VARCHAR(255) NOT NULL, 
+	full_name VARCHAR(255), 
+	nic VARCHAR(20), 
+	date_of_birth DATE, 
+	phone_number VARCHAR(20), 
+	email VARCHAR(255), 
+	residential_address TEXT, 
+	slmc_reg_no VARCHAR(50), 
+	service_grade VARCHAR(50), 
+	assigned_moh_area VARCHAR(100), 
+	is_active BOOLEAN, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_midwives_id ON midwives (id);
+CREATE UNIQUE INDEX ix_midwives_username ON midwives (username);
+CREATE TABLE moh_officers (
+	id INTEGER NOT NULL, 
+	username VARCHAR(255) NOT NULL, 
+	hashed_password VARCHAR(255) NOT NULL, 
+	full_name VARCHAR(255), 
+	moh_area VARCHAR(100), 
+	email VARCHAR(255), 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_moh_officers_id ON moh_officers (id);
+CREATE UNIQUE INDEX ix_moh_officers_username ON moh_officers (username);
+CREATE TABLE leave_requests (
+	id INTEGER NOT NULL, 
+	midwife_id INTEGER NOT NULL, 
+	start_date DATE NOT NULL, 
+	end_date DATE NOT NULL, 
+	reason TEXT, 
+	status VARCHAR(50), 
+	moh_comment TEXT, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(midwife_id) REFERENCES midwives (id)
+);
+CREATE INDEX ix_leave_requests_id ON leave_requests (id);
+CREATE TABLE mothers (
+	id INTEGER NOT NULL, 
+	full_name VARCHAR(255) NOT NULL, 
+	nic VARCHAR(20), 
+	address TEXT, 
+	contact_number VARCHAR(20), 
+	hashed_password VARCHAR(255) NOT NULL, 
+	midwife_id INTEGER NOT NULL, 
+	status VARCHAR(50), 
+	risk_level VARCHAR(50), 
+	pregnancy_start_date DATE, 
+	delivery_date DATE, 
+	PRIMARY KEY (id), 
+	UNIQUE (nic), 
+	FOREIGN KEY(midwife_id) REFERENCES midwives (id)
+);
+CREATE INDEX ix_mothers_id ON mothers (id);
+CREATE TABLE antenatal_plans (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	next_clinic_date DATETIME, 
+	class_1st_date DATETIME, 
+	class_1st_husband BOOLEAN, 
+	class_1st_wife BOOLEAN, 
+	class_1st_other VARCHAR(100), 
+	class_2nd_date DATETIME, 
+	class_2nd_husband BOOLEAN, 
+	class_2nd_wife BOOLEAN, 
+	class_2nd_other VARCHAR(100), 
+	class_3rd_date DATETIME, 
+	class_3rd_husband BOOLEAN, 
+	class_3rd_wife BOOLEAN, 
+	class_3rd_other VARCHAR(100), 
+	book_antenatal_issued DATETIME, 
+	book_antenatal_returned DATETIME, 
+	book_breastfeeding_issued DATETIME, 
+	book_breastfeeding_returned DATETIME, 
+	book_eccd_issued DATETIME, 
+	book_eccd_returned DATETIME, 
+	leaflet_fp_issued DATETIME, 
+	leaflet_fp_returned DATETIME, 
+	emergency_contact_name VARCHAR(255), 
+	emergency_contact_address TEXT, 
+	emergency_contact_phone VARCHAR(20), 
+	moh_office_phone VARCHAR(20), 
+	phm_phone VARCHAR(20), 
+	grama_niladari_div VARCHAR(255), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_antenatal_plans_id ON antenatal_plans (id);
+CREATE TABLE appointments (
+	id INTEGER NOT NULL, 
+	midwife_id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	date_time DATETIME NOT NULL, 
+	visit_type VARCHAR(50), 
+	status VARCHAR(50), 
+	notes TEXT, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(midwife_id) REFERENCES midwives (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_appointments_id ON appointments (id);
+CREATE TABLE delivery_records (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	delivery_date DATETIME, 
+	delivery_mode VARCHAR(50), 
+	episiotomy BOOLEAN, 
+	temp_normal BOOLEAN, 
+	vaginal_exam_done BOOLEAN, 
+	maternal_complications TEXT, 
+	wound_infection BOOLEAN, 
+	family_planning_discussed BOOLEAN, 
+	danger_signals_explained BOOLEAN, 
+	breast_feeding_established BOOLEAN, 
+	birth_weight DECIMAL(5, 2), 
+	poa_at_birth INTEGER, 
+	apgar_score INTEGER, 
+	abnormalities TEXT, 
+	vitamin_a_given BOOLEAN, 
+	rubella_given BOOLEAN, 
+	anti_d_given BOOLEAN, 
+	diagnosis_card_given BOOLEAN, 
+	chdr_completed BOOLEAN, 
+	prescription_given BOOLEAN, 
+	referred_to_phm BOOLEAN, 
+	special_notes TEXT, 
+	discharge_date DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_delivery_records_id ON delivery_records (id);
+CREATE TABLE health_records (
+	id INTEGER NOT NULL, 
+	visit_date DATETIME NOT NULL, 
+	weight_kg DECIMAL(5, 2), 
+	blood_pressure VARCHAR(20), 
+	notes TEXT, 
+	mother_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_health_records_id ON health_records (id);
+CREATE TABLE past_pregnancies (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	pregnancy_order VARCHAR(10), 
+	outcome VARCHAR(50), 
+	delivery_mode VARCHAR(50), 
+	place_of_delivery VARCHAR(100), 
+	complications TEXT, 
+	birth_weight DECIMAL(5, 2), 
+	sex VARCHAR(10), 
+	age_if_alive VARCHAR(50), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_past_pregnancies_id ON past_pregnancies (id);
+CREATE TABLE pregnancy_records (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	registration_no VARCHAR(50), 
+	registration_date DATE, 
+	registration_place VARCHAR(100), 
+	family_register_no VARCHAR(50), 
+	village_division VARCHAR(100), 
+	moh_division VARCHAR(100), 
+	phi_area VARCHAR(100), 
+	mother_age INTEGER, 
+	mother_education VARCHAR(100), 
+	mother_occupation VARCHAR(100), 
+	distance_to_clinic DECIMAL(5, 2), 
+	husband_name VARCHAR(255), 
+	husband_age INTEGER, 
+	husband_education VARCHAR(100), 
+	husband_occupation VARCHAR(100), 
+	married_age INTEGER, 
+	consanguinity BOOLEAN, 
+	bmi DECIMAL(5, 2), 
+	height_cm DECIMAL(5, 2), 
+	weight_kg DECIMAL(5, 2), 
+	blood_group VARCHAR(10), 
+	rubella_immunization BOOLEAN, 
+	pre_pregnancy_screening BOOLEAN, 
+	folic_acid BOOLEAN, 
+	history_of_subfertility BOOLEAN, 
+	family_diabetes BOOLEAN, 
+	family_hypertension BOOLEAN, 
+	family_twins BOOLEAN, 
+	other_family_history TEXT, 
+	gravidity INTEGER, 
+	parity INTEGER, 
+	num_living_children INTEGER, 
+	age_of_youngest_child VARCHAR(50), 
+	lrmp DATE, 
+	edd DATE, 
+	us_corrected_edd DATE, 
+	poa_at_registration VARCHAR(50), 
+	risk_age_lt_20_gt_35 BOOLEAN, 
+	risk_5th_pregnancy BOOLEAN, 
+	risk_birth_interval_lt_1yr BOOLEAN, 
+	risk_history_pph BOOLEAN, 
+	risk_diabetes BOOLEAN, 
+	risk_malaria BOOLEAN, 
+	risk_cardiac BOOLEAN, 
+	risk_renal BOOLEAN, 
+	other_risk_factors TEXT, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id)
+);
+CREATE INDEX ix_pregnancy_records_id ON pregnancy_records (id);
+CREATE TABLE anc_visits (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	appointment_id INTEGER NOT NULL, 
+	visit_date DATE NOT NULL, 
+	poa_weeks VARCHAR(20), 
+	weight_kg DECIMAL(5, 2), 
+	bp_systolic INTEGER, 
+	bp_diastolic INTEGER, 
+	pallor VARCHAR(50), 
+	oedema VARCHAR(50), 
+	fundal_height_cm DECIMAL(5, 2), 
+	fetal_lie VARCHAR(50), 
+	fetal_heart_sound VARCHAR(50), 
+	fetal_movement VARCHAR(50), 
+	urine_sugar VARCHAR(50), 
+	urine_albumin VARCHAR(50), 
+	nutrient_supplements BOOLEAN, 
+	counsel_nutrition BOOLEAN, 
+	counsel_danger_signs BOOLEAN, 
+	counsel_family_planning BOOLEAN, 
+	counsel_breastfeeding BOOLEAN, 
+	counsel_delivery_plan BOOLEAN, 
+	counsel_emergency_prep BOOLEAN, 
+	counsel_postnatal_care BOOLEAN, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id), 
+	UNIQUE (appointment_id), 
+	FOREIGN KEY(appointment_id) REFERENCES appointments (id)
+);
+CREATE INDEX ix_anc_visits_id ON anc_visits (id);
+CREATE TABLE pnc_visits (
+	id INTEGER NOT NULL, 
+	mother_id INTEGER NOT NULL, 
+	appointment_id INTEGER NOT NULL, 
+	visit_date DATE NOT NULL, 
+	temperature DECIMAL(4, 1), 
+	pallor VARCHAR(50), 
+	breast_condition VARCHAR(50), 
+	uterus_involution VARCHAR(50), 
+	lochia_character VARCHAR(50), 
+	lochia_smell VARCHAR(50), 
+	perineum_infection BOOLEAN, 
+	fissure_infection BOOLEAN, 
+	vitamin_a_given BOOLEAN, 
+	family_planning_method VARCHAR(50), 
+	referred_to_hospital BOOLEAN, 
+	baby_color VARCHAR(50), 
+	cord_status VARCHAR(50), 
+	breastfeeding VARCHAR(50), 
+	baby_stool VARCHAR(50), 
+	baby_weight DECIMAL(5, 2), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(mother_id) REFERENCES mothers (id), 
+	UNIQUE (appointment_id), 
+	FOREIGN KEY(appointment_id) REFERENCES appointments (id)
+);
+CREATE INDEX ix_pnc_visits_id ON pnc_visits (id);
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# sql_app builds its engine from DATABASE_URL at import time
+_db_dir = tempfile.mkdtemp(prefix="midwife-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'app.db')}"
+os.environ.setdefault("MAINTENANCE_AT", "")
+os.environ.setdefault("STATS_RECONCILE_SECONDS", "0")
+os.environ["DASHBOARD_PEER_DIR"] = os.path.join(_db_dir, "peers")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # "Midwife back end"
+
+from sql_app import migrations  # noqa: E402
+from sql_app.database import SessionLocal  # noqa: E402
+
+@pytest.fixture
+def db_dir():
+    return _db_dir
+
+@pytest.fixture
+def db():
+    # Fresh schema at head for every test; per-process caches keyed by row id go with it
+    from sql_app import care_plans, route_plans
+    migrations.reset()
+    care_plans._compiled.clear()
+    care_plans.invalidate_active()
+    route_plans.plans.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def make_midwife(db):
+    from sql_app import crud, schemas
+    def make(username, moh_area="Area A"):
+        midwife = crud.create_midwife(db, schemas.MidwifeCreate(username=username, password="x"), hashed_password="x")
+        midwife.assigned_moh_area = moh_area
+        db.commit()
+        return midwife
+    return make
+
+@pytest.fixture
+def make_mother(db):
+    from sql_app import crud, schemas
+    def make(midwife_id, nic, full_name=None):
+        mother = schemas.MotherCreate(full_name=full_name or f"Mother {nic}", nic=nic, password="x")
+        return crud.create_mother(db, mother, midwife_id, hashed_password="x")
+    return make
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.chdir(BACKEND_DIR) # static/ is mounted relative to it, as on deploy
+    from fastapi.testclient import TestClient
+    from sql_app import principal_cache
+    from sql_app.main import app
+    # Cached logins would outlive the per-test database
+    principal_cache.principals.clear()
+    principal_cache.verified_tokens.clear()
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def moh_headers(db):
+    from sql_app import models
+    from sql_app.main import create_access_token
+    def make(username, moh_area):
+        db.add(models.MOHOfficer(username=username, hashed_password="x", full_name=username, moh_area=moh_area))
+        db.commit()
+        return {"Authorization": "Bearer " + create_access_token(data={"sub": username})}
+    return make
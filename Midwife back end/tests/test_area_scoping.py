@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from sql_app import crud, schemas
+
+def _leave(db, midwife_id):
+    return crud.create_leave_request(db, schemas.LeaveRequestCreate(
+        start_date=date.today() + timedelta(days=3), end_date=date.today() + timedelta(days=4), reason="x"), midwife_id)
+
+def test_leave_queue_stays_in_officers_area(db, client, make_midwife, moh_headers):
+    own, other = make_midwife("mw-a", "Area A"), make_midwife("mw-b", "Area B")
+    _leave(db, own.id)
+    _leave(db, other.id)
+    headers = moh_headers("moh-a", "Area A")
+
+    queue = client.get("/leave-requests/queue", headers=headers).json()
+    assert [item["midwife_id"] for item in queue] == [own.id]
+    # Naming another area doesn't widen the query
+    queue = client.get("/leave-requests/queue", params={"moh_area": "Area B"}, headers=headers).json()
+    assert [item["midwife_id"] for item in queue] == [own.id]
+
+def test_midwife_list_stays_in_officers_area(db, client, make_midwife, moh_headers):
+    own = [make_midwife(f"mw-a{i}", "Area A") for i in range(3)]
+    make_midwife("mw-b", "Area B")
+    headers = moh_headers("moh-a", "Area A")
+    midwives = client.get("/midwives/", headers=headers).json()
+    assert sorted(m["id"] for m in midwives) == sorted(m.id for m in own)
+
+def test_leave_decisions_stay_in_officers_area(db, client, make_midwife, moh_headers):
+    own, other = make_midwife("mw-a", "Area A"), make_midwife("mw-b", "Area B")
+    own_leave, other_leave = _leave(db, own.id), _leave(db, other.id)
+    headers = moh_headers("moh-a", "Area A")
+
+    response = client.put(f"/leave-requests/{other_leave.id}", json={"status": "Approved"}, headers=headers)
+    assert response.status_code == 404
+    db.expire_all()
+    assert crud.get_leave_request(db, other_leave.id).status == "Pending"
+    response = client.put(f"/leave-requests/{own_leave.id}", json={"status": "Approved"}, headers=headers)
+    assert response.status_code == 200 and response.json()["status"] == "Approved"
+
+    listed = client.get("/leave-requests/", headers=headers).json()
+    assert [item["id"] for item in listed] == [own_leave.id]
+
+def test_suspension_stays_in_officers_area_and_blocks_login(db, client, make_midwife, moh_headers):
+    own, other = make_midwife("mw-a", "Area A"), make_midwife("mw-b", "Area B")
+    own.hashed_password = crud.get_password_hash("pw")
+    db.commit()
+    headers = moh_headers("moh-a", "Area A")
+
+    response = client.put(f"/midwives/{other.id}/status", json={"is_active": False}, headers=headers)
+    assert response.status_code == 404
+    db.expire_all()
+    assert crud.get_midwife(db, other.id).is_active is not False
+
+    assert client.post("/token", data={"username": "mw-a", "password": "pw"}).status_code == 200
+    response = client.put(f"/midwives/{own.id}/status", json={"is_active": False}, headers=headers)
+    assert response.status_code == 200 and response.json()["is_active"] is False
+    response = client.post("/token", data={"username": "mw-a", "password": "pw"})
+    assert response.status_code == 401 and response.json()["detail"] == "Could not validate credentials"
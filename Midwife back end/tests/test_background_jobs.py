@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from sql_app import maintenance, midwife_stats, models
+
+def test_recount_runs_once_per_interval_across_workers(db, make_midwife, monkeypatch):
+    monkeypatch.setattr(midwife_stats, "STATS_RECONCILE_SECONDS", 3600)
+    make_midwife("mw-a")
+    assert midwife_stats.reconcile_if_due() is not None
+    # Any worker checking again within the interval skips it
+    monkeypatch.setattr(maintenance, "HOLDER", "other-host:1")
+    assert midwife_stats.reconcile_if_due() is None
+
+    # Once the interval has passed, the next worker to check runs it
+    db.query(models.JobLock).filter(models.JobLock.name == midwife_stats.JOB_NAME).update(
+        {models.JobLock.last_finished_at: datetime.now() - timedelta(seconds=midwife_stats.STATS_RECONCILE_SECONDS + 1)})
+    db.commit()
+    assert midwife_stats.reconcile_if_due() is not None
+
+def test_recount_skipped_while_another_worker_holds_the_lease(db, make_midwife):
+    make_midwife("mw-a")
+    db.add(models.JobLock(name=midwife_stats.JOB_NAME, holder="other-host:1",
+                          locked_until=datetime.now() + timedelta(minutes=5)))
+    db.commit()
+    busy = midwife_stats.lock_busy.snapshot()
+    assert midwife_stats.reconcile_if_due() is None
+    assert midwife_stats.lock_busy.snapshot() == busy + 1
+    assert db.query(models.MidwifeStats).count() == 0 # Nothing recounted
+
+def test_lost_lease_is_logged(db, make_midwife, monkeypatch, caplog):
+    make_midwife("mw-a")
+    def lose_lease(db, name=maintenance.JOB_NAME):
+        raise maintenance.LeaseLost(f"{name}: lease taken over by another worker")
+    monkeypatch.setattr(maintenance, "renew", lose_lease)
+    try:
+        maintenance.run_once(force=True)
+    except maintenance.LeaseLost:
+        pass
+    assert any(r.levelname == "WARNING" and "lease taken over" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta
+
+from sql_app import crud, models, schemas
+
+def midnight(day):
+    return datetime.combine(day, datetime.min.time())
+
+def visits(db, mother_id):
+    db.expire_all()
+    rows = db.query(models.Appointment).filter(models.Appointment.mother_id == mother_id)\
+             .order_by(models.Appointment.date_time, models.Appointment.id).all()
+    return {row.id: (row.schedule_key, row.date_time, row.status) for row in rows}
+
+def start_pregnancy(db, mother_id, lmp, risk_level):
+    return crud.start_pregnancy(db, mother_id, schemas.PregnancyRecordCreate(lrmp=lmp), [], risk_level)
+
+def new_version(db, anc_weeks_high, anc_weeks_low=(12, 26, 36), pnc_days=(3, 7, 14, 42)):
+    definition = schemas.CarePlanDefinition(anc_weeks_high=list(anc_weeks_high), anc_weeks_low=list(anc_weeks_low),
+                                            pnc_days=list(pnc_days))
+    return crud.create_care_plan_template(db, schemas.CarePlanTemplateCreate(name="test", definition=definition),
+                                          created_by="test")
+
+def test_pregnancy_books_only_future_visits_and_replanning_is_a_no_op(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    lmp = date.today() - timedelta(weeks=20)
+    start_pregnancy(db, mother.id, lmp, "Low")
+    booked = visits(db, mother.id)
+    # Standard schedule (Low): weeks 12, 26, 36; week 12 is already past
+    assert sorted(key for key, _, _ in booked.values()) == [f"anc-{lmp}-w26", f"anc-{lmp}-w36"]
+    assert all(status == "Scheduled" for _, _, status in booked.values())
+
+    assert crud.replan_schedules(db) == {"mothers": 1, "changed": 0, "inserted": 0, "deleted": 0}
+    # Same visit again (e.g. a retried request) changes nothing either
+    start_pregnancy(db, mother.id, lmp, "Low")
+    assert visits(db, mother.id) == booked
+
+def test_new_version_moves_only_future_scheduled_visits(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    lmp = date.today() - timedelta(weeks=20)
+    start_pregnancy(db, mother.id, lmp, "High") # Weeks 24, 28, 32, 36, 40 still ahead
+    by_key = {key: appointment_id for appointment_id, (key, _, _) in visits(db, mother.id).items()}
+    assert sorted(by_key) == sorted(f"anc-{lmp}-w{week}" for week in (24, 28, 32, 36, 40))
+
+    # A visit already done, one overdue (generated, still Scheduled) and a manual booking
+    crud.update_appointment(db, by_key[f"anc-{lmp}-w24"], schemas.AppointmentUpdate(status="Completed"))
+    db.add(models.Appointment(midwife_id=midwife.id, mother_id=mother.id, date_time=midnight(lmp + timedelta(weeks=16)),
+                              visit_type="Clinic", status="Scheduled", schedule_key=f"anc-{lmp}-w16"))
+    manual = crud.create_appointment(db, schemas.AppointmentCreate(
+        date_time=midnight(date.today() + timedelta(days=10)), visit_type="Home Visit"), midwife.id, mother.id)
+    db.commit()
+    before = visits(db, mother.id)
+
+    template = new_version(db, anc_weeks_high=(16, 24, 30, 36))
+    totals = crud.replan_schedules(db, template_id=template.id)
+    assert totals == {"mothers": 1, "changed": 1, "inserted": 1, "deleted": 3}
+    after = visits(db, mother.id)
+
+    # Left alone: the completed, the overdue and the manual visit, and week 36 (in both versions)
+    for key in ("w24", "w16", "w36"):
+        appointment_id = next(i for i, (k, _, _) in before.items() if k == f"anc-{lmp}-{key}")
+        assert after[appointment_id] == before[appointment_id]
+    assert after[manual.id] == before[manual.id]
+    # Moved: 28, 32 and 40 are gone, 30 is new; nothing is booked twice
+    keys = [key for key, _, _ in after.values() if key]
+    assert sorted(keys) == sorted(f"anc-{lmp}-w{week}" for week in (16, 24, 30, 36))
+    assert db.query(models.Mother.care_plan_id).filter(models.Mother.id == mother.id).scalar() == template.id
+
+    # Moved mothers aren't selected again; re-applying their own version changes nothing
+    assert crud.replan_schedules(db, template_id=template.id)["mothers"] == 0
+    assert crud.replan_schedules(db)["changed"] == 0
+    assert visits(db, mother.id) == after
+
+def test_delivery_replaces_remaining_anc_with_pnc(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    lmp = date.today() - timedelta(weeks=30)
+    start_pregnancy(db, mother.id, lmp, "Low") # Week 36 ahead
+    delivered = date.today() - timedelta(days=5)
+    crud.report_delivery(db, mother.id, delivered.isoformat())
+    keys = sorted(key for key, _, _ in visits(db, mother.id).values())
+    # Late report: PNC visits already due are booked too; the ANC visit ahead is gone
+    assert keys == sorted(f"pnc-{delivered}-d{day}" for day in (3, 7, 14, 42))
+
+def test_rescheduled_visit_survives_record_update(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    lmp = date.today() - timedelta(weeks=20)
+    start_pregnancy(db, mother.id, lmp, "Low") # Weeks 26, 36 ahead
+    by_key = {key: appointment_id for appointment_id, (key, _, _) in visits(db, mother.id).items()}
+    moved_to = midnight(lmp + timedelta(weeks=27)) + timedelta(hours=10)
+    crud.update_appointment(db, by_key[f"anc-{lmp}-w26"], schemas.AppointmentUpdate(date_time=moved_to))
+
+    crud.update_pregnancy_record(db, mother.id, schemas.PregnancyRecordCreate(lrmp=lmp), [], "Low")
+    after = visits(db, mother.id)
+    assert after[by_key[f"anc-{lmp}-w26"]] == (f"anc-{lmp}-w26", moved_to, "Scheduled")
+    # Not booked again at the generated date either
+    assert sorted(key for key, _, _ in after.values()) == [f"anc-{lmp}-w26", f"anc-{lmp}-w36"]
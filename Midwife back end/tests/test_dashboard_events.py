@@ -0,0 +1,39 @@
+import asyncio
+
+from sql_app import dashboard_events
+
+def test_other_workers_writes_reach_connected_dashboard(db, make_midwife, make_mother):
+    # The hub below stands in for the worker holding the socket. The write goes
+    # through the module hub, which isn't running here: like another worker or
+    # the maintenance sidecar, it can only reach the socket through the peer dir.
+    midwife = make_midwife("mw-a")
+    polls = dashboard_events.sync_polls.snapshot()
+
+    async def scenario():
+        hub = dashboard_events.DashboardHub()
+        hub.start()
+        try:
+            queue, snapshot = await hub.subscribe(midwife.id)
+            assert snapshot["assigned_mothers"] == 0
+            await asyncio.to_thread(make_mother, midwife.id, "901")
+            message = await asyncio.wait_for(queue.get(), 5)
+            hub.unsubscribe(midwife.id, queue)
+            return message
+        finally:
+            await hub.stop()
+
+    message = asyncio.run(scenario())
+    assert message["type"] == "delta"
+    assert message["changes"] == {"assigned_mothers": 1}
+    # Delivered peer to peer, not by polling versions
+    assert dashboard_events.sync_polls.snapshot() == polls
+
+def test_stale_peer_socket_is_removed(tmp_path, monkeypatch):
+    import socket
+    monkeypatch.setattr(dashboard_events, "DASHBOARD_PEER_DIR", str(tmp_path))
+    stale = tmp_path / "1-dead.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    listener.bind(str(stale))
+    listener.close() # Socket file left behind, nobody bound to it
+    dashboard_events.notify_peers([1])
+    assert not stale.exists()
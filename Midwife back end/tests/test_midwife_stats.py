@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from sql_app import crud, models, schemas
+from sql_app.database import engine
+
+def stored(db, midwife_id):
+    db.expire_all()
+    row = db.query(models.MidwifeStats).filter(models.MidwifeStats.midwife_id == midwife_id).one()
+    counters = {key: getattr(row, key) for key in crud.STATS_COUNTERS}
+    if row.completed_today_date != date.today():
+        counters["completed_today"] = 0
+    return counters
+
+def assert_counters_fresh(db, *midwife_ids):
+    fresh = crud.count_midwife_stats(db, list(midwife_ids))
+    for midwife_id in midwife_ids:
+        assert stored(db, midwife_id) == fresh[midwife_id], midwife_id
+
+def test_counters_follow_mother_writes(db, make_midwife, make_mother):
+    a, b = make_midwife("mw-a"), make_midwife("mw-b")
+    crud.reconcile_midwife_stats(db)
+    mothers = [make_mother(a.id, f"90{i}") for i in range(4)]
+    crud.start_pregnancy(db, mothers[0].id, schemas.PregnancyRecordCreate(lrmp=date.today() - timedelta(weeks=8)),
+                         [], "High")
+    crud.start_pregnancy(db, mothers[1].id, schemas.PregnancyRecordCreate(lrmp=date.today() - timedelta(weeks=8)),
+                         [], "Low")
+    assert stored(db, a.id)["assigned_mothers"] == 4
+    assert stored(db, a.id)["high_risk_mothers"] == 1
+    assert_counters_fresh(db, a.id, b.id)
+
+    # Reassign (high-risk mother included)
+    crud.transfer_mothers(db, schemas.MotherTransfer(mother_ids=[mothers[0].id, mothers[2].id],
+                                                     from_midwife_id=a.id, to_midwife_id=b.id))
+    assert stored(db, b.id)["high_risk_mothers"] == 1
+    assert_counters_fresh(db, a.id, b.id)
+
+    crud.report_delivery(db, mothers[1].id, date.today().isoformat())
+    assert_counters_fresh(db, a.id, b.id)
+
+def test_counters_follow_appointment_and_leave_writes(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    crud.reconcile_midwife_stats(db)
+    mother = make_mother(midwife.id, "901")
+    today = datetime.combine(date.today(), datetime.min.time())
+    visits = [crud.create_appointment(db, schemas.AppointmentCreate(date_time=when, visit_type="Clinic"),
+                                      midwife.id, mother.id)
+              for when in (today + timedelta(hours=9), today + timedelta(hours=10), today - timedelta(days=2))]
+    crud.update_appointment(db, visits[0].id, schemas.AppointmentUpdate(status="Completed"))
+    crud.update_appointment(db, visits[1].id, schemas.AppointmentUpdate(status="Completed"))
+    crud.update_appointment(db, visits[2].id, schemas.AppointmentUpdate(status="Missed"))
+    assert stored(db, midwife.id)["completed_today"] == 2
+    assert stored(db, midwife.id)["missed_visits"] == 1
+    crud.delete_appointment(db, visits[1].id)
+    crud.delete_appointment(db, visits[2].id)
+    assert_counters_fresh(db, midwife.id)
+
+    leave = crud.create_leave_request(db, schemas.LeaveRequestCreate(
+        start_date=date.today() + timedelta(days=5), end_date=date.today() + timedelta(days=6), reason="x"), midwife.id)
+    assert stored(db, midwife.id)["pending_leave"] == 1
+    crud.update_leave_request(db, leave.id, schemas.LeaveRequestUpdate(status="Approved"), "Area A")
+    assert_counters_fresh(db, midwife.id)
+
+def test_bulk_registration_updates_counters_once(db, make_midwife):
+    midwife = make_midwife("mw-a")
+    crud.reconcile_midwife_stats(db)
+    registrations = [(schemas.MotherCreate(full_name=f"Mother {i}", nic=f"80{i}", password="x"), "x") for i in range(25)]
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        created = crud.bulk_create_mothers(db, registrations, midwife.id)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert len(created) == 25
+    assert sum(s.startswith("UPDATE midwife_stats") for s in statements) == 1
+    assert stored(db, midwife.id)["assigned_mothers"] == 25
+    assert_counters_fresh(db, midwife.id)
+
+def test_reconcile_repairs_drift(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    crud.reconcile_midwife_stats(db)
+    make_mother(midwife.id, "901")
+    db.query(models.MidwifeStats).update({models.MidwifeStats.assigned_mothers: 7})
+    db.commit()
+    assert crud.reconcile_midwife_stats(db)["repaired"] == 1
+    assert_counters_fresh(db, midwife.id)
+    assert crud.reconcile_midwife_stats(db)["repaired"] == 0
@@ -0,0 +1,95 @@
+import os
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from sql_app import migrations, models
+
+BASELINE_SQL = os.path.join(os.path.dirname(__file__), "baseline_schema.sql")
+
+def _indexes(engine):
+    inspector = inspect(engine)
+    return {table: {ix["name"] for ix in inspector.get_indexes(table)} for table in inspector.get_table_names()}
+
+def _model_indexes():
+    return {table.name: {index.name for index in table.indexes} for table in models.Base.metadata.sorted_tables}
+
+@pytest.fixture
+def engine(db_dir, request):
+    path = os.path.join(db_dir, f"{request.node.name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+def _load_baseline(engine):
+    with open(BASELINE_SQL) as f:
+        statements = [s.strip() for s in f.read().split(";")]
+    with engine.begin() as conn:
+        for statement in statements:
+            lines = [line for line in statement.splitlines() if not line.startswith("--")]
+            if "".join(lines).strip():
+                conn.execute(text("\n".join(lines)))
+        conn.execute(text("INSERT INTO midwives (id, username, hashed_password, full_name, assigned_moh_area, is_active) "
+                          "VALUES (1, 'mw', 'x', 'Midwife One', 'Area A', 1)"))
+        conn.execute(text("INSERT INTO mothers (id, full_name, nic, hashed_password, midwife_id, status, risk_level, "
+                          "pregnancy_start_date) VALUES (1, 'Kamala Perera', '901', 'x', 1, 'Pregnant', 'Low', '2026-01-05')"))
+        conn.execute(text("INSERT INTO mothers (id, full_name, nic, hashed_password, midwife_id, status) "
+                          "VALUES (2, 'Nimali Silva', '902', 'x', 1, 'Eligible')"))
+        conn.execute(text("INSERT INTO appointments (id, midwife_id, mother_id, date_time, visit_type, status, notes) "
+                          "VALUES (1, 1, 1, '2026-03-30 09:00:00', 'Clinic', 'Scheduled', 'Generated Visit (Week 12)'), "
+                          "(2, 1, 1, '2026-04-02 10:00:00', 'Home Visit', 'Completed', 'manual')"))
+
+def test_upgrade_empty_database(engine):
+    assert migrations.upgrade(engine, log=lambda message: None) == migrations.latest_version()
+    assert _indexes(engine) == {**_model_indexes(), "schema_version": set()}
+    # Nothing left to do the second time
+    assert migrations.upgrade(engine, log=lambda message: None) == migrations.latest_version()
+
+def test_upgrade_baseline_database(engine):
+    _load_baseline(engine)
+    applied = []
+    assert migrations.upgrade(engine, log=applied.append) == migrations.latest_version()
+    assert len(applied) == len(migrations.MIGRATIONS)
+
+    # Same indexes and columns as a database created at head
+    assert _indexes(engine) == {**_model_indexes(), "schema_version": set()}
+    inspector = inspect(engine)
+    for table in models.Base.metadata.sorted_tables:
+        assert {c["name"] for c in inspector.get_columns(table.name)} == set(table.c.keys()), table.name
+
+    with engine.connect() as conn:
+        care_plans = dict(conn.execute(text("SELECT id, care_plan_id FROM mothers")).all())
+        assert care_plans[1] is not None and care_plans[2] is None
+        tokens = {row[0] for row in conn.execute(text("SELECT token FROM mother_search_tokens WHERE mother_id = 1"))}
+        assert {"kamala", "perera"} <= tokens
+        stats = conn.execute(text("SELECT assigned_mothers, high_risk_mothers, missed_visits FROM midwife_stats "
+                                  "WHERE midwife_id = 1")).one()
+        assert tuple(stats) == (2, 0, 0)
+
+def test_migration_steps_create_only_named_indexes(engine):
+    _load_baseline(engine)
+    with engine.connect() as conn:
+        migrations._create_indexes(conn, models.Appointment, "ix_appointments_midwife_date")
+        conn.commit()
+    assert "ix_appointments_mother_schedule" not in _indexes(engine)["appointments"]
+    assert "ix_appointments_midwife_date" in _indexes(engine)["appointments"]
+
+def test_schedule_key_arrives_with_migration_11(engine, monkeypatch):
+    _load_baseline(engine)
+    before = [m for m in migrations.MIGRATIONS if m[0] < 11]
+    monkeypatch.setattr(migrations, "MIGRATIONS", before)
+    assert migrations.upgrade(engine, log=lambda message: None) == 10
+    assert "schedule_key" not in {c["name"] for c in inspect(engine).get_columns("appointments")}
+    assert "ix_appointments_mother_schedule" not in _indexes(engine)["appointments"]
+
+    monkeypatch.undo()
+    assert migrations.upgrade(engine, log=lambda message: None) == migrations.latest_version()
+    assert "ix_appointments_mother_schedule" in _indexes(engine)["appointments"]
+    with engine.connect() as conn:
+        # Visits from the old generator are keyed by their notes, manual ones are not
+        keys = dict(conn.execute(text("SELECT id, schedule_key FROM appointments")).all())
+        assert keys == {1: "anc-2026-01-05-w12", 2: None}
+    with pytest.raises(Exception), engine.begin() as conn:
+        conn.execute(text("INSERT INTO appointments (midwife_id, mother_id, date_time, status, schedule_key) "
+                          "VALUES (1, 1, '2026-05-01 09:00:00', 'Scheduled', 'anc-2026-01-05-w12')"))
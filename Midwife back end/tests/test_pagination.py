@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sql_app import crud, models, pagination, schemas
+
+def all_pages(fetch, limit):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor, limit)
+        assert len(page) <= limit
+        rows.extend(page)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            return rows, pages
+
+def test_cursor_round_trip_with_ties_on_the_sort_key(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    start = datetime(2027, 1, 4, 9, 0)
+    # 4 visits at each of 3 times: most page boundaries fall inside a run of equal dates
+    for i in range(12):
+        crud.create_appointment(db, schemas.AppointmentCreate(date_time=start + timedelta(hours=i // 4),
+                                                              visit_type="Clinic"), midwife.id, mother.id)
+    unpaged = [row.id for row in crud.get_appointments_by_midwife(db, midwife.id)]
+    assert len(unpaged) == 12
+    for limit in (1, 3, 5, 12, 50):
+        rows, pages = all_pages(lambda cursor, limit: crud.get_appointments_by_midwife(
+            db, midwife.id, cursor=cursor, limit=limit), limit)
+        assert [row.id for row in rows] == unpaged, limit
+        # No trailing empty page when the rows divide evenly
+        assert pages == max(1, -(-12 // limit)), limit
+
+def test_descending_sort_pages_through_equal_names(db, make_midwife):
+    for i in range(7):
+        midwife = make_midwife(f"mw-{i}")
+        midwife.full_name = "Same Name" if i % 2 else f"Name {i}"
+    db.commit()
+    unpaged = [row.id for row in crud.get_midwife_directory(db, "Area A", sort="-name", limit=100)]
+    rows, _ = all_pages(lambda cursor, limit: crud.get_midwife_directory(
+        db, "Area A", sort="-name", cursor=cursor, limit=limit), 2)
+    assert [row.id for row in rows] == unpaged
+    assert len(set(unpaged)) == 7
+
+def test_cursor_keeps_its_place_when_rows_are_added_before_it(db, make_midwife, make_mother):
+    midwife = make_midwife("mw-a")
+    mother = make_mother(midwife.id, "901")
+    for day in range(1, 5):
+        crud.create_appointment(db, schemas.AppointmentCreate(date_time=datetime(2027, 1, day, 9),
+                                                              visit_type="Clinic"), midwife.id, mother.id)
+    first = crud.get_appointments_by_midwife(db, midwife.id, limit=2)
+    crud.create_appointment(db, schemas.AppointmentCreate(date_time=datetime(2026, 12, 1, 9), visit_type="Clinic"),
+                            midwife.id, mother.id)
+    second = crud.get_appointments_by_midwife(db, midwife.id, cursor=first.next_cursor, limit=2)
+    assert [row.date_time.day for row in second] == [3, 4] # Not shifted like OFFSET would be
+
+@pytest.mark.parametrize("cursor", ["not-base64!", pagination.encode_cursor([1]), pagination.encode_cursor(["x", 1])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor, [models.Appointment.date_time, models.Appointment.id])
+
+def test_next_cursor_header_and_bad_cursor_over_http(db, client, make_midwife, moh_headers):
+    for i in range(5):
+        make_midwife(f"mw-{i}")
+    headers = moh_headers("moh-a", "Area A")
+    first = client.get("/midwives/directory", params={"limit": 3}, headers=headers)
+    cursor = first.headers[pagination.NEXT_CURSOR_HEADER]
+    second = client.get("/midwives/directory", params={"limit": 3, "cursor": cursor}, headers=headers)
+    assert pagination.NEXT_CURSOR_HEADER not in second.headers
+    ids = [m["id"] for m in first.json() + second.json()]
+    assert len(ids) == len(set(ids)) == 5
+    bad = client.get("/midwives/directory", params={"cursor": "garbage"}, headers=headers)
+    assert bad.status_code == 400
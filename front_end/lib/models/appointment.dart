@@ -6,6 +6,10 @@ class Appointment {
   final String visitType;
   final String status;
   final String? notes;
+  // Only filled by the calendar day view (GET /appointments/calendar/{day})
+  final String? motherName;
+  final String? motherAddress;
+  final String? motherContactNumber;
 
   Appointment({
     required this.id,
@@ -15,6 +19,9 @@ class Appointment {
     this.visitType = "Home Visit",
     required this.status,
     this.notes,
+    this.motherName,
+    this.motherAddress,
+    this.motherContactNumber,
   });
 
   factory Appointment.fromJson(Map<String, dynamic> json) {
@@ -26,6 +33,9 @@ class Appointment {
       visitType: json['visit_type'] ?? "Home Visit",
       status: json['status'],
       notes: json['notes'],
+      motherName: json['mother_name'],
+      motherAddress: json['mother_address'],
+      motherContactNumber: json['mother_contact_number'],
     );
   }
 
@@ -0,0 +1,16 @@
+// One day of the midwife calendar month view (GET /appointments/calendar)
+class CalendarDay {
+  final DateTime day;
+  final int total;
+  final Map<String, int> byType; // visit_type -> count
+
+  CalendarDay({required this.day, required this.total, required this.byType});
+
+  factory CalendarDay.fromJson(Map<String, dynamic> json) {
+    return CalendarDay(
+      day: DateTime.parse(json['day']),
+      total: json['total'],
+      byType: Map<String, int>.from(json['by_type'] ?? {}),
+    );
+  }
+}
@@ -9,6 +9,8 @@ class Mother {
   final String riskLevel;
   final DateTime? pregnancyStartDate;
   final DateTime? deliveryDate;
+  final double? latitude; // Home location, for the home-visit route
+  final double? longitude;
 
   Mother({
     required this.id,
@@ -21,6 +23,8 @@ class Mother {
     this.riskLevel = 'Low',
     this.pregnancyStartDate,
     this.deliveryDate,
+    this.latitude,
+    this.longitude,
   });
 
   factory Mother.fromJson(Map<String, dynamic> json) {
@@ -39,6 +43,8 @@ class Mother {
       deliveryDate: json['delivery_date'] != null
           ? DateTime.parse(json['delivery_date'])
           : null,
+      latitude: (json['latitude'] as num?)?.toDouble(),
+      longitude: (json['longitude'] as num?)?.toDouble(),
     );
   }
 
@@ -50,6 +56,8 @@ class Mother {
       'address': address,
       'contact_number': contactNumber,
       'midwife_id': midwifeId,
+      if (latitude != null) 'latitude': latitude,
+      if (longitude != null) 'longitude': longitude,
     };
   }
 }
@@ -2,7 +2,7 @@ import 'package:flutter/material.dart';
 import 'package:intl/intl.dart';
 import 'package:url_launcher/url_launcher.dart'; // For calls
 import '../models/appointment.dart';
-import '../models/mother.dart';
+import '../models/calendar_day.dart';
 import '../services/api_service.dart';
 import 'anc_record_screen.dart';
 
@@ -14,32 +14,66 @@ class AppointmentScreen extends StatefulWidget {
 class _AppointmentScreenState extends State<AppointmentScreen> {
   final ApiService _apiService = ApiService();
   List<Appointment> _appointments = [];
-  List<Mother> _mothers = [];
   bool _isLoading = true;
 
+  // Calendar: the month strip shows counts only, the list is the selected day
+  DateTime _selectedDay = DateTime.now();
+  DateTime _month = DateTime(DateTime.now().year, DateTime.now().month);
+  Map<int, CalendarDay> _monthCounts = {}; // day of month -> counts
+
   @override
   void initState() {
     super.initState();
+    _loadMonth();
     _loadData();
   }
 
-  Future<void> _loadData() async {
-    setState(() => _isLoading = true);
+  bool get _isToday {
+    final now = DateTime.now();
+    return _selectedDay.year == now.year &&
+        _selectedDay.month == now.month &&
+        _selectedDay.day == now.day;
+  }
+
+  Future<void> _loadMonth() async {
     try {
-      // 1. Get Today's Date
-      final now = DateTime.now();
+      final days = await _apiService.getCalendarMonth(
+        _month.year,
+        _month.month,
+      );
+      if (mounted) {
+        setState(() {
+          _monthCounts = {for (final d in days) d.day.day: d};
+        });
+      }
+    } catch (e) {
+      debugPrint('Calendar Error: $e');
+    }
+  }
 
-      // 2. Fetch Appointments for TODAY
-      // Using getMidwifeAppointments with date filter
-      final appointments = await _apiService.getMidwifeAppointments(date: now);
+  void _changeMonth(int delta) {
+    setState(() {
+      _month = DateTime(_month.year, _month.month + delta);
+      _selectedDay = _month;
+      _monthCounts = {};
+    });
+    _loadMonth();
+    _loadData();
+  }
 
-      // 3. Fetch Mothers (to map names/address)
-      // Optimization: Could fetch only relevant mothers, but getMothers() is cached/fast enough for now
-      final mothers = await _apiService.getMothers();
+  void _selectDay(DateTime day) {
+    setState(() => _selectedDay = day);
+    _loadData();
+  }
+
+  Future<void> _loadData() async {
+    setState(() => _isLoading = true);
+    try {
+      // The selected day's visits, mother name / address / phone included
+      final appointments = await _apiService.getCalendarDay(_selectedDay);
 
       setState(() {
         _appointments = appointments;
-        _mothers = mothers;
         _isLoading = false;
       });
     } catch (e) {
@@ -56,6 +90,7 @@ class _AppointmentScreenState extends State<AppointmentScreen> {
     try {
       await _apiService.updateAppointment(appt.id, {"status": "Completed"});
       _loadData(); // Refresh list
+      _loadMonth();
       ScaffoldMessenger.of(
         context,
       ).showSnackBar(SnackBar(content: Text("Visit Marked as Completed!")));
@@ -79,7 +114,7 @@ class _AppointmentScreenState extends State<AppointmentScreen> {
 
   @override
   Widget build(BuildContext context) {
-    final todayStr = DateFormat('MMM d, yyyy').format(DateTime.now());
+    final todayStr = DateFormat('MMM d, yyyy').format(_selectedDay);
 
     return Scaffold(
       appBar: AppBar(
@@ -95,173 +130,258 @@ class _AppointmentScreenState extends State<AppointmentScreen> {
         ),
         backgroundColor: Colors.teal,
       ),
-      body: _isLoading
-          ? Center(child: CircularProgressIndicator())
-          : _appointments.isEmpty
-          ? Center(
-              child: Column(
-                mainAxisAlignment: MainAxisAlignment.center,
-                children: [
-                  Icon(Icons.event_available, size: 64, color: Colors.grey),
-                  SizedBox(height: 16),
-                  Text(
-                    "No visits scheduled for today!",
-                    style: TextStyle(fontSize: 18, color: Colors.grey),
-                  ),
-                ],
+      body: Column(
+        children: [
+          _buildMonthStrip(),
+          Expanded(child: _buildDayList()),
+        ],
+      ),
+    );
+  }
+
+  Widget _buildMonthStrip() {
+    final daysInMonth = DateTime(_month.year, _month.month + 1, 0).day;
+    return Container(
+      color: Colors.teal.shade50,
+      padding: EdgeInsets.only(bottom: 8),
+      child: Column(
+        children: [
+          Row(
+            mainAxisAlignment: MainAxisAlignment.spaceBetween,
+            children: [
+              IconButton(
+                icon: Icon(Icons.chevron_left),
+                onPressed: () => _changeMonth(-1),
+              ),
+              Text(
+                DateFormat('MMMM yyyy').format(_month),
+                style: TextStyle(fontWeight: FontWeight.bold, fontSize: 16),
               ),
-            )
-          : ListView.builder(
-              padding: EdgeInsets.all(16),
-              itemCount: _appointments.length,
+              IconButton(
+                icon: Icon(Icons.chevron_right),
+                onPressed: () => _changeMonth(1),
+              ),
+            ],
+          ),
+          SizedBox(
+            height: 64,
+            child: ListView.builder(
+              scrollDirection: Axis.horizontal,
+              padding: EdgeInsets.symmetric(horizontal: 8),
+              itemCount: daysInMonth,
               itemBuilder: (context, index) {
-                final appt = _appointments[index];
-                final mother = _mothers.firstWhere(
-                  (m) => m.id == appt.motherId,
-                  orElse: () => Mother(
-                    id: -1,
-                    nic: 'N/A',
-                    fullName: 'Unknown',
-                    address: 'N/A',
-                    contactNumber: 'N/A',
-                    midwifeId: -1,
+                final day = DateTime(_month.year, _month.month, index + 1);
+                final counts = _monthCounts[index + 1];
+                final selected =
+                    day.year == _selectedDay.year &&
+                    day.month == _selectedDay.month &&
+                    day.day == _selectedDay.day;
+                return GestureDetector(
+                  onTap: () => _selectDay(day),
+                  child: Container(
+                    width: 48,
+                    margin: EdgeInsets.symmetric(horizontal: 4),
+                    decoration: BoxDecoration(
+                      color: selected ? Colors.teal : Colors.white,
+                      borderRadius: BorderRadius.circular(12),
+                    ),
+                    child: Column(
+                      mainAxisAlignment: MainAxisAlignment.center,
+                      children: [
+                        Text(
+                          DateFormat('E').format(day).substring(0, 2),
+                          style: TextStyle(
+                            fontSize: 11,
+                            color: selected ? Colors.white70 : Colors.grey,
+                          ),
+                        ),
+                        Text(
+                          '${index + 1}',
+                          style: TextStyle(
+                            fontWeight: FontWeight.bold,
+                            color: selected ? Colors.white : Colors.black87,
+                          ),
+                        ),
+                        Text(
+                          counts != null ? '${counts.total}' : '',
+                          style: TextStyle(
+                            fontSize: 11,
+                            color: selected ? Colors.white : Colors.teal,
+                          ),
+                        ),
+                      ],
+                    ),
                   ),
                 );
+              },
+            ),
+          ),
+        ],
+      ),
+    );
+  }
 
-                bool isCompleted = appt.status == "Completed";
+  Widget _buildDayList() {
+    return _isLoading
+        ? Center(child: CircularProgressIndicator())
+        : _appointments.isEmpty
+        ? Center(
+            child: Column(
+              mainAxisAlignment: MainAxisAlignment.center,
+              children: [
+                Icon(Icons.event_available, size: 64, color: Colors.grey),
+                SizedBox(height: 16),
+                Text(
+                  _isToday
+                      ? "No visits scheduled for today!"
+                      : "No visits scheduled for this day.",
+                  style: TextStyle(fontSize: 18, color: Colors.grey),
+                ),
+              ],
+            ),
+          )
+        : ListView.builder(
+            padding: EdgeInsets.all(16),
+            itemCount: _appointments.length,
+            itemBuilder: (context, index) {
+              final appt = _appointments[index];
+              final motherName = appt.motherName ?? 'Unknown';
+              final motherAddress = appt.motherAddress ?? 'N/A';
+              final motherContact = appt.motherContactNumber ?? 'N/A';
 
-                return Card(
-                  elevation: 4,
-                  margin: EdgeInsets.only(bottom: 16),
-                  shape: RoundedRectangleBorder(
-                    borderRadius: BorderRadius.circular(12),
-                  ),
-                  color: isCompleted ? Colors.teal.shade50 : Colors.white,
-                  child: Padding(
-                    padding: const EdgeInsets.all(16.0),
-                    child: Column(
-                      crossAxisAlignment: CrossAxisAlignment.start,
-                      children: [
-                        // Header: Time & Type
-                        Row(
-                          mainAxisAlignment: MainAxisAlignment.spaceBetween,
-                          children: [
-                            Chip(
-                              label: Text(
-                                appt.visitType,
-                                style: TextStyle(
-                                  color: Colors.white,
-                                  fontSize: 12,
-                                ),
+              bool isCompleted = appt.status == "Completed";
+
+              return Card(
+                elevation: 4,
+                margin: EdgeInsets.only(bottom: 16),
+                shape: RoundedRectangleBorder(
+                  borderRadius: BorderRadius.circular(12),
+                ),
+                color: isCompleted ? Colors.teal.shade50 : Colors.white,
+                child: Padding(
+                  padding: const EdgeInsets.all(16.0),
+                  child: Column(
+                    crossAxisAlignment: CrossAxisAlignment.start,
+                    children: [
+                      // Header: Time & Type
+                      Row(
+                        mainAxisAlignment: MainAxisAlignment.spaceBetween,
+                        children: [
+                          Chip(
+                            label: Text(
+                              appt.visitType,
+                              style: TextStyle(
+                                color: Colors.white,
+                                fontSize: 12,
                               ),
-                              backgroundColor: Colors.teal,
-                              visualDensity: VisualDensity.compact,
                             ),
+                            backgroundColor: Colors.teal,
+                            visualDensity: VisualDensity.compact,
+                          ),
+                          Text(
+                            DateFormat('h:mm a').format(appt.dateTime),
+                            style: TextStyle(
+                              fontWeight: FontWeight.bold,
+                              fontSize: 16,
+                            ),
+                          ),
+                        ],
+                      ),
+                      SizedBox(height: 12),
+
+                      // Mother Details
+                      Text(
+                        motherName,
+                        style: TextStyle(
+                          fontSize: 18,
+                          fontWeight: FontWeight.bold,
+                        ),
+                      ),
+                      SizedBox(height: 8),
+
+                      // Address
+                      Row(
+                        children: [
+                          Icon(
+                            Icons.location_on,
+                            size: 16,
+                            color: Colors.grey,
+                          ),
+                          SizedBox(width: 4),
+                          Expanded(
+                            child: Text(
+                              motherAddress,
+                              style: TextStyle(color: Colors.grey[800]),
+                            ),
+                          ),
+                        ],
+                      ),
+                      SizedBox(height: 4),
+
+                      // Phone
+                      InkWell(
+                        onTap: () => _makeCall(motherContact),
+                        child: Row(
+                          children: [
+                            Icon(Icons.phone, size: 16, color: Colors.teal),
+                            SizedBox(width: 4),
                             Text(
-                              DateFormat('h:mm a').format(appt.dateTime),
+                              motherContact,
                               style: TextStyle(
+                                color: Colors.teal,
                                 fontWeight: FontWeight.bold,
-                                fontSize: 16,
                               ),
                             ),
                           ],
                         ),
-                        SizedBox(height: 12),
+                      ),
 
-                        // Mother Details
+                      Divider(height: 24),
+
+                      // Notes
+                      if (appt.notes != null && appt.notes!.isNotEmpty) ...[
                         Text(
-                          mother.fullName,
+                          "Notes:",
                           style: TextStyle(
-                            fontSize: 18,
                             fontWeight: FontWeight.bold,
+                            fontSize: 12,
                           ),
                         ),
-                        SizedBox(height: 8),
-
-                        // Address
-                        Row(
-                          children: [
-                            Icon(
-                              Icons.location_on,
-                              size: 16,
-                              color: Colors.grey,
-                            ),
-                            SizedBox(width: 4),
-                            Expanded(
-                              child: Text(
-                                mother.address,
-                                style: TextStyle(color: Colors.grey[800]),
-                              ),
-                            ),
-                          ],
+                        Text(
+                          appt.notes!,
+                          style: TextStyle(fontStyle: FontStyle.italic),
                         ),
-                        SizedBox(height: 4),
+                        SizedBox(height: 16),
+                      ],
 
-                        // Phone
-                        InkWell(
-                          onTap: () => _makeCall(mother.contactNumber),
-                          child: Row(
-                            children: [
-                              Icon(Icons.phone, size: 16, color: Colors.teal),
-                              SizedBox(width: 4),
-                              Text(
-                                mother.contactNumber,
-                                style: TextStyle(
-                                  color: Colors.teal,
-                                  fontWeight: FontWeight.bold,
+                      // Action Button
+                      SizedBox(
+                        width: double.infinity,
+                        child: isCompleted
+                            ? OutlinedButton.icon(
+                                onPressed: null, // Disabled
+                                icon: Icon(Icons.check, color: Colors.green),
+                                label: Text(
+                                  "COMPLETED",
+                                  style: TextStyle(color: Colors.green),
                                 ),
-                              ),
-                            ],
-                          ),
-                        ),
-
-                        Divider(height: 24),
-
-                        // Notes
-                        if (appt.notes != null && appt.notes!.isNotEmpty) ...[
-                          Text(
-                            "Notes:",
-                            style: TextStyle(
-                              fontWeight: FontWeight.bold,
-                              fontSize: 12,
-                            ),
-                          ),
-                          Text(
-                            appt.notes!,
-                            style: TextStyle(fontStyle: FontStyle.italic),
-                          ),
-                          SizedBox(height: 16),
-                        ],
-
-                        // Action Button
-                        SizedBox(
-                          width: double.infinity,
-                          child: isCompleted
-                              ? OutlinedButton.icon(
-                                  onPressed: null, // Disabled
-                                  icon: Icon(Icons.check, color: Colors.green),
-                                  label: Text(
-                                    "COMPLETED",
-                                    style: TextStyle(color: Colors.green),
-                                  ),
-                                )
-                              : ElevatedButton.icon(
-                                  onPressed: () => _markCompleted(appt),
-                                  icon: Icon(Icons.check_circle_outline),
-                                  label: Text("MARK AS COMPLETED"),
-                                  style: ElevatedButton.styleFrom(
-                                    backgroundColor: Colors.green,
-                                    foregroundColor: Colors.white,
-                                    padding: EdgeInsets.symmetric(vertical: 12),
-                                  ),
+                              )
+                            : ElevatedButton.icon(
+                                onPressed: () => _markCompleted(appt),
+                                icon: Icon(Icons.check_circle_outline),
+                                label: Text("MARK AS COMPLETED"),
+                                style: ElevatedButton.styleFrom(
+                                  backgroundColor: Colors.green,
+                                  foregroundColor: Colors.white,
+                                  padding: EdgeInsets.symmetric(vertical: 12),
                                 ),
-                        ),
-                      ],
-                    ),
+                              ),
+                      ),
+                    ],
                   ),
-                );
-              },
-            ),
-    );
+                ),
+              );
+            },
+          );
   }
 }
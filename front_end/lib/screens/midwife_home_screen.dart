@@ -246,6 +246,7 @@ class _MidwifeHomeScreenState extends State<MidwifeHomeScreen> {
                   }
                   final assigned = snapshot.data?['assigned_mothers'] ?? 0;
                   final visits = snapshot.data?['todays_visits'] ?? 0;
+                  final missed = snapshot.data?['missed_visits'] ?? 0;
                   // If loading, we just show 0 or a spinner inside?
                   // Let's settle for 0 or existing data with no spinner for cleaner UI
 
@@ -264,6 +265,13 @@ class _MidwifeHomeScreenState extends State<MidwifeHomeScreen> {
                         icon: Icons.calendar_today,
                         color: Colors.orange,
                       ),
+                      SizedBox(width: 16),
+                      DashboardStat(
+                        label: 'Missed (7d)',
+                        value: '$missed',
+                        icon: Icons.event_busy,
+                        color: Colors.red,
+                      ),
                     ],
                   );
                 },
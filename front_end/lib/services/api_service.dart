@@ -6,6 +6,7 @@ import '../models/pregnancy_record.dart';
 import '../models/delivery_record.dart';
 import '../models/antenatal_plan.dart';
 import '../models/appointment.dart';
+import '../models/calendar_day.dart';
 import '../models/leave_request.dart';
 import '../models/mother.dart';
 // import '../models/health_record.dart'; // Unused
@@ -236,29 +237,40 @@ class ApiService {
   // ----------------------------------------------------------------------
   // MOTHER PORTAL
   // ----------------------------------------------------------------------
+  // Conditional GET: the last body and ETag of each /my-* list are kept, so
+  // reopening a screen whose list hasn't changed costs an empty 304.
+  final Map<String, String> _portalEtags = {};
+  final Map<String, String> _portalBodies = {};
+
+  Future<http.Response> _getPortalList(String path) async {
+    final headers = await _getHeaders();
+    final etag = _portalEtags[path];
+    if (etag != null) headers['If-None-Match'] = etag;
+    final response = await http.get(Uri.parse("$_baseUrl$path"), headers: headers);
+    if (response.statusCode == 304 && _portalBodies.containsKey(path)) {
+      return http.Response(_portalBodies[path]!, 200, headers: response.headers);
+    }
+    if (response.statusCode == 200 && response.headers['etag'] != null) {
+      _portalEtags[path] = response.headers['etag']!;
+      _portalBodies[path] = response.body;
+    }
+    return response;
+  }
+
   Future<List<dynamic>> getMyPregnancyRecords() async {
-    final response = await http.get(
-      Uri.parse("$_baseUrl/my-pregnancy-records/"),
-      headers: await _getHeaders(),
-    );
+    final response = await _getPortalList("/my-pregnancy-records/");
     if (response.statusCode == 200) return jsonDecode(response.body);
     throw Exception('Failed to load my pregnancy records');
   }
 
   Future<List<dynamic>> getMyDeliveryRecords() async {
-    final response = await http.get(
-      Uri.parse("$_baseUrl/my-delivery-records/"),
-      headers: await _getHeaders(),
-    );
+    final response = await _getPortalList("/my-delivery-records/");
     if (response.statusCode == 200) return jsonDecode(response.body);
     throw Exception('Failed to load my delivery records');
   }
 
   Future<List<dynamic>> getMyAntenatalPlans() async {
-    final response = await http.get(
-      Uri.parse("$_baseUrl/my-antenatal-plans/"),
-      headers: await _getHeaders(),
-    );
+    final response = await _getPortalList("/my-antenatal-plans/");
     if (response.statusCode == 200) return jsonDecode(response.body);
     throw Exception('Failed to load my antenatal plans');
   }
@@ -354,11 +366,7 @@ class ApiService {
 
   // For Mother: Get "My Appointments"
   Future<List<Appointment>> getMyAppointments() async {
-    final headers = await _getHeaders();
-    final response = await http.get(
-      Uri.parse('$_baseUrl/my-appointments/'),
-      headers: headers,
-    );
+    final response = await _getPortalList('/my-appointments/');
 
     if (response.statusCode == 200) {
       List<dynamic> body = json.decode(response.body);
@@ -406,6 +414,62 @@ class ApiService {
     }
   }
 
+  // For Midwife: calendar month as counts per day (a few hundred bytes)
+  Future<List<CalendarDay>> getCalendarMonth(int year, int month) async {
+    final headers = await _getHeaders();
+    final response = await http.get(
+      Uri.parse('$_baseUrl/appointments/calendar?year=$year&month=$month'),
+      headers: headers,
+    );
+
+    if (response.statusCode == 200) {
+      List<dynamic> days = json.decode(response.body)['days'];
+      return days.map((dynamic item) => CalendarDay.fromJson(item)).toList();
+    } else {
+      throw Exception('Failed to load calendar');
+    }
+  }
+
+  // For Midwife: the visits of one day, with the mother's name, address and phone
+  Future<List<Appointment>> getCalendarDay(DateTime day) async {
+    final headers = await _getHeaders();
+    final dayStr =
+        '${day.year}-${day.month.toString().padLeft(2, '0')}-${day.day.toString().padLeft(2, '0')}';
+    final response = await http.get(
+      Uri.parse('$_baseUrl/appointments/calendar/$dayStr'),
+      headers: headers,
+    );
+
+    if (response.statusCode == 200) {
+      List<dynamic> body = json.decode(response.body);
+      return body.map((dynamic item) => Appointment.fromJson(item)).toList();
+    } else {
+      throw Exception('Failed to load visits');
+    }
+  }
+
+  // The day's home visits in route order ('stops'), plus 'unlocated' visits
+  // for mothers with no coordinates. Pass the phone's position to start there.
+  Future<Map<String, dynamic>> getHomeVisitPlan(DateTime day,
+      {double? startLat, double? startLon}) async {
+    final headers = await _getHeaders();
+    final dayStr =
+        '${day.year}-${day.month.toString().padLeft(2, '0')}-${day.day.toString().padLeft(2, '0')}';
+    final query = startLat != null && startLon != null
+        ? '?start_lat=$startLat&start_lon=$startLon'
+        : '';
+    final response = await http.get(
+      Uri.parse('$_baseUrl/appointments/home-visit-plan/$dayStr$query'),
+      headers: headers,
+    );
+
+    if (response.statusCode == 200) {
+      return json.decode(response.body);
+    } else {
+      throw Exception('Failed to load home-visit plan');
+    }
+  }
+
   // For Midwife: "Schedule Appointments" (Create)
   // Original signature was: createAppointment(Appointment appointment).
   // New signature: createAppointment(Appointment appointment, int motherId).
@@ -584,15 +648,26 @@ class ApiService {
   // ----------------------------------------------------------------------
   // DASHBOARD STATS & NOTIFICATIONS (NEW)
   // ----------------------------------------------------------------------
+  // Conditional GET: an unchanged dashboard comes back as an empty 304
+  String? _dashboardEtag;
+  Map<String, int>? _dashboardStats;
+
   Future<Map<String, int>> getDashboardStats() async {
     final headers = await _getHeaders();
+    if (_dashboardEtag != null && _dashboardStats != null) {
+      headers['If-None-Match'] = _dashboardEtag!;
+    }
     final response = await http.get(
       Uri.parse('$_baseUrl/midwives/dashboard-stats'),
       headers: headers,
     );
 
-    if (response.statusCode == 200) {
-      return Map<String, int>.from(json.decode(response.body));
+    if (response.statusCode == 304 && _dashboardStats != null) {
+      return Map<String, int>.from(_dashboardStats!);
+    } else if (response.statusCode == 200) {
+      _dashboardStats = Map<String, int>.from(json.decode(response.body));
+      _dashboardEtag = response.headers['etag'];
+      return Map<String, int>.from(_dashboardStats!);
     } else {
       throw Exception('Failed to load stats');
     }